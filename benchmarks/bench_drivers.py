@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+    bench_drivers
+    ~~~~~~~~~~~~~
+
+    Times the hot paths of some drivers against loopback sessions replaying
+    synthetic transcripts, so it runs without hardware.
+
+    For each benchmark it reports the time per call, the part spent waiting
+    on the simulated instrument and the part spent in Python. With --save
+    the Python times are stored, with --compare they are checked against
+    stored ones and the exit status is 1 if any is slower than allowed by
+    --tolerance::
+
+        python benchmarks/bench_drivers.py --save baseline.json
+        python benchmarks/bench_drivers.py --compare baseline.json --tolerance 0.25
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+
+from lantz.drivers.loopback import Transcript, open_loopback
+from lantz.drivers.legacy.loopback import LoopbackMixin
+
+#: Registered benchmarks, as a mapping between name and setup function.
+#: The setup function takes the latencies and returns (call, session, cleanup).
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def _inner(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return _inner
+
+
+def ascii_values(values, fmt='{:d}'):
+    return ','.join(fmt.format(value) for value in values)
+
+
+def ieee_block(data):
+    length = str(len(data)).encode('ascii')
+    return b'#' + str(len(length)).encode('ascii') + length + data
+
+
+@benchmark('TDS1012.acquire_curve')
+def tds1012(per_message, per_byte):
+    from lantz.drivers.legacy.tektronix.tds1012 import TDS1012
+
+    class TDS1012Loopback(LoopbackMixin, TDS1012):
+        pass
+
+    curve = np.random.RandomState(0).randint(-128, 128, 2500)
+    transcript = Transcript([
+        ('WFMP:XZE?;XIN?;PT_OF?;YZE?;YMU?;YOF?;\n', '-2.5E-3;2.0E-6;0;0.0E0;4.0E-2;0.0E0\n'),
+        ('DAT:ENC ASCI;WID 2\n', ''),
+        ('DAT:STAR 1\n', ''),
+        ('DAT:STOP 2500\n', ''),
+        ('CURV?\n', ascii_values(curve) + '\n'),
+    ])
+    driver = TDS1012Loopback(transcript, per_message, per_byte)
+    return driver.acquire_curve, driver.session, None
+
+
+@benchmark('SR830.read_buffer')
+def sr830(per_message, per_byte):
+    from lantz.drivers.legacy.stanford.sr830 import SR830Serial
+
+    class SR830Loopback(LoopbackMixin, SR830Serial):
+        pass
+
+    points = np.random.RandomState(0).normal(0, 1e-3, 16383)
+    transcript = Transcript([
+        ('TRCA? 1,0,16383\n', ascii_values(points, '{:.6e}') + '\n'),
+    ])
+    driver = SR830Loopback(transcript, per_message, per_byte)
+    return lambda: driver.read_buffer(1, 0, 16383), driver.session, None
+
+
+def e8364b(per_message, per_byte):
+    from lantz.drivers.keysight.e8364b import E8364B
+
+    points = np.random.RandomState(0).normal(0, 1, 2 * 1601)
+    driver = open_loopback(E8364B, Transcript([('FORM:DATA REAL,+64\n', '')]), per_message, per_byte)
+    driver.data_format = 'REAL64'
+
+    session = driver.resource.session
+    session.play(Transcript([
+        ('CALC:DATA? SDATA\n', ieee_block(points.astype('>f8').tobytes()) + b'\n'),
+    ]))
+    return driver, session
+
+
+@benchmark('E8364B.y_data')
+def e8364b_y_data(per_message, per_byte):
+    driver, session = e8364b(per_message, per_byte)
+    return driver.y_data, session, None
+
+
+@benchmark('lantz_server round trip (E8364B.y_data)')
+def lantz_server(per_message, per_byte):
+    from lantz.drivers.keysight.e8364b import E8364B
+    from lantz.drivers.lantz_server import Lantz_Server, Device_Client, build_query
+
+    driver, session = e8364b(per_message, per_byte)
+    server = Lantz_Server('localhost', 0, driver)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = Device_Client(E8364B, 'localhost', server.server_address[1], timeout=10,
+                           allow_initialize_finalize=False)
+
+    def call():
+        reply = client.query(build_query('Action', 'y_data'))
+        if reply['error'] is not None:
+            raise reply['error']
+        return reply['msg']
+
+    def cleanup():
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    return call, session, cleanup
+
+
+def run(setup, per_message, per_byte, number, repeat):
+    """Time a benchmark.
+
+    :return: time per call, instrument wait per call and Python time per
+             call in seconds, from the repetition with the least Python time.
+    """
+    call, session, cleanup = setup(per_message, per_byte)
+    try:
+        # The Lantz server prints every request and reply.
+        with contextlib.redirect_stdout(io.StringIO()):
+            call()
+            best = None
+            for _ in range(repeat):
+                wait = session.wait_time
+                start = time.perf_counter()
+                for _ in range(number):
+                    call()
+                total = (time.perf_counter() - start) / number
+                wait = (session.wait_time - wait) / number
+                if best is None or total - wait < best[2]:
+                    best = (total, wait, total - wait)
+        return best
+    finally:
+        if cleanup is not None:
+            cleanup()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark drivers against loopback sessions')
+    parser.add_argument('-n', '--number', type=int, default=20,
+                        help='calls in each repetition')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='repetitions, the fastest one is reported')
+    parser.add_argument('--per-message', type=float, default=0.,
+                        help='simulated latency of each exchange in seconds')
+    parser.add_argument('--per-byte', type=float, default=0.,
+                        help='simulated latency of each byte in seconds')
+    parser.add_argument('-k', '--select', default='',
+                        help='only run benchmarks containing this text')
+    parser.add_argument('--save', help='save the Python times to a JSON file')
+    parser.add_argument('--compare', help='compare the Python times with a JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown when comparing')
+    args = parser.parse_args(args)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+
+    results = {}
+    failed = False
+    print('{:45} {:>12} {:>12} {:>12}'.format('benchmark', 'total (ms)', 'wait (ms)', 'python (ms)'))
+    for name, setup in BENCHMARKS.items():
+        if args.select not in name:
+            continue
+        try:
+            total, wait, python = run(setup, args.per_message, args.per_byte, args.number, args.repeat)
+        except Exception as e:
+            print('{:45} error: {!r}'.format(name, e))
+            failed = True
+            continue
+        results[name] = python
+        line = '{:45} {:12.3f} {:12.3f} {:12.3f}'.format(name, total * 1e3, wait * 1e3, python * 1e3)
+        if name in baseline:
+            change = python / baseline[name] - 1
+            line += ' {:+7.1%}'.format(change)
+            if change > args.tolerance:
+                line += ' REGRESSION'
+                failed = True
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
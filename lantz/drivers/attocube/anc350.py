@@ -34,6 +34,8 @@ class ANC350(LibraryDriver):
         self.lib.startContinousMove.argtypes = [c_void_p, c_uint, c_uint, c_uint]
         self.lib.setTargetPosition.argtypes = [c_void_p, c_uint, c_double]
         self.lib.setTargetRange.argtypes = [c_void_p, c_uint, c_double]
+        self.lib.startAutoMove.argtypes = [c_void_p, c_uint, c_uint, c_uint]
+        self.lib.getAxisStatus.argtypes = [c_void_p, c_uint] + [POINTER(c_uint)] * 7
         self.lib.disconnect.argtypes = [c_void_p]
         return
 
@@ -83,25 +85,17 @@ class ANC350(LibraryDriver):
         self.check_error(self.lib.measureCapacitance(self.device, axis, pointer(ret_c)))
         return ret_c.value
 
-    @DictFeat()
-    def status(self, axis):
-        status_names = [
-            'connected',
-            'enabled',
-            'moving',
-            'target',
-            'eot_fwd',
-            'eot_bwd',
-            'error',
-        ]
-        status_flags = [c_uint() for _ in range(7)]
+    STATUS_NAMES = ('connected', 'enabled', 'moving', 'target', 'eot_fwd', 'eot_bwd', 'error')
+
+    def _axis_status(self, axis):
+        status_flags = [c_uint() for _ in range(len(self.STATUS_NAMES))]
         status_flags_p = [pointer(flag) for flag in status_flags]
         self.check_error(self.lib.getAxisStatus(self.device, axis, *status_flags_p))
+        return {name: bool(flag.value) for name, flag in zip(self.STATUS_NAMES, status_flags)}
 
-        ret = dict()
-        for status_name, status_flag in zip(status_names, status_flags):
-            ret[status_name] = True if status_flag.value else False
-        return ret
+    @DictFeat()
+    def status(self, axis):
+        return self._axis_status(axis)
 
     # Untested
     @Action()
@@ -129,11 +123,15 @@ class ANC350(LibraryDriver):
         if not max_move is None:
             if abs(self.position[axis]-Q_(target, 'm')) > max_move:
                 raise Exception("Relative move (target-current) is greater then the max_move")
+        self._start_auto_move(axis, target)
+        return
+
+    def _start_auto_move(self, axis, target):
+        """Set the target (in m) of an axis and enable its closed-loop approach."""
         self.check_error(self.lib.setTargetPosition(self.device, axis, target))
         enable = 0x01
         relative = 0x00
         self.check_error(self.lib.startAutoMove(self.device, axis, enable, relative))
-        return
 
     MAX_RELATIVE_MOVE = Q_(10e-6, 'um')
     @Action()
@@ -170,15 +168,70 @@ class ANC350(LibraryDriver):
     # These action are much slower but they ensure the move completed
     @Action(units=(None, 'um', 'um', None, 'seconds', None, None))
     def cl_move(self, axis, pos, delta_z=Q_(0.1,'um'), iter_n=10, delay=Q_(0.01, 's'), debug=False, max_iter=1000):
-        i = 0
-        while(not self.at_pos(Q_(pos, 'um'), delta_z=Q_(delta_z, 'um'), iter_n=iter_n, delay=Q_(delay,'s'))):
-            self.position[axis] = Q_(pos, 'um')
-            i += 1
-            if i>=max_iter:
-                raise Exception("Reached max_iter")
-        if debug: print("It took {} iterations to move to position".format(i))
+        self.cl_move_axes({axis: pos}, delta_z=delta_z, settle_n=iter_n, min_delay=delay, max_iter=max_iter,
+                          debug=debug)
         return
 
+    @Action()
+    def cl_move_axes(self, targets, delta_z=Q_(0.1, 'um'), settle_n=1, min_delay=Q_(0.005, 's'),
+                     max_delay=Q_(0.1, 's'), max_iter=1000, max_move=MAX_ABSOLUTE_MOVE, debug=False):
+        """Closed-loop move of several axes at once.
+
+        All axes are started with their own auto move and then a single loop
+        polls the target flag of every pending axis. The polling interval
+        stays at min_delay while an axis is on target or settles, and doubles
+        up to max_delay while no axis is on target.
+
+        :param targets: dict mapping axis to target position (um).
+        :param delta_z: target range applied to every axis (um), None to keep the current one.
+        :param settle_n: consecutive polls an axis must report on target.
+        :param max_move: maximum distance from the current position, None to disable the check.
+        """
+        targets = {axis: self._to_magnitude(pos, 'um') for axis, pos in targets.items()}
+        min_delay = self._to_magnitude(min_delay, 's')
+        max_delay = max(self._to_magnitude(max_delay, 's'), min_delay)
+
+        if not max_move is None:
+            max_move = self._to_magnitude(max_move, 'um')
+            for axis, pos in targets.items():
+                if abs(self.position[axis].to('um').magnitude - pos) > max_move:
+                    raise Exception("Move of axis {} (target-current) is greater then the max_move".format(axis))
+
+        for axis, pos in targets.items():
+            if not delta_z is None:
+                self.set_target_range(axis, self._to_magnitude(delta_z, 'um') * 1e-6)
+            self._start_auto_move(axis, pos * 1e-6)
+
+        pending = {axis: 0 for axis in targets}
+        delay = min_delay
+        for i in range(max_iter):
+            time.sleep(delay)
+            settled = []
+            for axis in pending:
+                status = self._axis_status(axis)
+                if status['error'] or status['eot_fwd'] or status['eot_bwd']:
+                    raise Exception("Axis {} stopped before reaching target: {}".format(axis, status))
+                pending[axis] = pending[axis] + 1 if status['target'] else 0
+                if pending[axis] >= settle_n:
+                    settled.append(axis)
+            for axis in settled:
+                del pending[axis]
+            if not pending:
+                break
+            on_target = settled or any(pending.values())
+            delay = min_delay if on_target else min(2 * delay, max_delay)
+        else:
+            raise Exception("Reached max_iter with axes {} still moving".format(sorted(pending)))
+
+        if debug: print("It took {} iterations to move to position".format(i + 1))
+        return
+
+    @staticmethod
+    def _to_magnitude(value, units):
+        if hasattr(value, 'to'):
+            return value.to(units).magnitude
+        return value
+
     @Action(units=(None, 'um', 'um', None, 'seconds'))
     def at_pos(self, axis, pos, delta_z=Q_(0.1,'um'), iter_n=10, delay=Q_(0.01, 's')):
         for i in range(iter_n):
@@ -2,6 +2,13 @@ from lantz.foreign import LibraryDriver
 from lantz import Feat, Action
 from ctypes import c_long, c_int, c_uint, c_double, c_float, byref, POINTER, pointer
 
+import time
+
+import numpy as np
+
+# Speed of light in nm * GHz
+C_NM_GHZ = 299792458.
+
 class Bristol621(LibraryDriver):
 
     LIBRARY_NAME = 'CLDevIFace.dll'
@@ -24,10 +31,14 @@ class Bristol621(LibraryDriver):
 
         self.address = address
         self.handle = None
+        self._lambda_units = None
+        self._power_units = None
         return
 
     def initialize(self):
         self.handle = self.lib.OpenUSBSerialDevice(self.address)
+        self._lambda_units = None
+        self._power_units = None
         return
 
     def finalize(self):
@@ -39,23 +50,71 @@ class Bristol621(LibraryDriver):
         self.lib.SetAcqFreq(self.handle, f)
         return
 
-    @Feat(units='nm')
-    def wavelength(self):
-        self.lib.SetLambdaUnits(self.handle, 0)
+    @Feat(values={'nm': 0, 'GHz': 1})
+    def lambda_units(self):
+        """Units of the device wavelength reading. Reading wavelength and
+        frequency does not change them, the conversion is done here.
+        """
+        if self._lambda_units is None:
+            self._set_lambda_units(0)
+        return self._lambda_units
+
+    @lambda_units.setter
+    def lambda_units(self, value):
+        self._set_lambda_units(value)
+
+    def _set_lambda_units(self, value):
+        if value != self._lambda_units:
+            self.lib.SetLambdaUnits(self.handle, value)
+            self._lambda_units = value
+
+    def _read_lambda(self, units):
+        """Reading converted to units (0: nm, 1: GHz)"""
+        if self._lambda_units is None:
+            self._set_lambda_units(units)
         value = self.lib.GetLambdaReading(self.handle)
+        if self._lambda_units != units and value:
+            value = C_NM_GHZ / value
         return value
 
+    def _read_power(self):
+        if self._power_units != 0:
+            self.lib.SetPowerUnits(self.handle, 0)
+            self._power_units = 0
+        return self.lib.GetPowerReading(self.handle)
+
+    @Feat(units='nm')
+    def wavelength(self):
+        return self._read_lambda(0)
+
     @Feat(units='GHz')
     def frequency(self):
-        self.lib.SetLambdaUnits(self.handle, 1)
-        value = self.lib.GetLambdaReading(self.handle)
-        return value
+        return self._read_lambda(1)
 
     @Feat(units='mW')
     def power(self):
-        self.lib.SetPowerUnits(self.handle, 0)
-        value = self.lib.GetPowerReading(self.handle)
-        return value
+        return self._read_power()
+
+    @Action()
+    def sample(self, n, interval=0):
+        """Take n wavelength and power readings, interval seconds apart (0
+        for as fast as possible).
+
+        Returns three arrays: timestamps (s), wavelength (nm) and power (mW).
+        """
+        timestamps = np.empty(n)
+        wavelengths = np.empty(n)
+        powers = np.empty(n)
+        start = time.time()
+        for i in range(n):
+            if interval:
+                wait = start + i * interval - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+            timestamps[i] = time.time()
+            wavelengths[i] = self._read_lambda(0)
+            powers[i] = self._read_power()
+        return timestamps, wavelengths, powers
 
 if __name__ == '__main__':
     b = Bristol621(5)
@@ -1,36 +1,89 @@
 from lantz.driver import Driver
 from lantz import Feat, Action
 
-from telnetlib import Telnet
+import socket
+import threading
+import time
+
+import numpy as np
+
+# Speed of light in nm * THz
+C_NM_THZ = 299792.458
+
 
 class Bristol671(Driver):
 
+    RECV_CHUNK = 4096
+
+    #: Wait in seconds before fetching again when there is no new measurement.
+    SAMPLE_POLL_INTERVAL = 0.02
+
     def __init__(self, ip, port=23, timeout=1):
         super().__init__()
         self.con_args = [ip,port,timeout]
+        self.resource = None
+        self._received = bytearray()
+        self._units = dict()
+        self._io_lock = threading.RLock()
+
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+        self._samples = None
+        self._sample_count = 0
 
     def initialize(self):
-        self.resource = Telnet(*self.con_args)
+        ip, port, timeout = self.con_args
+        self.resource = socket.create_connection((ip, port), timeout)
+        self.resource.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._received = bytearray()
+        self._units = dict()
         self.clear_read_buffer()
-    
+
     def clear_read_buffer(self, timeout=0.1):
         while self.read(timeout=timeout) != '':
             pass
 
     def finalize(self):
+        self.stop_sampling()
         self.resource.close()
 
     def write(self, cmd, write_termination='\r\n'):
-        return self.resource.write(bytes(cmd+write_termination, 'ascii'))
+        return self.resource.sendall(bytes(cmd+write_termination, 'ascii'))
 
     def read(self, read_termination='\r\n', timeout=1):
-        byte_ans = self.resource.read_until(bytes(read_termination, 'ascii'), timeout)
-        ans = byte_ans.decode('ascii')
+        """Read up to read_termination, returns '' on timeout.
+        """
+        termination = bytes(read_termination, 'ascii')
+        self.resource.settimeout(timeout)
+        start = 0
+        while True:
+            end = self._received.find(termination, start)
+            if end >= 0:
+                break
+            start = max(0, len(self._received) - len(termination) + 1)
+            try:
+                chunk = self.resource.recv(self.RECV_CHUNK)
+            except socket.timeout:
+                chunk = b''
+            if not chunk:
+                end = len(self._received)
+                break
+            self._received += chunk
+        ans = self._received[:end].decode('ascii', errors='ignore')
+        del self._received[:end + len(termination)]
         return ans.strip(read_termination)
 
     def query(self, cmd, write_termination='\r\n', read_termination='\r\n'):
-        self.write(cmd, write_termination=write_termination)
-        return self.read(read_termination=read_termination)
+        with self._io_lock:
+            self.write(cmd, write_termination=write_termination)
+            return self.read(read_termination=read_termination)
+
+    def _set_unit(self, quantity, unit):
+        """Send :UNIT:<quantity> only if it differs from the cached one.
+        """
+        if self._units.get(quantity) != unit:
+            self.write(':UNIT:{} {}'.format(quantity, unit))
+            self._units[quantity] = unit
 
     @Feat()
     def idn(self):
@@ -38,13 +91,92 @@ class Bristol671(Driver):
 
     @Feat(units='nm')
     def wavelength(self):
-        return float(self.query(':MEAS:WAV?'))
+        with self._io_lock:
+            self._set_unit('WAV', 'NM')
+            return float(self.query(':MEAS:WAV?'))
 
     @Feat(units='THz')
     def frequency(self):
-        return float(self.query(':MEAS:FREQ?'))
+        with self._io_lock:
+            self._set_unit('WAV', 'NM')
+            return float(self.query(':MEAS:FREQ?'))
 
     @Feat(units='mW')
     def power(self):
-        self.write(':UNIT:POW MW')
-        return float(self.query(':MEAS:POW?'))
+        with self._io_lock:
+            self._set_unit('POW', 'MW')
+            return float(self.query(':MEAS:POW?'))
+
+    def _read_all(self, command):
+        with self._io_lock:
+            self._set_unit('WAV', 'NM')
+            self._set_unit('POW', 'MW')
+            index, status, wavelength, power = self.query(command).split(',')
+        return int(index), int(status), float(wavelength), float(power)
+
+    @Action()
+    def measure_all(self):
+        """Scan index, status, wavelength (nm), frequency (THz) and power (mW)
+        of the next measurement, fetched in a single query.
+
+        The frequency is computed from the wavelength, which assumes that the
+        instrument reports vacuum wavelengths.
+        """
+        index, status, wavelength, power = self._read_all(':MEAS:ALL?')
+        return {'scan_index': index, 'status': status, 'wavelength': wavelength,
+                'frequency': C_NM_THZ / wavelength if wavelength else float('nan'),
+                'power': power}
+
+    @Action()
+    def start_sampling(self, size=10000):
+        """Start a thread that fetches every new measurement (:FETC:ALL?) and
+        stores it in a ring buffer of size rows.
+
+        See samples for the layout.
+        """
+        self.stop_sampling()
+        self._samples = np.full((size, 4), np.nan)
+        self._sample_count = 0
+        self._stop_sampling.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name='Bristol671 sampler', daemon=True)
+        self._sampler.start()
+
+    @Action()
+    def stop_sampling(self):
+        """Stop the sampling thread, if running.
+        """
+        if self._sampler is None:
+            return
+        self._stop_sampling.set()
+        self._sampler.join()
+        self._sampler = None
+
+    @Action()
+    def samples(self):
+        """Sampled measurements in chronological order, as an array with
+        columns: timestamp, scan index, wavelength (nm), power (mW).
+        """
+        if self._samples is None:
+            return np.empty((0, 4))
+        with self._io_lock:
+            size = len(self._samples)
+            if self._sample_count <= size:
+                return self._samples[:self._sample_count].copy()
+            return np.roll(self._samples, -(self._sample_count % size), axis=0)
+
+    def _sample_loop(self):
+        last_index = None
+        while not self._stop_sampling.is_set():
+            try:
+                index, status, wavelength, power = self._read_all(':FETC:ALL?')
+            except (socket.error, ValueError) as e:
+                self.log_error('Sampling failed: {}'.format(e))
+                self._stop_sampling.wait(0.1)
+                continue
+            if index == last_index:
+                self._stop_sampling.wait(self.SAMPLE_POLL_INTERVAL)
+                continue
+            last_index = index
+            with self._io_lock:
+                self._samples[self._sample_count % len(self._samples)] = (time.time(), index, wavelength, power)
+                self._sample_count += 1
@@ -38,6 +38,8 @@ import math
 from time import time
 import struct
 
+import numpy as np
+
 WINDOWS = "Windows"
 ON_WINDOWS = (os.name == 'nt')
 
@@ -342,6 +344,78 @@ class BitField(object):
         """
         return other + self.asByte()
 
+GAIN_TABLE = np.array([ 1.0, 2.0, 4.0, 5.0, 8.0, 10.0, 16.0, 20.0 ])
+
+def pgaMuxToChannel(pgamux):
+    """
+    Name: pgaMuxToChannel(pgamux)
+    Args: pgamux, a byte with the PGA (bits 6-4) and MUX (bits 3-0) settings
+    Desc: Returns the (channel number, gain index) encoded in a PGAMUX byte,
+          following the convention of bitsToVolts.
+    """
+    pgamux = int(pgamux)
+    tempNum = pgamux & 7 # 7 = 0b111
+    channelNumber = tempNum if (pgamux & 0xf) > 7 else tempNum+8
+    channelGain = (pgamux >> 4) & 7 # 7 = 0b111
+    return channelNumber, channelGain
+
+def bitsToVoltsArray(channelNumbers, channelGains, bits):
+    """
+    Name: bitsToVoltsArray(channelNumbers, channelGains, bits)
+    Args: channelNumbers, the channel number of each column of bits
+          channelGains, the gain index of each column of bits
+          bits, an (N, channels) array of 12-bit codes
+    Desc: Vectorized version of U12.bitsToVolts. Returns an array of voltages
+          with the same shape as bits.
+    """
+    channelNumbers = np.asarray(channelNumbers)
+    gains = GAIN_TABLE[np.asarray(channelGains)]
+    bits = np.asarray(bits, dtype=np.float64)
+    singleEnded = channelNumbers < 8
+    scale = np.where(singleEnded, 20.0 / 4096.0, 40.0 / 4096.0 / gains)
+    offset = np.where(singleEnded, -10.0, -20.0 / gains)
+    return bits * scale + offset
+
+def decodeAIReports(reports, channelNumbers, channelGains):
+    """
+    Name: decodeAIReports(reports, channelNumbers, channelGains)
+    Args: reports, an (N, 8) uint8 array (or a flat sequence of 8 byte
+                   reports) of AIBurst/AIStream responses
+          channelNumbers, the channel number of channels 0-3
+          channelGains, the gain index of channels 0-3
+    Desc: Decodes all the reports at once with NumPy bit operations.
+
+    Returns: A dictionary with the following keys, all numpy arrays of
+             length N:
+        Channel0-3, the readings on the channels in volts
+        PGAOvervoltages, the over-voltage flags
+        BufferOverflowOrChecksumErrors, the overflow/checksum error flags
+        IO3toIO0States, the IO states, IO0 in bit 0
+        IterationCounters, the values of the iteration counter
+        Backlogs, value*256 = number of packets in the backlog.
+    """
+    reports = np.asarray(reports, dtype=np.uint8).reshape(-1, 8)
+    byte0 = reports[:, 0]
+    bad = (byte0 & 0xc0) != 0x80
+    if bad.any():
+        raise U12Exception("Expected a AIBurst response, got %s instead." % byte0[bad][0])
+
+    high = reports[:, [2, 2, 5, 5]].astype(np.uint16)
+    high[:, [0, 2]] >>= 4
+    high &= 0xf
+    bits = (high << 8) | reports[:, [3, 4, 6, 7]]
+    volts = bitsToVoltsArray(channelNumbers, channelGains, bits)
+
+    returnDict = {}
+    returnDict['BufferOverflowOrChecksumErrors'] = (byte0 & 0x20) != 0
+    returnDict['PGAOvervoltages'] = (byte0 & 0x10) != 0
+    returnDict['IO3toIO0States'] = byte0 & 0xf
+    returnDict['IterationCounters'] = reports[:, 1] >> 5
+    returnDict['Backlogs'] = reports[:, 1] & 0xf
+    for channel in range(4):
+        returnDict['Channel%d' % channel] = volts[:, channel]
+    return returnDict
+
 def errcheck(ret, func, args):
     if ret == -1:
         try:
@@ -544,6 +618,27 @@ class U12(object):
             if self.debug: print("Received:", hexWithoutQuotes(result))
             return result
 
+    def readReports(self, reports):
+        """
+        Name: U12.readReports(reports)
+        Args: reports, a writable (N, 8) uint8 numpy array
+        Desc: Reads N consecutive 8 byte reports directly into reports,
+              without building Python lists.
+        """
+        if ON_WINDOWS:
+            pass
+        else:
+            if self.handle is None:
+                raise U12Exception("The U12's handle is None. Please open a U12 with open()")
+            size = reports.shape[1]
+            buffer = (ctypes.c_ubyte * reports.size).from_buffer(reports)
+            for i in range(reports.shape[0]):
+                readBytes = staticLib.LJUSB_Read(self.handle, ctypes.byref(buffer, i * size), size)
+                if readBytes != size:
+                    raise U12Exception("Could only read %s of %s bytes." % (readBytes, size))
+            if self.debug: print("Received:", reports)
+            return reports
+
 
     # Low-level helpers
     def rawReadSerial(self):
@@ -1057,11 +1152,12 @@ class U12(object):
               By default, it does single-ended readings on AI0-4 at 100Hz for 8
               scans.
               
-        Returns: A dictionary with the following keys:
-            Channel0-3, A list of the readings on the channels
-            PGAOvervoltages, A list of the over-voltage flags
-            IO3toIO0State, A list of the IO states
-            IterationCounters, A list of the values of the iteration counter
+        Returns: A dictionary with the following keys, all numpy arrays
+                 (see decodeAIReports):
+            Channel0-3, The readings on the channels
+            PGAOvervoltages, The over-voltage flags
+            IO3toIO0States, The IO states, IO0 in bit 0
+            IterationCounters, The values of the iteration counter
             Backlogs, value*256 = number of packets in the backlog.
             BufferOverflowOrChecksumErrors, If True and Backlog = 31,
                                             then a buffer overflow occurred. If
@@ -1073,56 +1169,33 @@ class U12(object):
         >>> d = u12.U12()
         >>> d.rawAIBurst()
         {
-          'Channel0': [1.484375, 1.513671875, ... , 1.46484375],
+          'Channel0': array([1.484375, 1.513671875, ... , 1.46484375]),
           
-          'Channel1': [1.455078125, 1.455078125, ... , 1.455078125],
+          'Channel1': array([1.455078125, 1.455078125, ... , 1.455078125]),
           
-          'Channel2': [1.46484375, 1.474609375, ... , 1.46484375],
+          'Channel2': array([1.46484375, 1.474609375, ... , 1.46484375]),
           
-          'Channel3': [1.435546875, 1.42578125, ... , 1.435546875],
+          'Channel3': array([1.435546875, 1.42578125, ... , 1.435546875]),
           
-          'PGAOvervoltages': [False, False, ..., False],
+          'PGAOvervoltages': array([False, False, ..., False]),
           
-          'IO3toIO0States': 
-            [<BitField object: [ IO3 = Low (0), IO2 = Low (0), IO1 = Low (0),
-                                 IO0 = Low (0) ] >, ... ],
+          'IO3toIO0States': array([0, 0, 0, 0, 0, 0, 0, 0], dtype=uint8),
           
-          'IterationCounters': [0, 1, 2, 3, 4, 5, 6, 0],
+          'IterationCounters': array([0, 1, 2, 3, 4, 5, 6, 0], dtype=uint8),
           
-          'Backlogs': [0, 0, 0, 0, 0, 0, 0, 0],
+          'Backlogs': array([0, 0, 0, 0, 0, 0, 0, 0], dtype=uint8),
           
-          'BufferOverflowOrChecksumErrors': [False, False, ... , False]
+          'BufferOverflowOrChecksumErrors': array([False, False, ... , False])
         }
 
         
         """
         command = [ 0 ] * 8
         
-        # Bits 6-4: PGA for 1st Channel
-        # Bits 3-0: MUX command for 1st Channel
-        command[0] = int(channel0PGAMUX)
-        
-        tempNum = command[0] & 7 # 7 = 0b111
-        channel0Number = tempNum if (command[0] & 0xf) > 7 else tempNum+8
-        channel0Gain = (command[0] >> 4) & 7 # 7 = 0b111
-        
-        command[1] = int(channel1PGAMUX)
-        
-        tempNum = command[1] & 7 # 7 = 0b111
-        channel1Number = tempNum if (command[1] & 0xf) > 7 else tempNum+8
-        channel1Gain = (command[1] >> 4) & 7 # 7 = 0b111
-        
-        command[2] = int(channel2PGAMUX)
-        
-        tempNum = command[2] & 7 # 7 = 0b111
-        channel2Number = tempNum if (command[2] & 0xf) > 7 else tempNum+8
-        channel2Gain = (command[2] >> 4) & 7 # 7 = 0b111
-        
-        command[3] = int(channel3PGAMUX)
-        
-        tempNum = command[3] & 7 # 7 = 0b111
-        channel3Number = tempNum if (command[3] & 0xf) > 7 else tempNum+8
-        channel3Gain = (command[3] >> 4) & 7 # 7 = 0b111
+        # Bits 6-4: PGA for each Channel
+        # Bits 3-0: MUX command for each Channel
+        command[0:4] = [int(channel0PGAMUX), int(channel1PGAMUX), int(channel2PGAMUX), int(channel3PGAMUX)]
+        channelNumbers, channelGains = zip(*[pgaMuxToChannel(pgamux) for pgamux in command[0:4]])
 
         if NumberOfScans > 1024 or NumberOfScans < 8:
             raise U12Exception("The number of scans must be between 1024 and 8 (inclusive)")
@@ -1155,96 +1228,24 @@ class U12(object):
         
         self.write(command)
         
-        resultsList = []
-        for i in range(NumScans):
-            resultsList.append(self.read())
-            
-            
-        returnDict = {}
-        
-        returnDict['BufferOverflowOrChecksumErrors'] = list()
-        returnDict['PGAOvervoltages'] = list()
-        returnDict['IO3toIO0States'] = list()
-        
-        returnDict['IterationCounters'] = list()
-        returnDict['Backlogs'] = list()
-
-        returnDict['Channel0'] = list()
-        
-        returnDict['Channel1'] = list()
-        
-        returnDict['Channel2'] = list()
-        
-        returnDict['Channel3'] = list()
-        
-        for results in resultsList:
-            bf = BitField(rawByte = results[0])
-            
-            if bf.bit7 != 1 or bf.bit6 != 0:
-                raise U12Exception("Expected a AIBurst response, got %s instead." % results[0])
-            
-            returnDict['BufferOverflowOrChecksumErrors'].append(bool(bf.bit5))
-            returnDict['PGAOvervoltages'].append(bool(bf.bit4))
-            returnDict['IO3toIO0States'].append(BitField(results[0], "IO", list(range(3, -1, -1)), "Low", "High"))
-            
-            returnDict['IterationCounters'].append((results[1] >> 5))
-            returnDict['Backlogs'].append(results[1] & 0xf)
-            
-            channel0 = (results[2] >> 4) & 0xf
-            channel1 = (results[2] & 0xf)
-            channel2 = (results[5] >> 4) & 0xf
-            channel3 = (results[5] & 0xf)
-            
-            channel0 = (channel0 << 8) + results[3]
-            returnDict['Channel0'].append(self.bitsToVolts(channel0Number, channel0Gain, channel0))
-            
-            channel1 = (channel1 << 8) + results[4]
-            returnDict['Channel1'].append(self.bitsToVolts(channel1Number, channel1Gain, channel1))
-            
-            channel2 = (channel2 << 8) + results[6]
-            returnDict['Channel2'].append(self.bitsToVolts(channel2Number, channel2Gain, channel2))
-            
-            channel3 = (channel3 << 8) + results[7]
-            returnDict['Channel3'].append(self.bitsToVolts(channel3Number, channel3Gain, channel3))
-            
-        return returnDict
-
+        reports = np.empty((NumScans, 8), dtype=np.uint8)
+        self.readReports(reports)
         
+        return decodeAIReports(reports, channelNumbers, channelGains)
         
-    def rawAIContinuous(self, channel0PGAMUX = 8, channel1PGAMUX = 9, channel2PGAMUX = 10, channel3PGAMUX = 11, FeatureReports = False, CounterRead = False, UpdateIO = False, LEDState = True, IO3ToIO0States = 0, SampleInterval = 15000):
+    def rawAIContinuous(self, channel0PGAMUX = 8, channel1PGAMUX = 9, channel2PGAMUX = 10, channel3PGAMUX = 11, FeatureReports = False, CounterRead = False, UpdateIO = False, LEDState = True, IO3ToIO0States = 0, SampleInterval = 15000, ScansPerRead = 1):
         """
         Currently in development.
         
-        The function is mostly implemented, but is currently too slow to be 
-        useful.
+        Starts continuous acquisition and yields, for every ScansPerRead
+        scans, the dictionary returned by decodeAIReports.
         """
         command = [ 0 ] * 8
         
-        # Bits 6-4: PGA for 1st Channel
-        # Bits 3-0: MUX command for 1st Channel
-        command[0] = int(channel0PGAMUX)
-        
-        tempNum = command[0] & 7 # 7 = 0b111
-        channel0Number = tempNum if (command[0] & 0xf) > 7 else tempNum+8
-        channel0Gain = (command[0] >> 4) & 7 # 7 = 0b111
-        
-        command[1] = int(channel1PGAMUX)
-        
-        tempNum = command[1] & 7 # 7 = 0b111
-        channel1Number = tempNum if (command[1] & 0xf) > 7 else tempNum+8
-        channel1Gain = (command[1] >> 4) & 7 # 7 = 0b111
-        
-        command[2] = int(channel2PGAMUX)
-        
-        tempNum = command[2] & 7 # 7 = 0b111
-        channel2Number = tempNum if (command[2] & 0xf) > 7 else tempNum+8
-        channel2Gain = (command[2] >> 4) & 7 # 7 = 0b111
-        
-        command[3] = int(channel3PGAMUX)
-        
-        tempNum = command[3] & 7 # 7 = 0b111
-        channel3Number = tempNum if (command[3] & 0xf) > 7 else tempNum+8
-        channel3Gain = (command[3] >> 4) & 7 # 7 = 0b111
+        # Bits 6-4: PGA for each Channel
+        # Bits 3-0: MUX command for each Channel
+        command[0:4] = [int(channel0PGAMUX), int(channel1PGAMUX), int(channel2PGAMUX), int(channel3PGAMUX)]
+        channelNumbers, channelGains = zip(*[pgaMuxToChannel(pgamux) for pgamux in command[0:4]])
         
         bf = BitField()
         bf.bit7 = int(bool(FeatureReports))
@@ -1264,21 +1265,13 @@ class U12(object):
         command[6] = ( SampleInterval >> 8)
         command[7] = SampleInterval & 0xff
         
-        byte0bf = BitField()
-        returnDict = dict()
+        reports = np.empty((ScansPerRead, 8), dtype=np.uint8)
         
         self.write(command)
         while True:
-            results = self.read()
-            
-            byte0bf.fromByte(results[0])
-            
-            returnDict['Byte0'] = byte0bf
-            returnDict['IterationCounter'] = (results[1] >> 5)
-            returnDict['Backlog'] = results[1] & 0xf
+            self.readReports(reports)
             
-            
-            yield returnDict
+            yield decodeAIReports(reports, channelNumbers, channelGains)
     
     
     def rawPulseout(self, B1 = 10, C1 = 2, B2 = 10, C2 = 2, D7ToD0PulseSelection = 1, ClearFirst = False, NumberOfPulses = 5):
@@ -2288,6 +2281,8 @@ class U12(object):
 
         if ecode != 0: raise U12Exception(ecode) # TODO: Switch this out for exception
         
+        self.streaming = False
+        
     def aoUpdate(self, idNum=None, demo=0, trisD=None, trisIO=None, stateD=None, stateIO=None, updateDigital=0, resetCounter=0, analogOut0=0, analogOut1=0):
         """
         Name: U12.aoUpdate()
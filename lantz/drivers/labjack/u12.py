@@ -17,6 +17,8 @@
 """
 
 
+import numpy as np
+
 from lantz import Feat, Action, DictFeat
 from lantz import Driver
 from lantz import errors
@@ -41,6 +43,8 @@ class U12(Driver):
 	http://labjack.com/support/u12/users-guide
         For details about the commands, refer to the users guide.
     """
+    GAINS = [1, 2, 4, 5, 8, 10, 16, 20]
+
     def __init__(self, board_id):
         super().__init__()
         self._internal = _u12.U12(board_id) 
@@ -89,6 +93,64 @@ class U12(Driver):
         else:
             return self._internal.eAnalogIn(channel = key + 8, gain = gain_value)['voltage']
     
+    '''
+    Hardware timed acquisition. Channels 0-7 are the single-ended inputs AI0-7, 8-11 the differential pairs. 1, 2 or 4 channels
+    can be scanned. The UW driver fills c_float[4096][4] buffers (scan major), which are exposed as numpy views of shape
+    (scans, channels) without copying element by element.
+    '''
+    def _scan_args(self, channels, gains):
+        channels = list(channels)
+        if len(channels) not in (1, 2, 4):
+            raise errors.InstrumentError('Only 1, 2 or 4 channels can be scanned')
+        if gains is None:
+            gains = [1] * len(channels)
+        if any(gain not in self.GAINS for gain in gains):
+            raise errors.InstrumentError('Gain value not permitted, check driver code or Labjack user guide')
+        gains = [self.GAINS.index(gain) for gain in gains] + [0] * (4 - len(channels))
+        return channels, gains
+
+    @staticmethod
+    def _voltages_array(voltages, scans, channels):
+        return np.frombuffer(voltages, dtype=np.float32).reshape(4096, 4)[:scans, :channels]
+
+    @Action()
+    def burst(self, channels=(0,), scan_rate=1000, scans=1024, gains=None, trigger_io=0, trigger_state=0, timeout=1):
+        '''
+        Reads scans (up to 4096) at scan_rate (up to 8192 Hz) from the given channels. Acquisition is timed by the U12 and
+        can be started by a trigger on IO trigger_io (1-4, 0 for no trigger).
+        Returns an array of shape (scans, channels) in volts.
+        '''
+        channels, gains = self._scan_args(channels, gains)
+        ret = self._internal.aiBurst(len(channels), channels, scan_rate, scans, gains=gains, triggerIO=trigger_io,
+                                     triggerState=trigger_state, timeout=timeout)
+        if ret['overVoltage']:
+            self.log_warning('Overvoltage detected during burst')
+        return self._voltages_array(ret['voltages'], scans, len(channels))
+
+    @Action()
+    def stream(self, channels=(0,), scan_rate=1000, scans_per_read=256, gains=None, timeout=1):
+        '''
+        Starts a hardware timed continuous acquisition of the given channels at scan_rate and returns a generator. Every
+        iteration waits for scans_per_read scans and yields them as an array of shape (scans_per_read, channels) in volts,
+        together with the backlog of scans still buffered. The stream is started on the first iteration and stopped
+        when the generator is closed.
+        '''
+        channels, gains = self._scan_args(channels, gains)
+        return self._stream_reader(channels, gains, scan_rate, scans_per_read, timeout)
+
+    def _stream_reader(self, channels, gains, scan_rate, scans_per_read, timeout):
+        # Start and clear share the lifetime of the generator, so a generator that is never iterated never
+        # leaves the U12 streaming.
+        self._internal.aiStreamStart(len(channels), channels, scan_rate, gains=gains)
+        try:
+            while True:
+                ret = self._internal.aiStreamRead(scans_per_read, timeout=timeout)
+                if ret['overVoltage']:
+                    self.log_warning('Overvoltage detected during stream')
+                yield self._voltages_array(ret['voltages'], scans_per_read, len(channels)), ret['ljScanBacklog']
+        finally:
+            self._internal.aiStreamClear()
+
     # ANALOG OUTPUT METHOD
     analog_out = DictFeat(units = 'volts', keys=list(range(0,2)))
     @analog_out.setter                       
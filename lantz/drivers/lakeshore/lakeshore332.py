@@ -7,7 +7,10 @@
 
 from lantz import Feat, Action, DictFeat
 from lantz.messagebased import MessageBasedDriver
-from time import sleep
+from time import sleep, time
+import threading
+
+import numpy as np
 
 
 class Lakeshore332(MessageBasedDriver):
@@ -45,6 +48,110 @@ class Lakeshore332(MessageBasedDriver):
 
     _verbose = True
 
+    # Time the controller needs after a setting command, in seconds
+    settle_time = 0.05
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._settled_at = 0
+        self._log_buffer = None
+        self._log_count = 0
+        self._log_lock = threading.Lock()
+        self._logger = None
+        self._stop_logging = threading.Event()
+
+    def write(self, command, *args, **kwargs):
+        """
+        Waits until the last setting command settled before writing.
+        """
+        remaining = self._settled_at - time()
+        if remaining > 0:
+            sleep(remaining)
+        return super().write(command, *args, **kwargs)
+
+    @property
+    def snapshot_fields(self):
+        """
+        Names of the values returned by snapshot, in order.
+        """
+        return (['kelvin_meas_{}'.format(channel) for channel in self.channels] +
+                ['heater_output_1', 'heater_output_2'] +
+                ['setpoint_{}'.format(loop) for loop in self.loops])
+
+    @Action()
+    def snapshot(self):
+        """
+        Returns the temperatures of all channels, the heater outputs and the
+        setpoints of all loops (see snapshot_fields) read with a single
+        semicolon-joined query.
+        """
+        commands = (['KRDG?{}'.format(channel) for channel in self.channels] +
+                    ['HTR?', 'AOUT?'] +
+                    ['SETP?{}'.format(loop) for loop in self.loops])
+        values = self.query(';'.join(commands)).strip().split(';')
+        return dict(zip(self.snapshot_fields, (float(value) for value in values)))
+
+    @Action()
+    def start_logging(self, interval=1.0, size=86400):
+        """
+        Starts a thread that takes a snapshot every interval seconds and
+        stores it with its timestamp in a ring buffer of size rows.
+        """
+        self.stop_logging()
+        with self._log_lock:
+            self._log_buffer = np.full((size, 1 + len(self.snapshot_fields)), np.nan)
+            self._log_count = 0
+        self._stop_logging.clear()
+        self._logger = threading.Thread(target=self._log_loop, args=(interval,),
+                                        name='Lakeshore332 logger', daemon=True)
+        self._logger.start()
+
+    @Action()
+    def stop_logging(self):
+        """
+        Stops the logging thread, if running.
+        """
+        if self._logger is None:
+            return
+        self._stop_logging.set()
+        self._logger.join()
+        self._logger = None
+
+    @Action()
+    def logged_data(self):
+        """
+        Returns the logged rows in chronological order, as an array with the
+        timestamp in the first column followed by snapshot_fields.
+        """
+        with self._log_lock:
+            if self._log_buffer is None:
+                return np.empty((0, 1 + len(self.snapshot_fields)))
+            size = len(self._log_buffer)
+            if self._log_count <= size:
+                return self._log_buffer[:self._log_count].copy()
+            start = self._log_count % size
+            return np.roll(self._log_buffer, -start, axis=0)
+
+    def _log_loop(self, interval):
+        fields = self.snapshot_fields
+        while not self._stop_logging.is_set():
+            start = time()
+            try:
+                values = self.snapshot()
+            except Exception as e:
+                self.log_error('Snapshot failed: {}'.format(e))
+            else:
+                with self._log_lock:
+                    row = self._log_count % len(self._log_buffer)
+                    self._log_buffer[row, 0] = start
+                    self._log_buffer[row, 1:] = [values[field] for field in fields]
+                    self._log_count += 1
+            self._stop_logging.wait(max(0, interval - (time() - start)))
+
+    def finalize(self):
+        self.stop_logging()
+        super().finalize()
+
     @Feat()
     def idn(self):
         """
@@ -159,7 +266,7 @@ class Lakeshore332(MessageBasedDriver):
         Sets the setpoint of channel channel to value value
         """
         self.query('SETP{},{}'.format(loop, T_set))
-        sleep(0.05)
+        self._settled_at = time() + self.settle_time
         return
 
     @DictFeat(limits=(0, 100), keys=loops)
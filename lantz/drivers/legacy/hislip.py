@@ -0,0 +1,679 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz.drivers.legacy.hislip
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Implements a HiSLIPDriver based class to control instruments with the
+    High-Speed LAN Instrument Protocol (IVI-6.1).
+
+    HiSLIP uses two TCP connections to the same port: the synchronous
+    channel carries the data and trigger messages, the asynchronous channel
+    carries the service requests, status queries, device clear, lock and
+    remote/local control.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import enum
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from lantz import errors
+from lantz import Driver
+from lantz.drivers.legacy import rpc
+from lantz.drivers.legacy.network import LantzSocketTimeoutError
+from lantz.drivers.legacy.textual import TextualMixin
+
+
+HISLIP_PORT = 4880
+
+#: Protocol version 1.0, as major and minor bytes.
+PROTOCOL_VERSION = 0x0100
+
+#: Vendor ID sent to the server in the Initialize message.
+VENDOR_ID = b'LZ'
+
+#: Message ID of the first message sent after initialization or device clear.
+FIRST_MESSAGE_ID = 0xffffff00
+
+#: Prologue, message type, control code, message parameter and payload length.
+HEADER = struct.Struct('>2sBBIQ')
+
+
+class MESSAGE(enum.IntEnum):
+    INITIALIZE = 0
+    INITIALIZE_RESPONSE = 1
+    FATAL_ERROR = 2
+    ERROR = 3
+    ASYNC_LOCK = 4
+    ASYNC_LOCK_RESPONSE = 5
+    DATA = 6
+    DATA_END = 7
+    DEVICE_CLEAR_COMPLETE = 8
+    DEVICE_CLEAR_ACKNOWLEDGE = 9
+    ASYNC_REMOTE_LOCAL_CONTROL = 10
+    ASYNC_REMOTE_LOCAL_RESPONSE = 11
+    TRIGGER = 12
+    INTERRUPTED = 13
+    ASYNC_INTERRUPTED = 14
+    ASYNC_MAXIMUM_MESSAGE_SIZE = 15
+    ASYNC_MAXIMUM_MESSAGE_SIZE_RESPONSE = 16
+    ASYNC_INITIALIZE = 17
+    ASYNC_INITIALIZE_RESPONSE = 18
+    ASYNC_DEVICE_CLEAR = 19
+    ASYNC_SERVICE_REQUEST = 20
+    ASYNC_STATUS_QUERY = 21
+    ASYNC_STATUS_RESPONSE = 22
+    ASYNC_DEVICE_CLEAR_ACKNOWLEDGE = 23
+    ASYNC_LOCK_INFO = 24
+    ASYNC_LOCK_INFO_RESPONSE = 25
+
+
+class REMOTE_LOCAL(enum.IntEnum):
+    DISABLE_REMOTE = 0
+    ENABLE_REMOTE = 1
+    DISABLE_REMOTE_GO_TO_LOCAL = 2
+    ENABLE_REMOTE_GO_TO_REMOTE = 3
+    ENABLE_REMOTE_LOCK_OUT_LOCAL = 4
+    ENABLE_REMOTE_GO_TO_REMOTE_LOCK_OUT_LOCAL = 5
+    GO_TO_LOCAL = 6
+
+
+class LOCK_RESPONSE(enum.IntEnum):
+    FAILURE = 0
+    SUCCESS = 1
+    SUCCESS_SHARED = 2
+    ERROR = 3
+
+
+class HiSLIPError(errors.InstrumentError):
+    pass
+
+
+Message = namedtuple('Message', 'type control parameter payload')
+
+
+def send_message(sock, msg_type, control=0, parameter=0, payload=b''):
+    """Send a HiSLIP message, the header and the payload in a single
+    system call when possible.
+    """
+    header = HEADER.pack(b'HS', msg_type, control, parameter, len(payload))
+    if not payload:
+        return sock.sendall(header)
+    if hasattr(sock, 'sendmsg'):
+        sent = sock.sendmsg([header, payload])
+    else:
+        sent = 0
+    if sent < len(header):
+        sock.sendall(header[sent:])
+        sent = len(header)
+    if sent - len(header) < len(payload):
+        sock.sendall(memoryview(payload)[sent - len(header):])
+
+
+def recv_header(sock):
+    """Receive a HiSLIP message header.
+
+    :return: message type, control code, message parameter, payload length.
+    """
+    header = bytearray(HEADER.size)
+    rpc.recv_into_exactly(sock, memoryview(header))
+    prologue, msg_type, control, parameter, length = HEADER.unpack(header)
+    if prologue != b'HS':
+        raise HiSLIPError('Invalid message prologue {!r}'.format(bytes(prologue)))
+    return msg_type, control, parameter, length
+
+
+def recv_message(sock):
+    """Receive a complete HiSLIP message.
+
+    :rtype: Message
+    """
+    msg_type, control, parameter, length = recv_header(sock)
+    payload = bytearray(length)
+    rpc.recv_into_exactly(sock, memoryview(payload))
+    return Message(msg_type, control, parameter, payload)
+
+
+def skip_payload(sock, length, chunk=65536):
+    """Receive and discard length bytes.
+    """
+    scratch = memoryview(bytearray(min(length, chunk)))
+    while length:
+        size = min(length, len(scratch))
+        rpc.recv_into_exactly(sock, scratch[:size])
+        length -= size
+
+
+class HiSLIPDriver(Driver, TextualMixin):
+    """HiSLIP instrument interface client.
+
+    Each response is received as a whole message, delimited by the protocol,
+    so the data is binary safe and RECV_TERMINATION is only stripped from the
+    end of the text.
+
+    :param host: address of the instrument.
+    :param sub_address: HiSLIP device name, e.g. hislip0.
+    :param port: TCP port of the HiSLIP server.
+    """
+
+    RECV_TERMINATION = '\n'
+    SEND_TERMINATION = '\n'
+
+    #: Timeout in seconds of each network operation.
+    TIMEOUT = 10
+
+    #: Maximum size in bytes of the messages accepted from the server.
+    MAX_MESSAGE_SIZE = 1024 ** 2
+
+    #: Request overlapped mode, in which several messages can be sent
+    #: before reading the responses (see query_pipelined).
+    OVERLAPPED = True
+
+    def __init__(self, host='localhost', sub_address='hislip0', port=HISLIP_PORT, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.host_port = (host, port)
+        self.sub_address = sub_address
+
+        self.sync_socket = None
+        self.async_socket = None
+        self.lock_timeout = 10000
+
+        #: Session ID assigned by the server.
+        self.session_id = None
+        #: True if the server is in overlapped mode.
+        self.overlapped = False
+        #: Maximum size in bytes of the messages accepted by the server.
+        self.max_message_size = None
+
+        self._message_id = FIRST_MESSAGE_ID
+        self._last_message_id = None
+        self._rmt_delivered = False
+
+        # State of the response being received.
+        self._in_response = False
+        self._payload_left = 0
+        self._eom = False
+        self._response_id = None
+
+        self._async_lock = threading.Lock()
+        self._async_replies = queue.Queue()
+        self._async_thread = None
+
+        self._srq_callbacks = []
+        self._srq_event = threading.Event()
+
+    def initialize(self):
+        """Open the synchronous and asynchronous channels.
+        """
+        super().initialize()
+        self.log_debug('Opening HiSLIP session to {} {}', self.host_port, self.sub_address)
+
+        self.sync_socket = self._connect()
+        send_message(self.sync_socket, MESSAGE.INITIALIZE, 0,
+                     (PROTOCOL_VERSION << 16) | struct.unpack('>H', VENDOR_ID)[0],
+                     self.sub_address.encode('ascii'))
+        reply = self._expect(recv_message(self.sync_socket), MESSAGE.INITIALIZE_RESPONSE)
+        self.overlapped = bool(reply.control & 1)
+        self.session_id = reply.parameter & 0xffff
+
+        self.async_socket = self._connect()
+        send_message(self.async_socket, MESSAGE.ASYNC_INITIALIZE, 0, self.session_id)
+        self._expect(recv_message(self.async_socket), MESSAGE.ASYNC_INITIALIZE_RESPONSE)
+
+        send_message(self.async_socket, MESSAGE.ASYNC_MAXIMUM_MESSAGE_SIZE, 0, 0,
+                     struct.pack('>Q', self.MAX_MESSAGE_SIZE))
+        reply = self._expect(recv_message(self.async_socket), MESSAGE.ASYNC_MAXIMUM_MESSAGE_SIZE_RESPONSE)
+        self.max_message_size = struct.unpack('>Q', reply.payload)[0]
+
+        # The listener blocks until a message arrives or the channel is closed.
+        self.async_socket.settimeout(None)
+        self._async_thread = threading.Thread(target=self._async_loop, name='HiSLIP async listener', daemon=True)
+        self._async_thread.start()
+
+        if self.overlapped != bool(self.OVERLAPPED):
+            self.clear()
+
+    def finalize(self):
+        """Close both channels.
+        """
+        for sock in (self.async_socket, self.sync_socket):
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        if self._async_thread is not None:
+            self._async_thread.join()
+            self._async_thread = None
+        self._srq_callbacks = []
+        super().finalize()
+
+    def _connect(self):
+        sock = socket.create_connection(self.host_port, self.TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _expect(self, reply, msg_type):
+        if reply.type in (MESSAGE.ERROR, MESSAGE.FATAL_ERROR):
+            raise HiSLIPError('{} {}: {}'.format(MESSAGE(reply.type).name, reply.control,
+                                                 bytes(reply.payload).decode('ascii', 'replace')))
+        if reply.type != msg_type:
+            raise HiSLIPError('Expected {} message, received type {}'.format(MESSAGE(msg_type).name, reply.type))
+        return reply
+
+    def _next_message_id(self):
+        message_id = self._message_id
+        self._message_id = (message_id + 2) & 0xffffffff
+        self._last_message_id = message_id
+        return message_id
+
+    def _take_rmt_delivered(self):
+        rmt, self._rmt_delivered = self._rmt_delivered, False
+        return int(rmt)
+
+    # Synchronous channel
+
+    def raw_send(self, data):
+        """Send raw bytes through the synchronous channel.
+
+        :param data: bytes to be sent to the instrument.
+        :param data: bytes.
+        """
+        try:
+            return self.sync_socket.sendall(data)
+        except socket.timeout as e:
+            raise LantzSocketTimeoutError(str(e))
+
+    def _send_sync(self, msg_type, control=0, parameter=0, payload=b''):
+        try:
+            send_message(self.sync_socket, msg_type, control, parameter, payload)
+        except socket.timeout as e:
+            raise LantzSocketTimeoutError(str(e))
+
+    def _send_message(self, message):
+        """Send a complete message in Data messages and a final DataEnd
+        message, split to fit in the maximum message size of the server.
+
+        The unread rest of a previous response is discarded.
+        """
+        if self._in_response or self._received:
+            self._discard_response()
+
+        message_id = self._next_message_id()
+        view = memoryview(message).cast('B')
+        block = max(self.max_message_size - HEADER.size, 1)
+
+        offset = 0
+        while len(view) - offset > block:
+            self._send_sync(MESSAGE.DATA, self._take_rmt_delivered(), message_id, view[offset:offset + block])
+            offset += block
+        self._send_sync(MESSAGE.DATA_END, self._take_rmt_delivered(), message_id, view[offset:])
+
+        return len(view)
+
+    def _next_data_message(self):
+        """Receive the header of the next Data or DataEnd message.
+        """
+        while True:
+            try:
+                msg_type, control, parameter, length = recv_header(self.sync_socket)
+            except socket.timeout as e:
+                raise LantzSocketTimeoutError(str(e))
+
+            if msg_type in (MESSAGE.DATA, MESSAGE.DATA_END):
+                break
+
+            payload = bytearray(length)
+            rpc.recv_into_exactly(self.sync_socket, memoryview(payload))
+            reply = Message(msg_type, control, parameter, payload)
+
+            if msg_type == MESSAGE.INTERRUPTED:
+                self.log_warning('Response to message {} discarded by the instrument', parameter)
+                continue
+
+            self._expect(reply, MESSAGE.DATA)
+
+        self._in_response = True
+        self._response_id = parameter
+        self._payload_left = length
+        self._eom = msg_type == MESSAGE.DATA_END
+        if not length:
+            self._end_payload()
+
+    def _end_payload(self):
+        if self._eom:
+            self._in_response = False
+            self._rmt_delivered = True
+
+    def raw_recv_into(self, buffer):
+        if not self._payload_left:
+            self._next_data_message()
+            if not self._payload_left:
+                return 0
+
+        view = memoryview(buffer).cast('B')
+        try:
+            n = self.sync_socket.recv_into(view[:self._payload_left])
+        except socket.timeout as e:
+            raise LantzSocketTimeoutError(str(e))
+        if not n:
+            raise EOFError
+        self._payload_left -= n
+        if not self._payload_left:
+            self._end_payload()
+        return n
+
+    raw_recv_into.__doc__ = TextualMixin.raw_recv_into.__doc__
+
+    def raw_recv(self, size):
+        data = bytearray(size)
+        del data[self.raw_recv_into(data):]
+        return bytes(data)
+
+    raw_recv.__doc__ = TextualMixin.raw_recv.__doc__
+
+    def _read_message(self, data):
+        """Append the rest of the current response, or the next response if
+        none is being received, to a bytearray.
+        """
+        if not self._in_response:
+            self._next_data_message()
+
+        while self._in_response:
+            if not self._payload_left:
+                self._next_data_message()
+                continue
+            start = len(data)
+            data.extend(bytes(self._payload_left))
+            with memoryview(data) as view:
+                try:
+                    rpc.recv_into_exactly(self.sync_socket, view[start:])
+                except socket.timeout as e:
+                    raise LantzSocketTimeoutError(str(e))
+            self._payload_left = 0
+            self._end_payload()
+
+        return data
+
+    def _discard_response(self):
+        self._received = b''
+        while self._in_response:
+            skip_payload(self.sync_socket, self._payload_left)
+            self._payload_left = 0
+            self._end_payload()
+            if self._in_response:
+                self._next_data_message()
+
+    def recv(self, termination=None, encoding=None, recv_chunk=None):
+        """Receive string from instrument.
+
+        The complete response message is received. If it has more than one
+        termination, the text after the first one is returned by the next
+        calls.
+
+        :param termination: termination character (overrides class default)
+        :type termination: str
+        :param encoding: encoding to transform bytes to string (overrides class default)
+        :param recv_chunk: ignored, kept for compatibility with TextualMixin
+        :return: string encoded from received bytes
+        """
+        termination = termination or self.RECV_TERMINATION
+        encoding = encoding or self.ENCODING
+
+        termination = bytes(termination, encoding)
+        received = bytearray(self._received)
+
+        if not (termination and termination in received) and (self._in_response or not received):
+            self._read_message(received)
+
+        end = received.find(termination) if termination else -1
+        if end < 0:
+            end = len(received)
+
+        self._received = bytes(received[end + len(termination):])
+        received = received[:end].decode(encoding)
+
+        self.log_debug('Received {!r} (len={})', received, len(received))
+
+        return received
+
+    def query_pipelined(self, commands, *, send_args=(None, None), recv_args=(None, None)):
+        """Send several queries and return the answers.
+
+        In overlapped mode all the queries are sent before reading the first
+        answer, so the instrument processes them back to back. Otherwise they
+        are sent one at a time.
+
+        :param commands: iterable of commands to be sent to the instrument
+        :param send_args: (termination, encoding) to override class defaults
+        :param recv_args: (termination, encoding) to override class defaults
+        :rtype: list of strings
+        """
+        if not self.overlapped:
+            return [self.query(command, send_args=send_args, recv_args=recv_args)
+                    for command in commands]
+
+        message_ids = []
+        for command in commands:
+            self.send(command, *send_args)
+            message_ids.append(self._last_message_id)
+
+        answers = []
+        for message_id in message_ids:
+            answers.append(self.recv(*recv_args))
+            if self._response_id != message_id:
+                raise HiSLIPError('Received response to message {} instead of {}'.format(self._response_id, message_id))
+        return answers
+
+    def write_raw(self, data):
+        """Write binary data to instrument
+        """
+        return self._send_message(data)
+
+    def read_raw(self, num=-1):
+        """Read binary data from instrument
+
+        :param num: maximum number of bytes to read, -1 to read until the
+                    end of the message.
+        :rtype: bytearray
+        """
+        if num > 0:
+            read_data = bytearray(num)
+            del read_data[self.read_raw_into(read_data):]
+            return read_data
+
+        read_data = bytearray(self._received)
+        self._received = b''
+        if self._in_response or not read_data:
+            self._read_message(read_data)
+        return read_data
+
+    def read_raw_into(self, buffer):
+        """Read binary data from instrument into a writable buffer, until the
+        end of the message or until the buffer is full.
+
+        :return: number of bytes read.
+        """
+        view = memoryview(buffer).cast('B')
+        done = min(len(self._received), len(view))
+        view[:done] = self._received[:done]
+        self._received = self._received[done:]
+
+        if done and not self._in_response:
+            return done
+
+        while done < len(view):
+            done += self.raw_recv_into(view[done:])
+            if not self._in_response:
+                break
+        return done
+
+    def query_raw(self, data):
+        """Write binary data to instrument and read the response.
+
+        :rtype: bytearray
+        """
+        self.write_raw(data)
+        return self.read_raw()
+
+    def trigger(self):
+        """Send trigger message.
+        """
+        self._send_sync(MESSAGE.TRIGGER, self._take_rmt_delivered(), self._next_message_id())
+
+    # Asynchronous channel
+
+    def _async_loop(self):
+        while True:
+            try:
+                reply = recv_message(self.async_socket)
+            except (EOFError, OSError):
+                # The channel was closed by finalize or by the instrument.
+                return
+
+            if reply.type == MESSAGE.ASYNC_SERVICE_REQUEST:
+                self._on_srq(reply.control)
+            elif reply.type == MESSAGE.ASYNC_INTERRUPTED:
+                self.log_warning('Response to message {} discarded by the instrument', reply.parameter)
+            else:
+                if reply.type == MESSAGE.FATAL_ERROR:
+                    self.log_error('HiSLIP fatal error {}: {}', reply.control, bytes(reply.payload))
+                self._async_replies.put(reply)
+
+    def _async_query(self, msg_type, control, parameter, payload, response_type):
+        with self._async_lock:
+            # Replies arriving after their query timed out are stale.
+            while True:
+                try:
+                    reply = self._async_replies.get_nowait()
+                except queue.Empty:
+                    break
+                self.log_warning('Discarding late {} message', reply.type)
+
+            send_message(self.async_socket, msg_type, control, parameter, payload)
+            deadline = time.monotonic() + self.TIMEOUT
+            while True:
+                try:
+                    reply = self._async_replies.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    raise errors.LantzTimeoutError('No response to HiSLIP message {}'.format(MESSAGE(msg_type).name))
+                if reply.type in (response_type, MESSAGE.ERROR, MESSAGE.FATAL_ERROR):
+                    break
+                self.log_warning('Discarding late {} message', reply.type)
+        return self._expect(reply, response_type)
+
+    def read_stb(self):
+        """Read status byte
+        """
+        reply = self._async_query(MESSAGE.ASYNC_STATUS_QUERY, self._take_rmt_delivered(),
+                                  (self._message_id - 2) & 0xffffffff, b'',
+                                  MESSAGE.ASYNC_STATUS_RESPONSE)
+        return reply.control
+
+    def clear(self):
+        """Send device clear, discarding pending responses, and negotiate
+        the overlapped mode requested by OVERLAPPED.
+        """
+        self._async_query(MESSAGE.ASYNC_DEVICE_CLEAR, 0, 0, b'',
+                          MESSAGE.ASYNC_DEVICE_CLEAR_ACKNOWLEDGE)
+
+        self._received = b''
+        skip_payload(self.sync_socket, self._payload_left)
+        self._payload_left = 0
+        self._in_response = False
+
+        self._send_sync(MESSAGE.DEVICE_CLEAR_COMPLETE, int(bool(self.OVERLAPPED)))
+        while True:
+            try:
+                msg_type, control, parameter, length = recv_header(self.sync_socket)
+            except socket.timeout as e:
+                raise LantzSocketTimeoutError(str(e))
+            skip_payload(self.sync_socket, length)
+            if msg_type == MESSAGE.DEVICE_CLEAR_ACKNOWLEDGE:
+                break
+
+        self.overlapped = bool(control & 1)
+        self._message_id = FIRST_MESSAGE_ID
+        self._rmt_delivered = False
+
+    def _remote_local(self, request):
+        self._async_query(MESSAGE.ASYNC_REMOTE_LOCAL_CONTROL, request,
+                          (self._message_id - 2) & 0xffffffff, b'',
+                          MESSAGE.ASYNC_REMOTE_LOCAL_RESPONSE)
+
+    def remote(self):
+        """Send remote command.
+        """
+        self._remote_local(REMOTE_LOCAL.ENABLE_REMOTE_GO_TO_REMOTE)
+
+    def local(self):
+        """Send local command
+        """
+        self._remote_local(REMOTE_LOCAL.GO_TO_LOCAL)
+
+    def lock(self, shared_lock=''):
+        """Request the lock, waiting up to lock_timeout milliseconds.
+
+        :param shared_lock: name of a shared lock, empty for an exclusive lock.
+        """
+        reply = self._async_query(MESSAGE.ASYNC_LOCK, 1, self.lock_timeout,
+                                  shared_lock.encode('ascii'), MESSAGE.ASYNC_LOCK_RESPONSE)
+        if reply.control not in (LOCK_RESPONSE.SUCCESS, LOCK_RESPONSE.SUCCESS_SHARED):
+            raise HiSLIPError('error locking: {}'.format(LOCK_RESPONSE(reply.control).name))
+
+    def unlock(self):
+        """Release the lock.
+        """
+        reply = self._async_query(MESSAGE.ASYNC_LOCK, 0, (self._message_id - 2) & 0xffffffff, b'',
+                                  MESSAGE.ASYNC_LOCK_RESPONSE)
+        if reply.control not in (LOCK_RESPONSE.SUCCESS, LOCK_RESPONSE.SUCCESS_SHARED):
+            raise HiSLIPError('error unlocking: {}'.format(LOCK_RESPONSE(reply.control).name))
+
+    def enable_srq(self, callback=None):
+        """Register a callback for service requests.
+
+        HiSLIP instruments always deliver service requests through the
+        asynchronous channel, where each one sets the event waited by
+        wait_for_srq and calls the registered callbacks, with the driver as
+        argument, from the listener thread.
+
+        :param callback: callable to register, in addition to the ones
+                         registered in previous calls.
+        """
+        if callback is not None:
+            self._srq_callbacks.append(callback)
+
+    def disable_srq(self):
+        """Forget the registered service request callbacks.
+        """
+        self._srq_callbacks = []
+
+    def wait_for_srq(self, timeout=None):
+        """Wait for a service request.
+
+        The request is consumed when returning, so each one is reported once.
+
+        :param timeout: maximum wait in seconds, None to wait forever.
+        :return: True if a service request arrived, False on timeout.
+        """
+        arrived = self._srq_event.wait(timeout)
+        self._srq_event.clear()
+        return arrived
+
+    def _on_srq(self, stb):
+        self.log_debug('Service request, status byte {}', stb)
+        self._srq_event.set()
+
+        for callback in self._srq_callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                self.log_error('Error in service request callback: {}', e)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz.drivers.legacy.loopback
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Implements a loopback transport for legacy message based drivers, that
+    replays recorded transcripts (see lantz.drivers.loopback).
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+from lantz import Driver
+from lantz.drivers.legacy.textual import TextualMixin
+from lantz.drivers.loopback import LoopbackSession
+
+
+class LoopbackMixin(object):
+    """Mixin class replacing the transport of a TextualMixin based driver
+    (TCPDriver, SerialDriver, ...) by a loopback session.
+
+    It must come first in the bases, e.g.
+    ``class TDS1012Loopback(LoopbackMixin, TDS1012)``. The __init__,
+    initialize and finalize of the replaced transport are not called.
+
+    :param transcript: Transcript to replay.
+    :param per_message: latency in seconds of each exchange.
+    :param per_byte: latency in seconds of each byte sent or received.
+    """
+
+    def __init__(self, transcript=None, per_message=0., per_byte=0., *args, **kwargs):
+        Driver.__init__(self, *args, **kwargs)
+        self.session = LoopbackSession(transcript, per_message, per_byte)
+
+    def raw_send(self, data):
+        return self.session.send(data)
+
+    def raw_recv(self, size):
+        return self.session.recv(size)
+
+    def raw_recv_into(self, buffer):
+        return self.session.recv_into(buffer)
+
+    def initialize(self):
+        return Driver.initialize(self)
+
+    def finalize(self):
+        return Driver.finalize(self)
+
+    def is_open(self):
+        return True
+
+
+class LoopbackDriver(LoopbackMixin, TextualMixin, Driver):
+    """Base class for drivers exchanging text messages with a loopback session.
+    """
+
+    RECV_TERMINATION = '\n'
+    SEND_TERMINATION = '\n'
@@ -10,6 +10,7 @@
 """
 
 import socket
+import time
 
 from lantz import Driver
 from lantz.drivers.legacy.textual import TextualMixin
@@ -32,36 +33,125 @@ class TCPRawDriver(Driver):
 
     RECV_CHUNK = 1024
 
+    #: Disable Nagle's algorithm, so small requests are sent right away.
+    NODELAY = True
+
+    #: Keepalive as (idle, interval, count) in seconds and probes, or None
+    #: to leave keepalive disabled. Idle, interval and count are only set on
+    #: platforms that support them.
+    KEEPALIVE = None
+
+    #: Number of times the connection is reopened and a send retried after
+    #: the peer closed or reset the connection, including failed reopenings.
+    RECONNECT_RETRIES = 2
+
+    #: Wait in seconds before reopening the connection, doubled in each retry.
+    RECONNECT_DELAY = 0.1
+
+    #: Errors after which the connection is reopened.
+    RECONNECT_ERRORS = (BrokenPipeError, ConnectionResetError, ConnectionAbortedError)
+
     def __init__(self, host='localhost', port=9997, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket = self._new_socket()
         self.host_port = (host, port)
+        self._recv_buffer = memoryview(bytearray(max(self.RECV_CHUNK, 1)))
+
+    def _new_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if self.NODELAY:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.KEEPALIVE is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            for option, value in zip(('TCP_KEEPIDLE', 'TCP_KEEPINTVL', 'TCP_KEEPCNT'), self.KEEPALIVE):
+                if hasattr(socket, option):
+                    sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+        return sock
+
+    def reconnect(self):
+        """Close the connection and open it again.
+        """
+        self.log_info('Reconnecting to {}', self.host_port)
+        self.socket.close()
+        self.socket = self._new_socket()
+        self.socket.connect(self.host_port)
+
+    def _reconnect_after(self, error, attempt):
+        """Reopen the connection lost by error, retrying with backoff if
+        reopening fails. Raises the last error once attempt reaches
+        RECONNECT_RETRIES.
+
+        :return: the next attempt number.
+        """
+        while attempt < self.RECONNECT_RETRIES:
+            self.log_warning('Connection to {} lost ({}), reconnecting', self.host_port, error)
+            time.sleep(self.RECONNECT_DELAY * 2 ** attempt)
+            attempt += 1
+            try:
+                self.reconnect()
+                return attempt
+            except OSError as e:
+                error = e
+        raise error
 
     def raw_send(self, data):
         """Send raw bytes to the instrument.
 
+        The connection is reopened and the data sent again, up to
+        RECONNECT_RETRIES times, if the peer closed or reset it.
+
         :param data: bytes to be sent to the instrument.
         :param data: bytes.
         """
-        try:
-            self.socket.send(data)
-        except socket.timeout as e:
-            raise LantzSocketTimeoutError(str(e))
+        attempt = 0
+        while True:
+            try:
+                return self.socket.sendall(data)
+            except socket.timeout as e:
+                raise LantzSocketTimeoutError(str(e))
+            except self.RECONNECT_ERRORS as e:
+                attempt = self._reconnect_after(e, attempt)
 
     def raw_recv(self, size):
         """Receive raw bytes to the instrument.
 
+        If the peer closed or reset the connection, it is reopened for the
+        next message and the error is raised, as the reply is lost.
+
         :param size: number of bytes to receive.
         :return: received bytes.
         :return type: bytes.
         """
+        if size > len(self._recv_buffer):
+            self._recv_buffer = memoryview(bytearray(size))
+        n = self.raw_recv_into(self._recv_buffer[:size])
+        return self._recv_buffer[:n].tobytes()
+
+    def raw_recv_into(self, buffer):
+        """Receive raw bytes from the instrument into a writable buffer.
+
+        If the peer closed or reset the connection, it is reopened for the
+        next message and the error is raised, as the reply is lost.
+
+        :param buffer: writable object supporting the buffer protocol.
+        :return: number of bytes received.
+        :return type: int
+        """
         try:
-            return self.socket.recv(size)
+            n = self.socket.recv_into(buffer)
+            if n == 0 and len(memoryview(buffer)):
+                raise ConnectionAbortedError('Connection closed by {}'.format(self.host_port))
+            return n
         except socket.timeout as e:
             raise LantzSocketTimeoutError(str(e))
+        except self.RECONNECT_ERRORS as e:
+            self._reconnect_after(e, 0)
+            raise
 
     def initialize(self):
         self.log_debug('Opening port {}', self.host_port)
+        if self.socket.fileno() == -1:
+            self.socket = self._new_socket()
         return self.socket.connect(self.host_port)
 
     def finalize(self):
@@ -69,7 +159,7 @@ class TCPRawDriver(Driver):
         return self.socket.close()
 
     def is_open(self):
-        return self.socket.isOpen()
+        return self.socket.fileno() != -1
 
 
 class TCPDriver(TCPRawDriver, TextualMixin):
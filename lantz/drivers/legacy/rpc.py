@@ -252,63 +252,135 @@ def sendfrag(sock, last, frag):
     if last:
         x = x | 0x80000000
     header = struct.pack(">I", x)
-    sock.send(header + frag)
+    # Scatter-gather the header and the fragment in a single system call,
+    # and send the rest if it was only partially sent.
+    if hasattr(sock, 'sendmsg'):
+        sent = sock.sendmsg([header, frag])
+    else:
+        sent = 0
+    if sent < len(header):
+        sock.sendall(header[sent:])
+        sent = len(header)
+    if sent - len(header) < len(frag):
+        sock.sendall(memoryview(frag)[sent - len(header):])
 
 
 def sendrecord(sock, record):
     sendfrag(sock, 1, record)
 
 
-def recvfrag(sock):
-    header = sock.recv(4)
-    if len(header) < 4:
-        raise EOFError
-    x = struct.unpack(">I", header[0:4])[0]
+def recv_into_exactly(sock, view):
+    """Fill a writable memoryview with bytes received from sock.
+    """
+    while len(view):
+        n = sock.recv_into(view)
+        if not n:
+            raise EOFError
+        view = view[n:]
+
+
+def recvfragheader(sock):
+    header = bytearray(4)
+    recv_into_exactly(sock, memoryview(header))
+    x = struct.unpack(">I", header)[0]
     last = ((x & 0x80000000) != 0)
     n = int(x & 0x7fffffff)
-    frag = b''
-    while n > 0:
-        buf = sock.recv(n)
-        if not buf:
-            raise EOFError
-        n = n - len(buf)
-        frag = frag + buf
+    return last, n
+
+
+def recvfrag(sock):
+    last, n = recvfragheader(sock)
+    frag = bytearray(n)
+    recv_into_exactly(sock, memoryview(frag))
     return last, frag
 
 
 def recvrecord(sock):
-    record = b''
-    last = 0
+    record = bytearray()
+    last = False
     while not last:
-        last, frag = recvfrag(sock)
-        record = record + frag
+        last, n = recvfragheader(sock)
+        start = len(record)
+        record.extend(bytes(n))
+        with memoryview(record) as view:
+            recv_into_exactly(sock, view[start:])
     return record
 
 
 class RawTCPClient(Client):
     """Client using TCP to a specific port.
+
+    Several calls can be outstanding: send_call sends a call without
+    waiting, and recv_reply returns the reply matching its xid, keeping the
+    replies of other calls until they are requested.
     """
     def __init__(self, host, prog, vers, port):
         Client.__init__(self, host, prog, vers, port)
+        self._pending = set()
+        self._replies = {}
         self.connect()
     
     def connect(self):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.sock.connect((self.host, self.port))
         
     def close(self):
         self.sock.close()
+
+    def make_call(self, proc, args, pack_func, unpack_func):
+        return self.recv_reply(self.send_call(proc, args, pack_func), unpack_func)
+
+    def send_call(self, proc, args, pack_func):
+        """Send a call without waiting for the reply.
+
+        :return: xid of the call, to be given to recv_reply.
+        """
+        if pack_func is None and args is not None:
+            raise TypeError('non-null args with null pack_func')
+        self.start_call(proc)
+        if pack_func:
+            pack_func(args)
+        sendrecord(self.sock, self.packer.get_buf())
+        self._pending.add(self.lastxid)
+        return self.lastxid
+
+    def recv_reply(self, xid, unpack_func):
+        """Receive the reply of the call with the given xid and unpack it.
+        """
+        u = self.unpacker
+        u.reset(self._recv_record(xid))
+        u.unpack_replyheader()
+        if unpack_func:
+            result = unpack_func()
+        else:
+            result = None
+        u.done()
+        return result
+
+    def _recv_record(self, xid):
+        if xid not in self._pending:
+            raise RPCError('no call pending with xid %r' % (xid,))
+        record = self._replies.pop(xid, None)
+        while record is None:
+            record = recvrecord(self.sock)
+            reply_xid = struct.unpack_from('>I', record)[0]
+            if reply_xid == xid:
+                break
+            if reply_xid not in self._pending:
+                raise RPCError('wrong xid in reply %r, no such call pending' % (reply_xid,))
+            self._replies[reply_xid] = record
+            record = None
+        self._pending.discard(xid)
+        return record
     
     def do_call(self):
         call = self.packer.get_buf()
         sendrecord(self.sock, call)
-        reply = recvrecord(self.sock)
+        self._pending.add(self.lastxid)
         u = self.unpacker
-        u.reset(reply)
+        u.reset(self._recv_record(self.lastxid))
         xid, verf = u.unpack_replyheader()
-        if xid != self.lastxid:
-            # Can't really happen since this is TCP...
-            raise RPCError('wrong xid in reply %r instead of %r' % (xid, self.lastxid))
 
 
 # Client using UDP to a specific port
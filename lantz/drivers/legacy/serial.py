@@ -124,6 +124,18 @@ class SerialDriver(TextualMixin, Driver):
 
         return data
 
+    def raw_recv_into(self, buffer):
+        """Receive raw bytes from the instrument into a writable buffer.
+
+        :param buffer: writable object supporting the buffer protocol
+        :return: number of bytes received
+        :return type: int
+
+        If a timeout is set, it may receive less bytes than the buffer size.
+
+        """
+        return self.serial.readinto(buffer)
+
     def initialize(self):
         """Open port
         """
@@ -12,7 +12,7 @@
 """
 
 from lantz import Feat
-from lantz.drivers.usbtmc import USBTMCDriver
+from lantz.drivers.legacy.usbtmc import USBTMCDriver
 
 
 class TDS1002b(USBTMCDriver):
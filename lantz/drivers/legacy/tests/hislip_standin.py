@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+    hislip_standin
+    ~~~~~~~~~~~~~~
+
+    Local HiSLIP server standing in for an instrument, to test HiSLIPDriver
+    without hardware. It serves a single session, on both channels, from
+    background threads.
+
+    The commands received as Data/DataEnd messages are answered as:
+
+    - ``ECHO <data>``: <data>, unchanged.
+    - ``CURV?``: an IEEE 488.2 block with 2048 bytes (0 to 255 repeated).
+    - ``SILENT?``: no answer.
+    - ``<text>?``: ``<text> OK``.
+    - anything else: no answer.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import socket
+import struct
+import threading
+
+from lantz.drivers.legacy.hislip import (MESSAGE, LOCK_RESPONSE, HEADER, PROTOCOL_VERSION,
+                                         send_message, recv_message)
+
+#: Payload of the CURV? answer.
+CURVE = bytes(range(256)) * 8
+
+
+class HiSLIPStandIn(object):
+    """HiSLIP server listening on a free local port.
+
+    :param overlapped: start the session in overlapped mode.
+    :param max_message_size: maximum message size announced to the client.
+    :param response_chunk: maximum payload of each Data message of the
+                           answers, so they are split in several messages.
+    """
+
+    SESSION_ID = 7
+
+    def __init__(self, overlapped=False, max_message_size=256, response_chunk=100):
+        self.overlapped = overlapped
+        self.max_message_size = max_message_size
+        self.response_chunk = response_chunk
+
+        #: Status byte returned to status queries.
+        self.stb = 0
+        #: Control code returned to lock requests.
+        self.lock_response = LOCK_RESPONSE.SUCCESS
+        #: Added to the message ID of each answer, to test ID checks.
+        self.response_id_offset = 0
+        #: Delay in seconds of the next status response, to test late replies.
+        self.status_delay = 0
+
+        #: Initialize message parameter and payload.
+        self.initialize = None
+        #: Complete commands as (message ID, number of Data and DataEnd messages, RMT-delivered, bytes).
+        self.commands = []
+        #: Other messages as (message type, control code, parameter, payload).
+        self.messages = []
+        #: Exception raised in a server thread, if any.
+        self.error = None
+
+        self._async_send_lock = threading.Lock()
+        self._session = threading.Event()
+        self.sync_socket = self.async_socket = None
+
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(2)
+        self.host, self.port = self.listener.getsockname()
+
+        self._thread = threading.Thread(target=self._serve, name='HiSLIP stand-in', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        for sock in (self.sync_socket, self.async_socket, self.listener):
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self._thread.join(1)
+
+    def messages_of_type(self, msg_type):
+        return [message for message in self.messages if message[0] == msg_type]
+
+    def service_request(self, stb):
+        """Send a service request through the asynchronous channel.
+        """
+        self._session.wait(1)
+        self.stb = stb
+        self._send_async(MESSAGE.ASYNC_SERVICE_REQUEST, stb)
+
+    def _send_async(self, msg_type, control=0, parameter=0, payload=b''):
+        with self._async_send_lock:
+            send_message(self.async_socket, msg_type, control, parameter, payload)
+
+    def _serve(self):
+        try:
+            self.sync_socket, _ = self.listener.accept()
+            request = recv_message(self.sync_socket)
+            assert request.type == MESSAGE.INITIALIZE, request
+            self.initialize = (request.parameter, bytes(request.payload))
+            send_message(self.sync_socket, MESSAGE.INITIALIZE_RESPONSE, int(self.overlapped),
+                         (PROTOCOL_VERSION << 16) | self.SESSION_ID)
+
+            self.async_socket, _ = self.listener.accept()
+            request = recv_message(self.async_socket)
+            assert request.type == MESSAGE.ASYNC_INITIALIZE, request
+            assert request.parameter == self.SESSION_ID, request
+            send_message(self.async_socket, MESSAGE.ASYNC_INITIALIZE_RESPONSE, 0, 0x4c5a)
+            self._session.set()
+
+            threading.Thread(target=self._serve_channel, args=(self._serve_async, ),
+                             name='HiSLIP stand-in async', daemon=True).start()
+        except Exception as e:
+            self.error = e
+            return
+        self._serve_channel(self._serve_sync)
+
+    def _serve_channel(self, loop):
+        try:
+            loop()
+        except (EOFError, OSError):
+            pass
+        except Exception as e:
+            self.error = e
+
+    def _serve_async(self):
+        while True:
+            request = recv_message(self.async_socket)
+            self.messages.append((request.type, request.control, request.parameter, bytes(request.payload)))
+            if request.type == MESSAGE.ASYNC_MAXIMUM_MESSAGE_SIZE:
+                self._send_async(MESSAGE.ASYNC_MAXIMUM_MESSAGE_SIZE_RESPONSE, 0, 0,
+                                 struct.pack('>Q', self.max_message_size))
+            elif request.type == MESSAGE.ASYNC_STATUS_QUERY:
+                if self.status_delay:
+                    threading.Timer(self.status_delay, self._send_async,
+                                    (MESSAGE.ASYNC_STATUS_RESPONSE, self.stb)).start()
+                    self.status_delay = 0
+                else:
+                    self._send_async(MESSAGE.ASYNC_STATUS_RESPONSE, self.stb)
+            elif request.type == MESSAGE.ASYNC_DEVICE_CLEAR:
+                # Prefer overlapped mode.
+                self._send_async(MESSAGE.ASYNC_DEVICE_CLEAR_ACKNOWLEDGE, 1)
+            elif request.type == MESSAGE.ASYNC_LOCK:
+                self._send_async(MESSAGE.ASYNC_LOCK_RESPONSE,
+                                 self.lock_response if request.control else LOCK_RESPONSE.SUCCESS)
+            elif request.type == MESSAGE.ASYNC_REMOTE_LOCAL_CONTROL:
+                self._send_async(MESSAGE.ASYNC_REMOTE_LOCAL_RESPONSE)
+            else:
+                self._send_async(MESSAGE.ERROR, 0, 0, b'Unexpected message')
+
+    def _serve_sync(self):
+        data = bytearray()
+        count = 0
+        rmt = 0
+        while True:
+            request = recv_message(self.sync_socket)
+            if request.type not in (MESSAGE.DATA, MESSAGE.DATA_END):
+                self.messages.append((request.type, request.control, request.parameter, bytes(request.payload)))
+                if request.type == MESSAGE.DEVICE_CLEAR_COMPLETE:
+                    data = bytearray()
+                    count = 0
+                    self.overlapped = bool(request.control & 1)
+                    send_message(self.sync_socket, MESSAGE.DEVICE_CLEAR_ACKNOWLEDGE, int(self.overlapped))
+                continue
+
+            assert len(request.payload) + HEADER.size <= self.max_message_size, 'Message too large'
+            if not count:
+                rmt = request.control
+            data += request.payload
+            count += 1
+            if request.type == MESSAGE.DATA:
+                continue
+
+            command = bytes(data)
+            self.commands.append((request.parameter, count, rmt, command))
+            data = bytearray()
+            count = 0
+            self._answer(request.parameter, command)
+
+    def _answer(self, message_id, command):
+        if command.startswith(b'ECHO '):
+            answer = command[5:]
+        elif command == b'CURV?\n':
+            answer = b'#' + str(len(str(len(CURVE)))).encode('ascii') + str(len(CURVE)).encode('ascii') + CURVE + b'\n'
+        elif command == b'SILENT?\n':
+            return
+        elif command.endswith(b'?\n'):
+            answer = command[:-2] + b' OK\n'
+        else:
+            return
+
+        message_id = (message_id + self.response_id_offset) & 0xffffffff
+        view = memoryview(answer)
+        while len(view) > self.response_chunk:
+            send_message(self.sync_socket, MESSAGE.DATA, 0, message_id, view[:self.response_chunk])
+            view = view[self.response_chunk:]
+        send_message(self.sync_socket, MESSAGE.DATA_END, 0, message_id, view)
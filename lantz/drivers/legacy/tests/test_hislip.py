@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+    test_hislip
+    ~~~~~~~~~~~
+
+    Tests HiSLIPDriver against the local stand-in server.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import queue
+import struct
+import time
+import unittest
+
+import numpy as np
+
+from lantz.drivers.legacy.hislip import (HiSLIPDriver, HiSLIPError, MESSAGE, REMOTE_LOCAL,
+                                         LOCK_RESPONSE, FIRST_MESSAGE_ID, PROTOCOL_VERSION, VENDOR_ID)
+from lantz.drivers.legacy.network import LantzSocketTimeoutError
+from lantz.errors import LantzTimeoutError
+
+from hislip_standin import HiSLIPStandIn, CURVE
+
+
+class HiSLIPTestMixin(object):
+
+    OVERLAPPED = False
+
+    def setUp(self):
+        self.server = HiSLIPStandIn(overlapped=self.OVERLAPPED)
+
+        class Driver(HiSLIPDriver):
+            OVERLAPPED = self.OVERLAPPED
+            TIMEOUT = 1
+
+        self.driver = Driver(self.server.host, 'hislip0', self.server.port)
+        self.driver.initialize()
+
+    def tearDown(self):
+        self.driver.finalize()
+        self.server.close()
+        self.assertIsNone(self.server.error)
+
+    def test_initialize(self):
+        parameter, sub_address = self.server.initialize
+        self.assertEqual(parameter, (PROTOCOL_VERSION << 16) | struct.unpack('>H', VENDOR_ID)[0])
+        self.assertEqual(sub_address, b'hislip0')
+        self.assertEqual(self.driver.session_id, HiSLIPStandIn.SESSION_ID)
+        self.assertEqual(self.driver.max_message_size, self.server.max_message_size)
+        self.assertEqual(self.driver.overlapped, self.OVERLAPPED)
+        self.assertEqual(self.server.messages_of_type(MESSAGE.DEVICE_CLEAR_COMPLETE), [])
+
+    def test_query(self):
+        self.assertEqual(self.driver.query('*IDN?'), '*IDN OK')
+        self.assertEqual(self.driver.query('*IDN?'), '*IDN OK')
+
+    def test_message_ids_and_rmt_delivered(self):
+        self.driver.query('A?')
+        self.driver.send('B')
+        self.driver.query('C?')
+        ids = [command[0] for command in self.server.commands]
+        self.assertEqual(ids, [FIRST_MESSAGE_ID, FIRST_MESSAGE_ID + 2, FIRST_MESSAGE_ID + 4])
+        rmt = [command[2] for command in self.server.commands]
+        self.assertEqual(rmt, [0, 1, 0])
+
+    def test_split_messages(self):
+        command = 'A' * 600 + '?'
+        self.assertEqual(self.driver.query(command), 'A' * 600 + ' OK')
+        message_id, count, _, data = self.server.commands[-1]
+        block = self.server.max_message_size - 16
+        self.assertEqual(count, -(-(len(command) + 1) // block))
+        self.assertEqual(data, command.encode('ascii') + b'\n')
+
+    def test_binary_values(self):
+        data = self.driver.query_binary_values('CURV?', dtype='B')
+        np.testing.assert_array_equal(data, np.frombuffer(CURVE, dtype='B'))
+
+        self.driver.write_binary_values('DATA ', np.arange(3), dtype='<f4')
+        self.driver.query('SYNC?')
+        expected = b'DATA #212' + np.arange(3, dtype='<f4').tobytes() + b'\n'
+        self.assertEqual(self.server.commands[-2][3], expected)
+
+    def test_binary_safe(self):
+        payload = bytes(range(256)) + b'\n'
+        self.assertEqual(bytes(self.driver.query_raw(b'ECHO ' + payload)), payload)
+
+    def test_several_terminations(self):
+        self.assertEqual(self.driver.query('ECHO a\nb\n'), 'a')
+        self.assertEqual(self.driver.recv(), 'b')
+
+    def test_read_raw_into(self):
+        self.driver.send('ECHO 0123456789')
+        buffer = bytearray(4)
+        self.assertEqual(self.driver.read_raw_into(buffer), 4)
+        self.assertEqual(buffer, b'0123')
+        self.assertEqual(bytes(self.driver.read_raw()), b'456789\n')
+
+    def test_unread_response_is_discarded(self):
+        self.driver.send('ECHO ' + 'x' * 300 + '\n')
+        self.driver.read_raw_into(bytearray(2))
+        self.assertEqual(self.driver.query('Z?'), 'Z OK')
+
+    def test_trigger(self):
+        self.driver.query('A?')
+        self.driver.trigger()
+        self.driver.query('B?')
+        trigger, = self.server.messages_of_type(MESSAGE.TRIGGER)
+        self.assertEqual(trigger[1:3], (1, FIRST_MESSAGE_ID + 2))
+        self.assertEqual(self.server.commands[-1][0], FIRST_MESSAGE_ID + 4)
+
+    def test_read_stb(self):
+        self.server.stb = 0x51
+        self.assertEqual(self.driver.read_stb(), 0x51)
+
+    def test_late_async_reply(self):
+        self.server.stb = 0x51
+        self.server.status_delay = 1.5
+        with self.assertRaises(LantzTimeoutError):
+            self.driver.read_stb()
+
+        # The late response is discarded, not taken as the reply of the next queries.
+        self.driver.remote()
+        time.sleep(1)
+        self.server.stb = 0x22
+        self.assertEqual(self.driver.read_stb(), 0x22)
+
+    def test_lock(self):
+        self.driver.lock('shared')
+        self.driver.unlock()
+        lock, unlock = self.server.messages_of_type(MESSAGE.ASYNC_LOCK)
+        self.assertEqual(lock[1:], (1, self.driver.lock_timeout, b'shared'))
+        self.assertEqual(unlock[1], 0)
+
+        self.server.lock_response = LOCK_RESPONSE.FAILURE
+        with self.assertRaises(HiSLIPError):
+            self.driver.lock()
+
+    def test_remote_local(self):
+        self.driver.remote()
+        self.driver.local()
+        controls = [message[1] for message in self.server.messages_of_type(MESSAGE.ASYNC_REMOTE_LOCAL_CONTROL)]
+        self.assertEqual(controls, [REMOTE_LOCAL.ENABLE_REMOTE_GO_TO_REMOTE, REMOTE_LOCAL.GO_TO_LOCAL])
+
+    def test_service_request(self):
+        called = queue.Queue()
+        self.driver.enable_srq(called.put)
+        self.assertFalse(self.driver.wait_for_srq(0.05))
+        self.server.service_request(0x40)
+        self.assertTrue(self.driver.wait_for_srq(1))
+        self.assertIs(called.get(timeout=1), self.driver)
+        self.assertFalse(self.driver.wait_for_srq(0.05))
+
+        self.driver.disable_srq()
+        self.server.service_request(0x40)
+        self.assertTrue(self.driver.wait_for_srq(1))
+        self.assertTrue(called.empty())
+
+    def test_clear(self):
+        self.driver.query('A?')
+        self.driver.send('ECHO ' + 'x' * 300 + '\n')
+        self.driver.read_raw_into(bytearray(2))
+        self.driver.clear()
+        self.assertEqual(self.driver.overlapped, self.OVERLAPPED)
+        self.assertEqual(self.driver.query('B?'), 'B OK')
+        message_id, _, rmt, _ = self.server.commands[-1]
+        self.assertEqual((message_id, rmt), (FIRST_MESSAGE_ID, 0))
+
+    def test_timeout(self):
+        self.driver.send('SILENT?')
+        start = time.time()
+        with self.assertRaises(LantzSocketTimeoutError):
+            self.driver.recv()
+        self.assertLess(time.time() - start, 3)
+
+
+class SynchronizedTest(HiSLIPTestMixin, unittest.TestCase):
+
+    OVERLAPPED = False
+
+    def test_query_pipelined(self):
+        commands = ['X{}?'.format(i) for i in range(5)]
+        self.assertEqual(self.driver.query_pipelined(commands), ['X{} OK'.format(i) for i in range(5)])
+
+
+class OverlappedTest(HiSLIPTestMixin, unittest.TestCase):
+
+    OVERLAPPED = True
+
+    def test_query_pipelined(self):
+        commands = ['X{}?'.format(i) for i in range(20)]
+        self.assertEqual(self.driver.query_pipelined(commands), ['X{} OK'.format(i) for i in range(20)])
+        ids = [command[0] for command in self.server.commands]
+        self.assertEqual(ids, [(FIRST_MESSAGE_ID + 2 * i) & 0xffffffff for i in range(20)])
+
+    def test_query_pipelined_checks_ids(self):
+        self.server.response_id_offset = 2
+        with self.assertRaises(HiSLIPError):
+            self.driver.query_pipelined(['X?', 'Y?'])
+
+
+class NegotiationTest(unittest.TestCase):
+
+    def test_clear_negotiates_overlapped(self):
+        server = HiSLIPStandIn(overlapped=False)
+        driver = HiSLIPDriver(server.host, 'hislip0', server.port)
+        try:
+            driver.initialize()
+            self.assertTrue(driver.overlapped)
+            complete, = server.messages_of_type(MESSAGE.DEVICE_CLEAR_COMPLETE)
+            self.assertEqual(complete[1], 1)
+            self.assertEqual(driver.query('A?'), 'A OK')
+        finally:
+            driver.finalize()
+            server.close()
+        self.assertIsNone(server.error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+    test_usbtmc
+    ~~~~~~~~~~~
+
+    Tests USBTMCDriver against the stand-in pyusb backend.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import queue
+import unittest
+
+from lantz.errors import InstrumentError
+from lantz.drivers.legacy.usbtmc import USBTMCDriver
+
+from usbtmc_standin import USBTMCStandIn
+
+
+class USBTMCTestMixin(object):
+
+    INTERRUPT = True
+
+    def setUp(self):
+        self.backend = USBTMCStandIn(interrupt=self.INTERRUPT)
+
+        class Driver(USBTMCDriver):
+            TIMEOUT = 500
+            SRQ_POLL_TIMEOUT = 20
+
+        self.driver = Driver(device_filters={'backend': self.backend})
+        self.driver.initialize()
+
+    def tearDown(self):
+        self.driver.finalize()
+
+    def test_query(self):
+        self.assertEqual(self.driver.query('*IDN?\n'), '*IDN OK')
+        self.assertEqual(self.backend.commands, [b'*IDN?\n'])
+
+    def test_btags(self):
+        self.driver.query('A?\n')
+        self.driver.query('B?\n')
+        btags = [btag for btag, _, _ in self.backend.bulk_out] + [btag for btag, _ in self.backend.bulk_in_requests]
+        self.assertEqual(sorted(btags), [1, 2, 3, 4])
+
+    def test_split_messages(self):
+        self.driver.RECV_CHUNK = 10
+        command = 'ECHO ' + 'x' * 20 + '\n'
+        self.assertEqual(self.driver.query(command), 'x' * 20)
+        eoms = [eom for _, eom, _ in self.backend.bulk_out]
+        self.assertEqual(eoms, [0, 0, 1])
+        self.assertEqual(b''.join(data for _, _, data in self.backend.bulk_out), command.encode('ascii'))
+        self.assertEqual([size for _, size in self.backend.bulk_in_requests], [10, 10, 10])
+
+    def test_buffer_rounding(self):
+        for size in (1, 49, 50, 1000):
+            self.driver.send('ECHO ' + 'x' * size)
+            buffer = bytearray(size)
+            self.assertEqual(self.driver.read_raw_into(buffer), size)
+            self.assertEqual(buffer, b'x' * size)
+        for length in self.backend.bulk_in_buffers:
+            self.assertEqual(length % 64, 0)
+        # Header, data and alignment of the largest transfer fit.
+        self.assertGreaterEqual(self.backend.bulk_in_buffers[-1], 12 + 1000 + 3)
+
+    def test_read_raw_into(self):
+        self.driver.RECV_CHUNK = 4
+        self.driver.send('ECHO 0123456789')
+        buffer = bytearray(20)
+        self.assertEqual(self.driver.read_raw_into(buffer), 10)
+        self.assertEqual(buffer[:10], b'0123456789')
+        self.assertEqual([size for _, size in self.backend.bulk_in_requests], [4, 4, 4])
+
+    def test_wrong_btag(self):
+        self.driver.send('ECHO abc')
+        self.backend.btag_offset_next = 1
+        with self.assertRaises(InstrumentError):
+            self.driver.read_raw_into(bytearray(20))
+
+    def test_short_transfer(self):
+        self.driver.send('ECHO abcdefgh')
+        self.backend.truncate_next = 3
+        with self.assertRaises(InstrumentError):
+            self.driver.read_raw_into(bytearray(20))
+
+    def test_read_stb(self):
+        self.backend.stb = 0x51
+        for _ in range(130):
+            self.assertEqual(self.driver.read_stb(), 0x51)
+        btags = self.backend.stb_btags
+        self.assertEqual(btags[:3], [2, 3, 4])
+        self.assertEqual(btags[124:128], [126, 127, 2, 3])
+        self.assertTrue(all(2 <= btag <= 127 for btag in btags))
+
+
+class InterruptTest(USBTMCTestMixin, unittest.TestCase):
+
+    INTERRUPT = True
+
+    def test_read_stb_after_srq(self):
+        # The SRQ notification (0x81) is not taken as the reply to bTag 1.
+        self.backend.stb = 0x10
+        self.backend.service_request(0x40)
+        self.assertEqual(self.driver.read_stb(), 0x10)
+
+    def test_service_request(self):
+        called = queue.Queue()
+        self.driver.enable_srq(called.put)
+        self.assertFalse(self.driver.wait_for_srq(0.05))
+        self.backend.service_request()
+        self.assertTrue(self.driver.wait_for_srq(1))
+        self.assertIs(called.get(timeout=1), self.driver)
+        self.assertFalse(self.driver.wait_for_srq(0.05))
+
+        # The status byte replies are delivered while the SRQ thread reads the endpoint.
+        self.backend.stb = 0x22
+        self.assertEqual(self.driver.read_stb(), 0x22)
+        self.assertTrue(called.empty())
+
+        self.driver.disable_srq()
+        with self.assertRaises(InstrumentError):
+            self.driver.wait_for_srq(0)
+
+
+class NoInterruptTest(USBTMCTestMixin, unittest.TestCase):
+
+    INTERRUPT = False
+
+    def test_enable_srq(self):
+        with self.assertRaises(InstrumentError):
+            self.driver.enable_srq()
+
+
+if __name__ == '__main__':
+    unittest.main()
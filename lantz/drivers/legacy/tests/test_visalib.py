@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+    test_visalib
+    ~~~~~~~~~~~~
+
+    Tests the reads of VisaLibrary against the fake VISA library.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import unittest
+
+import numpy as np
+
+from lantz.drivers.legacy.visalib import VisaLibrary, StatusCode
+
+from visalib_standin import VisaStandIn
+
+SESSION = 1
+
+#: Binary data, with NUL bytes.
+DATA = bytes(range(256)) * 4
+
+
+class VisaLibraryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = VisaStandIn()
+        self.lib = VisaLibrary(self.fake)
+
+    def tearDown(self):
+        del VisaLibrary.REGISTER[self.fake]
+
+    def test_read(self):
+        self.fake.set_data(DATA)
+        self.assertEqual(self.lib.read(SESSION, 300), DATA[:300])
+        self.assertEqual(self.lib.read(SESSION, 2000), DATA[300:])
+
+    def test_read_into_bytearray(self):
+        self.fake.set_data(DATA)
+        buffer = bytearray(10)
+        self.assertEqual(self.lib.read_into(SESSION, buffer), 10)
+        self.assertEqual(buffer, DATA[:10])
+
+    def test_read_into_numpy(self):
+        self.fake.set_data(np.arange(100, dtype='<f8').tobytes())
+        array = np.zeros(100, dtype='<f8')
+        self.assertEqual(self.lib.read_into(SESSION, array), 800)
+        np.testing.assert_array_equal(array, np.arange(100))
+
+        # Partial reads leave the rest of the buffer untouched.
+        self.fake.set_data(DATA[:12])
+        array = np.zeros(4, dtype='<u4')
+        self.assertEqual(self.lib.read_into(SESSION, array), 12)
+        np.testing.assert_array_equal(array[:3], np.frombuffer(DATA[:12], dtype='<u4'))
+        self.assertEqual(array[3], 0)
+
+    def test_read_async(self):
+        buffers = [bytearray(8) for _ in range(3)]
+        futures = [self.lib.read_async(SESSION, buffer, timeout=1000) for buffer in buffers]
+        self.assertEqual(self.fake.pending_jobs(), [1, 2, 3])
+
+        # Completions arrive out of order and are matched by job id.
+        self.fake.complete(3, b'third')
+        self.assertEqual(futures[2].result(1), 5)
+        self.assertFalse(futures[0].done() or futures[1].done())
+        self.fake.complete(1, b'first---')
+        self.fake.complete(2, DATA)
+        self.assertEqual(futures[0].result(1), 8)
+        self.assertEqual(futures[1].result(1), 8)
+
+        self.assertEqual(buffers, [bytearray(b'first---'), bytearray(DATA[:8]), bytearray(b'third\0\0\0')])
+        self.assertEqual(len(self.fake.closed), 3)
+
+    def test_read_async_numpy(self):
+        array = np.zeros(4, dtype='<u2')
+        future = self.lib.read_async(SESSION, array, timeout=1000)
+        self.fake.complete(1, np.arange(4, dtype='<u2').tobytes())
+        self.assertEqual(future.result(1), 8)
+        np.testing.assert_array_equal(array, np.arange(4))
+
+    def test_read_async_status_error(self):
+        futures = [self.lib.read_async(SESSION, bytearray(4), timeout=1000) for _ in range(2)]
+        self.fake.complete(1, b'', StatusCode.ERROR_IO.code)
+        with self.assertRaisesRegex(Exception, 'ERROR_IO'):
+            futures[0].result(1)
+
+        # Other reads of the session are not affected.
+        self.fake.complete(2, b'abcd')
+        self.assertEqual(futures[1].result(1), 4)
+
+    def test_read_async_timeout(self):
+        futures = [self.lib.read_async(SESSION, bytearray(4), timeout=50) for _ in range(2)]
+        self.fake.complete(1, b'abcd')
+        self.assertEqual(futures[0].result(1), 4)
+        with self.assertRaisesRegex(Exception, 'ERROR_TMO'):
+            futures[1].result(1)
+
+        # A new read starts waiting again.
+        future = self.lib.read_async(SESSION, bytearray(4), timeout=1000)
+        self.fake.complete(3, b'wxyz')
+        self.assertEqual(future.result(1), 4)
+
+    def test_read_async_wait_error(self):
+        futures = [self.lib.read_async(SESSION, bytearray(4), timeout=1000) for _ in range(3)]
+        self.fake.fail_wait(StatusCode.ERROR_CONN_LOST.code)
+        for future in futures:
+            with self.assertRaisesRegex(Exception, 'ERROR_CONN_LOST'):
+                future.result(1)
+        self.assertEqual(self.lib._async_reads, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+    test_vxi11
+    ~~~~~~~~~~
+
+    Tests Vxi11Driver against the local stand-in server.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import queue
+import unittest
+
+from lantz.drivers.legacy.vxi11 import (Vxi11Driver, Vxi11Error, ERROR_CODES, OP_FLAG_END,
+                                        DEVICE_INTR_PROG, DEVICE_INTR_VERS, DEVICE_TCP)
+
+from vxi11_standin import Vxi11StandIn
+
+
+class Vxi11Test(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Vxi11StandIn(max_recv_size=64)
+
+        class Driver(Vxi11Driver):
+            PORT = self.server.port
+            RECV_CHUNK = 32
+            ENCODING = 'ascii'
+            client_id = 3
+            term_char = None
+            name = 'inst0'
+
+        self.driver = Driver(self.server.host)
+        self.driver.initialize()
+
+    def tearDown(self):
+        if self.driver is not None:
+            self.driver.finalize()
+        self.server.close()
+        self.assertIsNone(self.server.error)
+
+    def test_create_link(self):
+        self.assertEqual(self.server.link_parms,
+                         (3, False, self.driver.lock_timeout, self.driver.name.encode('ascii')))
+        self.assertEqual(self.driver.link, Vxi11StandIn.LINK)
+        self.assertEqual(self.driver.max_recv_size, 64)
+
+    def test_query_raw(self):
+        answer = self.driver.query_raw(b'*IDN?\n')
+        self.assertIsInstance(answer, bytearray)
+        self.assertEqual(answer, b'*IDN OK\n')
+        self.assertEqual(self.server.writes, [(OP_FLAG_END, b'*IDN?\n')])
+
+    def test_long_answer(self):
+        payload = bytes(range(100)) + b'\n'
+        answer = self.driver.query_raw(b'ECHO ' + payload)
+        self.assertIsInstance(answer, bytearray)
+        self.assertEqual(answer, payload)
+        self.assertEqual(self.server.read_sizes, [32] * 4)
+
+    def test_write_blocks(self):
+        data = b'ECHO ' + b'x' * 150
+        self.driver.write_raw(data)
+        flags = [flag for flag, _ in self.server.writes]
+        self.assertEqual(flags, [0, 0, OP_FLAG_END])
+        self.assertEqual(b''.join(block for _, block in self.server.writes), data)
+        self.assertEqual(bytes(self.driver.read_raw()), b'x' * 150)
+
+    def test_read_raw_into(self):
+        self.driver.write_raw(b'ECHO 0123456789')
+        buffer = bytearray(4)
+        self.assertEqual(self.driver.read_raw_into(buffer), 4)
+        self.assertEqual(buffer, b'0123')
+        self.assertEqual(bytes(self.driver.read_raw(20)), b'456789')
+
+    def test_read_error(self):
+        with self.assertRaises(Vxi11Error):
+            self.driver.read_raw()
+
+    def test_generic_calls(self):
+        self.server.stb = 0x51
+        self.assertEqual(self.driver.read_stb(), 0x51)
+        self.driver.trigger()
+        self.driver.clear()
+        self.driver.remote()
+        self.driver.local()
+        self.driver.lock()
+        self.driver.unlock()
+        self.assertEqual(self.server.calls, [('device_readstb', ), ('device_trigger', ), ('device_clear', ),
+                                             ('device_remote', ), ('device_local', ),
+                                             ('device_lock', self.driver.lock_timeout), ('device_unlock', )])
+
+        self.server.lock_error = ERROR_CODES.DEVICE_LOCKED_BY_ANOTHER_LINK
+        with self.assertRaises(Vxi11Error):
+            self.driver.lock()
+
+    def test_service_request(self):
+        with self.assertRaises(Vxi11Error):
+            self.driver.wait_for_srq(0)
+
+        called = queue.Queue()
+        self.driver.enable_srq(called.put)
+        name, host_addr, port, prog, vers, family = self.server.calls[-1]
+        self.assertEqual((name, host_addr, port, prog, vers, family),
+                         ('create_intr_chan', 0x7f000001, self.driver._intr_server.port,
+                          DEVICE_INTR_PROG, DEVICE_INTR_VERS, DEVICE_TCP))
+        self.assertEqual(self.server.srq, (True, self.driver._srq_handle))
+
+        self.assertFalse(self.driver.wait_for_srq(0.05))
+        self.server.service_request()
+        self.assertTrue(self.driver.wait_for_srq(1))
+        self.assertIs(called.get(timeout=1), self.driver)
+        self.assertFalse(self.driver.wait_for_srq(0.05))
+
+        # Requests for other handles are ignored.
+        self.server.service_request(b'\x00\x00\x00\x09')
+        self.assertFalse(self.driver.wait_for_srq(0.2))
+        self.assertTrue(called.empty())
+
+        # A second callback is added, the interrupt channel is kept.
+        self.driver.enable_srq(called.put)
+        self.assertEqual([call[0] for call in self.server.calls].count('create_intr_chan'), 1)
+        self.server.service_request()
+        self.assertTrue(self.driver.wait_for_srq(1))
+        self.assertIs(called.get(timeout=1), self.driver)
+        self.assertIs(called.get(timeout=1), self.driver)
+
+        self.driver.disable_srq()
+        self.assertEqual(self.server.srq, (False, self.driver._srq_handle))
+        self.assertEqual(self.server.calls[-1], ('destroy_intr_chan', ))
+        with self.assertRaises(Vxi11Error):
+            self.driver.wait_for_srq(0)
+
+    def test_service_request_read_stb(self):
+        # The callbacks read the status byte while queries are running.
+        self.server.stb = 0x40
+        stbs = queue.Queue()
+        self.driver.enable_srq(lambda driver: stbs.put(driver.read_stb()))
+        for n in range(5):
+            self.server.service_request()
+            for m in range(3):
+                command = 'ECHO {}-{}\n'.format(n, m).encode('ascii')
+                self.assertEqual(bytes(self.driver.query_raw(command)), command[5:])
+        for n in range(5):
+            self.assertEqual(stbs.get(timeout=1), 0x40)
+
+    def test_finalize(self):
+        self.driver.enable_srq()
+        self.driver.finalize()
+        self.assertEqual(self.server.calls[-2:], [('destroy_intr_chan', ), ('destroy_link', )])
+        self.driver = None
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+    usbtmc_standin
+    ~~~~~~~~~~~~~~
+
+    pyusb backend with a single USBTMC USB488 device standing in for an
+    instrument, to test USBTMCDriver without hardware. Pass it to the driver
+    as ``device_filters={'backend': USBTMCStandIn()}``.
+
+    The device has a Bulk-OUT, a Bulk-IN and, optionally, an Interrupt-IN
+    endpoint. The commands received as DEV_DEP_MSG_OUT messages are
+    answered as:
+
+    - ``ECHO <data>``: <data>, unchanged.
+    - ``<text>?``: ``<text> OK``.
+    - anything else: no answer.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import errno
+import queue
+import struct
+from types import SimpleNamespace
+
+import usb.backend
+import usb.core
+
+from lantz.drivers.legacy.usbtmc import MSGID, REQUEST, STATUS
+
+BULK_OUT = 0x01
+BULK_IN = 0x82
+INTERRUPT_IN = 0x83
+
+
+def _endpoint(address, attributes, max_packet_size):
+    return SimpleNamespace(bLength=7, bDescriptorType=5, bEndpointAddress=address, bmAttributes=attributes,
+                           wMaxPacketSize=max_packet_size, bInterval=1, bRefresh=0, bSynchAddress=0,
+                           extra_descriptors=[])
+
+
+class USBTMCStandIn(usb.backend.IBackend):
+    """pyusb backend of a single USBTMC device.
+
+    :param interrupt: give the device an Interrupt-IN endpoint.
+    :param max_packet_size: wMaxPacketSize of the Bulk-IN endpoint.
+    """
+
+    def __init__(self, interrupt=True, max_packet_size=64):
+        self.endpoints = [_endpoint(BULK_OUT, 2, max_packet_size), _endpoint(BULK_IN, 2, max_packet_size)]
+        if interrupt:
+            self.endpoints.append(_endpoint(INTERRUPT_IN, 3, 2))
+
+        #: Status byte returned to READ_STATUS_BYTE.
+        self.stb = 0
+        #: Payload bytes to drop from the next Bulk-IN transfer, to test short transfers.
+        self.truncate_next = 0
+        #: Added to the bTag of the next Bulk-IN transfer, to test bTag checks.
+        self.btag_offset_next = 0
+
+        #: Complete commands received, as bytes.
+        self.commands = []
+        #: DEV_DEP_MSG_OUT transfers as (bTag, EOM, data).
+        self.bulk_out = []
+        #: REQUEST_DEV_DEP_MSG_IN transfers as (bTag, TransferSize).
+        self.bulk_in_requests = []
+        #: Sizes of the buffers given to the Bulk-IN reads.
+        self.bulk_in_buffers = []
+        #: bTags of the READ_STATUS_BYTE requests.
+        self.stb_btags = []
+
+        self._data = bytearray()
+        self._answer = bytearray()
+        self._bulk_in = queue.Queue()
+        self._interrupt = queue.Queue()
+
+    def service_request(self, stb=0x40):
+        """Send an SRQ notification through the Interrupt-IN endpoint.
+        """
+        self._interrupt.put(bytes((0x81, stb)))
+
+    # Descriptors
+
+    def enumerate_devices(self):
+        yield 'usbtmc0'
+
+    def get_device_descriptor(self, dev):
+        return SimpleNamespace(bLength=18, bDescriptorType=1, bcdUSB=0x0200, bDeviceClass=0,
+                               bDeviceSubClass=0, bDeviceProtocol=0, bMaxPacketSize0=64,
+                               idVendor=0x1234, idProduct=0x5678, bcdDevice=0x0100,
+                               iManufacturer=0, iProduct=0, iSerialNumber=0, bNumConfigurations=1,
+                               address=1, bus=1, port_number=1, port_numbers=(1, ), speed=None)
+
+    def get_configuration_descriptor(self, dev, config):
+        return SimpleNamespace(bLength=9, bDescriptorType=2, wTotalLength=0, bNumInterfaces=1,
+                               bConfigurationValue=1, iConfiguration=0, bmAttributes=0x80, bMaxPower=50,
+                               extra_descriptors=[])
+
+    def get_interface_descriptor(self, dev, intf, alt, config):
+        if intf or alt:
+            raise IndexError('Invalid interface index')
+        return SimpleNamespace(bLength=9, bDescriptorType=4, bInterfaceNumber=0, bAlternateSetting=0,
+                               bNumEndpoints=len(self.endpoints), bInterfaceClass=0xfe,
+                               bInterfaceSubClass=3, bInterfaceProtocol=1, iInterface=0,
+                               extra_descriptors=[])
+
+    def get_endpoint_descriptor(self, dev, ep, intf, alt, config):
+        return self.endpoints[ep]
+
+    # Device handling
+
+    def open_device(self, dev):
+        return dev
+
+    def close_device(self, dev_handle):
+        pass
+
+    def set_configuration(self, dev_handle, config_value):
+        pass
+
+    def get_configuration(self, dev_handle):
+        return 1
+
+    def set_interface_altsetting(self, dev_handle, intf, altsetting):
+        pass
+
+    def claim_interface(self, dev_handle, intf):
+        pass
+
+    def release_interface(self, dev_handle, intf):
+        pass
+
+    def reset_device(self, dev_handle):
+        pass
+
+    def is_kernel_driver_active(self, dev_handle, intf):
+        return False
+
+    # Transfers
+
+    def bulk_write(self, dev_handle, ep, intf, data, timeout):
+        data = bytes(data)
+        msgid, btag, btag_inverse = struct.unpack_from('BBB', data)
+        assert btag_inverse == ~btag & 0xff, 'Invalid bTagInverse'
+        assert 1 <= btag <= 255, 'Invalid bTag'
+
+        if msgid == MSGID.DEV_DEP_MSG_OUT:
+            size, attributes = struct.unpack_from('<LB', data, 4)
+            assert len(data) == 12 + size + (4 - size) % 4, 'Invalid alignment'
+            chunk = data[12:12 + size]
+            self.bulk_out.append((btag, attributes & 1, chunk))
+            self._data += chunk
+            if attributes & 1:
+                self._respond(bytes(self._data))
+                self._data = bytearray()
+        elif msgid == MSGID.REQUEST_DEV_DEP_MSG_IN:
+            size, = struct.unpack_from('<L', data, 4)
+            self.bulk_in_requests.append((btag, size))
+            self._bulk_in.put(self._transfer(btag, size))
+        else:
+            raise AssertionError('Unexpected MsgID {}'.format(msgid))
+        return len(data)
+
+    def _respond(self, command):
+        self.commands.append(command)
+        if command.startswith(b'ECHO '):
+            self._answer = bytearray(command[5:])
+        elif command.endswith(b'?\n'):
+            self._answer = bytearray(command[:-2] + b' OK\n')
+
+    def _transfer(self, btag, size):
+        data = bytes(self._answer[:size])
+        del self._answer[:size]
+        eom = not self._answer
+        btag = (btag + self.btag_offset_next) & 0xff
+        self.btag_offset_next = 0
+        transfer = (struct.pack('BBBx', MSGID.DEV_DEP_MSG_IN, btag, ~btag & 0xff) +
+                    struct.pack('<LBxxx', len(data), eom) + data + b'\0' * ((4 - len(data)) % 4))
+        if self.truncate_next:
+            transfer = transfer[:12 + len(data) - self.truncate_next]
+            self.truncate_next = 0
+        return transfer
+
+    def bulk_read(self, dev_handle, ep, intf, buff, timeout):
+        self.bulk_in_buffers.append(len(buff))
+        try:
+            transfer = self._bulk_in.get(timeout=timeout / 1000)
+        except queue.Empty:
+            raise usb.core.USBTimeoutError('Operation timed out', -7, errno.ETIMEDOUT)
+        if len(transfer) > len(buff):
+            raise usb.core.USBError('Overflow', -8, errno.EOVERFLOW)
+        buff[:len(transfer)] = type(buff)('B', transfer)
+        return len(transfer)
+
+    def intr_read(self, dev_handle, ep, intf, buff, timeout):
+        try:
+            packet = self._interrupt.get(timeout=timeout / 1000)
+        except queue.Empty:
+            raise usb.core.USBTimeoutError('Operation timed out', -7, errno.ETIMEDOUT)
+        buff[:len(packet)] = type(buff)('B', packet)
+        return len(packet)
+
+    def ctrl_transfer(self, dev_handle, bmRequestType, bRequest, wValue, wIndex, data, timeout):
+        if bRequest == REQUEST.GET_CAPABILITIES:
+            response = bytes((STATUS.SUCCESS, 0, 0x00, 0x01)) + bytes(20)
+        elif bRequest == REQUEST.READ_STATUS_BYTE:
+            btag = wValue
+            self.stb_btags.append(btag)
+            if len(self.endpoints) > 2:
+                # The status byte is sent through the Interrupt-IN endpoint.
+                response = bytes((STATUS.SUCCESS, btag, 0))
+                self._interrupt.put(bytes((0x80 | btag, self.stb)))
+            else:
+                response = bytes((STATUS.SUCCESS, btag, self.stb))
+        else:
+            raise usb.core.USBError('Pipe error', -9, errno.EPIPE)
+        data[:len(response)] = type(data)('B', response)
+        return len(response)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+    visalib_standin
+    ~~~~~~~~~~~~~~~
+
+    Fake VISA library standing in for the shared library, to test
+    VisaLibrary without a VISA installation. Pass it as library_path:
+    ``VisaLibrary(VisaStandIn())``.
+
+    It implements the functions used by the reads:
+
+    - viRead returns the next bytes of the data set with set_data.
+    - viReadAsync starts a job that is completed, in any order, with
+      complete. Each completion queues an I/O completion event.
+    - viWaitOnEvent returns the queued events, and fails with ERROR_TMO
+      when none arrives in time or with the error given to fail_wait.
+
+    Error status codes are raised as the errcheck of the library functions
+    does, so that they reach VisaLibrary as with the shared library.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import ctypes as ct
+import queue
+
+from lantz.drivers.legacy.visalib import VisaLibrary, Attributes, Events, StatusCode
+
+
+class VisaStandIn(object):
+    """Fake VISA library with message based sessions.
+    """
+
+    def __init__(self):
+        #: Event contexts closed with viClose.
+        self.closed = []
+
+        self._data = b''
+        self._jobs = {}
+        self._next_job_id = 1
+        self._events = queue.Queue()
+        self._contexts = {}
+        self._next_context = 1000
+
+    @staticmethod
+    def _status(code):
+        if code < 0:
+            raise VisaLibrary._status_error(code)
+        return code
+
+    def set_data(self, data):
+        """Set the data returned by the following viRead calls.
+        """
+        self._data = data
+
+    def complete(self, job_id, data, status=StatusCode.SUCCESS.code):
+        """Complete an asynchronous read copying data into its buffer, and
+        queue the I/O completion event.
+
+        :return: number of bytes copied.
+        """
+        buffer, count = self._jobs.pop(job_id)
+        count = min(count, len(data)) if status >= 0 else 0
+        ct.memmove(buffer, data, count)
+
+        context = self._next_context
+        self._next_context += 1
+        self._contexts[context] = {Attributes.JOB_ID.code: job_id,
+                                   Attributes.RET_COUNT.code: count,
+                                   Attributes.STATUS.code: status}
+        self._events.put((Events.IO_COMPLETION.code, context))
+        return count
+
+    def fail_wait(self, status):
+        """Make the next viWaitOnEvent call fail with the given status.
+        """
+        self._events.put((status, None))
+
+    def pending_jobs(self):
+        return sorted(self._jobs)
+
+    def viRead(self, session, buffer, count, return_count):
+        data, self._data = self._data[:count], self._data[count:]
+        ct.memmove(buffer, data, len(data))
+        return_count._obj.value = len(data)
+        return self._status(StatusCode.SUCCESS_MAX_CNT.code if len(data) == count else StatusCode.SUCCESS.code)
+
+    def viReadAsync(self, session, buffer, count, job_id):
+        job_id._obj.value = self._next_job_id
+        self._jobs[self._next_job_id] = buffer, count
+        self._next_job_id += 1
+        return self._status(StatusCode.SUCCESS.code)
+
+    def viWaitOnEvent(self, session, in_event_type, timeout, out_event_type, out_context):
+        assert in_event_type == Events.IO_COMPLETION.code
+        try:
+            event_type, context = self._events.get(timeout=timeout / 1000)
+        except queue.Empty:
+            return self._status(StatusCode.ERROR_TMO.code)
+        if context is None:
+            return self._status(event_type)
+        out_event_type._obj.value = event_type
+        out_context._obj.value = context
+        return self._status(StatusCode.SUCCESS.code)
+
+    def viGetAttribute(self, session, attribute, attribute_state):
+        attributes = self._contexts.get(getattr(session, 'value', session))
+        if attributes is None or attribute not in attributes:
+            return self._status(StatusCode.ERROR_NSUP_ATTR.code)
+        attribute_state._obj.value = attributes[attribute]
+        return self._status(StatusCode.SUCCESS.code)
+
+    def viClose(self, session):
+        context = getattr(session, 'value', session)
+        if self._contexts.pop(context, None) is None:
+            return self._status(StatusCode.ERROR_INV_OBJECT.code)
+        self.closed.append(context)
+        return self._status(StatusCode.SUCCESS.code)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+    vxi11_standin
+    ~~~~~~~~~~~~~
+
+    Local VXI-11 core channel server standing in for an instrument, to test
+    Vxi11Driver without hardware. It listens on a free port, which the
+    driver must be given as Vxi11Driver.PORT as there is no port mapper.
+
+    The data written with device_write is answered as:
+
+    - ``ECHO <data>``: <data>, unchanged.
+    - ``<text>?``: ``<text> OK``.
+    - anything else: no answer.
+
+    Service requests are sent to the client with service_request, through
+    the interrupt channel the client created with create_intr_chan.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import socket
+import threading
+
+from lantz.drivers.legacy import rpc
+from lantz.drivers.legacy.vxi11 import (DEVICE_CORE_PROG, DEVICE_CORE_VERS, DEVICE_INTR_PROG,
+                                        DEVICE_INTR_VERS, DEVICE_INTR_SRQ, DEVICE_TCP,
+                                        ERROR_CODES, OP_FLAG_END, RX_END, RX_REQCNT)
+
+
+class IntrClient(rpc.RawTCPClient):
+    """Client of the interrupt channel, from the instrument to the driver.
+    """
+
+    def __init__(self, host, port):
+        super().__init__(host, DEVICE_INTR_PROG, DEVICE_INTR_VERS, port)
+        self.packer = rpc.Packer()
+        self.unpacker = rpc.Unpacker('')
+
+    def device_intr_srq(self, handle):
+        # One way call, there is no reply.
+        self.send_call(DEVICE_INTR_SRQ, handle, self.packer.pack_opaque)
+
+
+class Vxi11StandIn(rpc.TCPServer):
+    """VXI-11 core channel server listening on a free local port.
+
+    :param max_recv_size: maximum size of a device_write block announced
+                          to the client.
+    """
+
+    LINK = 1
+
+    def __init__(self, max_recv_size=64):
+        super().__init__('127.0.0.1', DEVICE_CORE_PROG, DEVICE_CORE_VERS, 0)
+        self.host, self.port = self.sock.getsockname()
+        self.max_recv_size = max_recv_size
+
+        #: Status byte returned by device_readstb.
+        self.stb = 0
+        #: Error returned by device_lock.
+        self.lock_error = ERROR_CODES.NO_ERROR
+
+        #: create_link parameters as (client id, lock device, lock timeout, device name).
+        self.link_parms = None
+        #: device_write calls as (flags, data).
+        self.writes = []
+        #: Sizes requested in the device_read calls.
+        self.read_sizes = []
+        #: Names of the other procedures called, with their arguments.
+        self.calls = []
+        #: Arguments of the last device_enable_srq call as (enable, handle).
+        self.srq = None
+        #: Client of the interrupt channel, once created.
+        self.intr_client = None
+        #: Exception raised in the server thread, if any.
+        self.error = None
+
+        self._data = bytearray()
+        self._answer = bytearray()
+        self._connection = None
+
+        self.sock.listen(1)
+        self._thread = threading.Thread(target=self._serve, name='VXI-11 stand-in', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        if self.intr_client is not None:
+            self.intr_client.close()
+        for sock in (self._connection, self.sock):
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        self._thread.join(1)
+
+    def service_request(self, handle=None):
+        """Call device_intr_srq with the handle given in device_enable_srq,
+        or with another one.
+        """
+        self.intr_client.device_intr_srq(self.srq[1] if handle is None else handle)
+
+    def _serve(self):
+        try:
+            self._connection, address = self.sock.accept()
+            self.session((self._connection, address))
+        except OSError:
+            pass
+        except Exception as e:
+            self.error = e
+
+    def _reply(self, *values):
+        self.turn_around()
+        for value in values:
+            self.packer.pack_int(value)
+
+    def _generic(self, name):
+        self.unpacker.unpack_int()
+        self.unpacker.unpack_int()
+        self.unpacker.unpack_uint()
+        self.unpacker.unpack_uint()
+        self.calls.append((name, ))
+        self._reply(ERROR_CODES.NO_ERROR)
+
+    def handle_10(self):
+        u = self.unpacker
+        self.link_parms = (u.unpack_int(), u.unpack_bool(), u.unpack_uint(), u.unpack_string())
+        self._reply(ERROR_CODES.NO_ERROR, self.LINK, 0, self.max_recv_size)
+
+    def handle_11(self):
+        u = self.unpacker
+        link, io_timeout, lock_timeout, flags = u.unpack_int(), u.unpack_uint(), u.unpack_uint(), u.unpack_int()
+        data = u.unpack_opaque()
+        self.writes.append((flags, data))
+        self._data += data
+        if flags & OP_FLAG_END:
+            self._respond(bytes(self._data))
+            self._data = bytearray()
+        self._reply(ERROR_CODES.NO_ERROR, len(data))
+
+    def _respond(self, command):
+        if command.startswith(b'ECHO '):
+            self._answer = bytearray(command[5:])
+        elif command.endswith(b'?\n'):
+            self._answer = bytearray(command[:-2] + b' OK\n')
+
+    def handle_12(self):
+        u = self.unpacker
+        link, request_size, io_timeout, lock_timeout, flags, term_char = (
+            u.unpack_int(), u.unpack_uint(), u.unpack_uint(), u.unpack_uint(), u.unpack_int(), u.unpack_int())
+        self.read_sizes.append(request_size)
+        if not self._answer:
+            self._reply(ERROR_CODES.IO_TIMEOUT, 0)
+            self.packer.pack_opaque(b'')
+            return
+        data = bytes(self._answer[:request_size])
+        del self._answer[:request_size]
+        self._reply(ERROR_CODES.NO_ERROR, RX_REQCNT if self._answer else RX_END)
+        self.packer.pack_opaque(data)
+
+    def handle_13(self):
+        self._generic('device_readstb')
+        self.packer.pack_uint(self.stb)
+
+    def handle_14(self):
+        self._generic('device_trigger')
+
+    def handle_15(self):
+        self._generic('device_clear')
+        self._answer = bytearray()
+
+    def handle_16(self):
+        self._generic('device_remote')
+
+    def handle_17(self):
+        self._generic('device_local')
+
+    def handle_18(self):
+        u = self.unpacker
+        link, flags, lock_timeout = u.unpack_int(), u.unpack_int(), u.unpack_uint()
+        self.calls.append(('device_lock', lock_timeout))
+        self._reply(self.lock_error)
+
+    def handle_19(self):
+        self.unpacker.unpack_int()
+        self.calls.append(('device_unlock', ))
+        self._reply(ERROR_CODES.NO_ERROR)
+
+    def handle_20(self):
+        u = self.unpacker
+        link, enable, handle = u.unpack_int(), u.unpack_bool(), u.unpack_opaque()
+        self.srq = (enable, handle)
+        self._reply(ERROR_CODES.NO_ERROR)
+
+    def handle_23(self):
+        self.unpacker.unpack_int()
+        self.calls.append(('destroy_link', ))
+        self._reply(ERROR_CODES.NO_ERROR)
+
+    def handle_25(self):
+        u = self.unpacker
+        host_addr, host_port, prog_num, prog_vers, prog_family = (
+            u.unpack_uint(), u.unpack_uint(), u.unpack_uint(), u.unpack_uint(), u.unpack_int())
+        self.calls.append(('create_intr_chan', host_addr, host_port, prog_num, prog_vers, prog_family))
+        if (prog_num, prog_vers, prog_family) != (DEVICE_INTR_PROG, DEVICE_INTR_VERS, DEVICE_TCP):
+            self._reply(ERROR_CODES.OPERATION_NOT_SUPPORTED)
+            return
+        self.intr_client = IntrClient(socket.inet_ntoa(host_addr.to_bytes(4, 'big')), host_port)
+        self._reply(ERROR_CODES.NO_ERROR)
+
+    def handle_26(self):
+        self.calls.append(('destroy_intr_chan', ))
+        if self.intr_client is not None:
+            self.intr_client.close()
+            self.intr_client = None
+        self._reply(ERROR_CODES.NO_ERROR)
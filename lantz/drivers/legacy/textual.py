@@ -10,6 +10,9 @@
 """
 
 import time
+
+import numpy as np
+
 from lantz.errors import LantzTimeoutError
 from lantz.processors import ParseProcessor
 
@@ -42,12 +45,13 @@ class TextualMixin(object):
     #: Parsers
     PARSERS = {}
     #: Size in bytes of the receive chunk (-1 means all bytes in buffer)
-    RECV_CHUNK = 1
+    #: raw_recv is expected to return the bytes available, up to this size.
+    RECV_CHUNK = 4096
 
-    #: String containing the part of the message after RECV_TERMINATION
+    #: Bytes received after RECV_TERMINATION, kept for the next recv.
     #: Used in software based finding of termination character when
     #: RECV_CHUNK > 1
-    _received = ''
+    _received = b''
 
     def raw_recv(self, size):
         """Receive raw bytes from the instrument. No encoding or termination
@@ -61,6 +65,21 @@ class TextualMixin(object):
         """
         raise NotImplemented
 
+    def raw_recv_into(self, buffer):
+        """Receive raw bytes from the instrument into a writable buffer.
+        No encoding or termination character should be applied.
+
+        Transports that can receive directly into a buffer should override
+        this method, the default implementation copies the output of raw_recv.
+
+        :param buffer: writable object supporting the buffer protocol.
+        :return: number of bytes received.
+        :rtype: int
+        """
+        data = self.raw_recv(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
     def raw_send(self, data):
         """Send raw bytes to the instrument. No encoding or termination
         character should be applied.
@@ -93,6 +112,13 @@ class TextualMixin(object):
 
         message = bytes(command + termination, encoding)
         self.log_debug('Sending {}', message)
+        return self._send_message(message)
+
+    def _send_message(self, message):
+        """Send a complete message, already encoded and terminated.
+
+        Transports that need to frame messages should override this method.
+        """
         return self.raw_send(message)
 
     def recv(self, termination=None, encoding=None, recv_chunk=None):
@@ -117,20 +143,47 @@ class TextualMixin(object):
         else:
             stop = time.time() + self.TIMEOUT
 
-        received = self._received
-        eom = False
-        while not (termination in received or eom):
+        termination = bytes(termination, encoding)
+        received = bytearray(self._received)
+        start = 0
+        while True:
+            end = received.find(termination, start)
+            if end >= 0:
+                break
             if time.time() > stop:
                 raise LantzTimeoutError
-            raw_received = self.raw_recv(recv_chunk)
-            received += str(raw_received, encoding)
+            # Only the new bytes (and a possibly split termination) need to
+            # be searched in the next iteration.
+            start = max(0, len(received) - len(termination) + 1)
+            received += self.raw_recv(recv_chunk)
 
-        self.log_debug('Received {!r} (len={})', received, len(received))
+        self._received = bytes(received[end + len(termination):])
+        received = received[:end].decode(encoding)
 
-        received, self._received = received.split(termination, 1)
+        self.log_debug('Received {!r} (len={})', received, len(received))
 
         return received
 
+    def _recv_exactly(self, buffer):
+        """Fill a writable buffer with received bytes, starting with those
+        left over by a previous recv.
+        """
+        view = memoryview(buffer).cast('B')
+        size = len(view)
+        done = min(len(self._received), size)
+        view[:done] = self._received[:done]
+        self._received = self._received[done:]
+
+        if self.TIMEOUT is None or self.TIMEOUT < 0:
+            stop = float('+inf')
+        else:
+            stop = time.time() + self.TIMEOUT
+
+        while done < size:
+            if time.time() > stop:
+                raise LantzTimeoutError
+            done += self.raw_recv_into(view[done:])
+
     def query(self, command, *, send_args=(None, None), recv_args=(None, None)):
         """Send query to the instrument and return the answer
 
@@ -157,3 +210,71 @@ class TextualMixin(object):
             parser = self.PARSERS.setdefault(format, ParseProcessor(format))
             ans = parser(ans)
         return ans
+
+    def query_binary_values(self, command, dtype='f', endianness='<', *,
+                            expect_termination=True, send_args=(None, None)):
+        """Send query to the instrument and return the answer, an IEEE 488.2
+        definite length block (#<number of digits><length><data>), as an array.
+
+        The data is received directly into the returned array.
+
+        :param command: command to be sent to the instrument
+        :type command: string
+        :param dtype: NumPy data type of the elements.
+        :param endianness: '<' for little and '>' for big endian data.
+        :param expect_termination: receive the termination after the block.
+        :param send_args: (termination, encoding) to override class defaults
+        :rtype: NumPy array
+        """
+        self.send(command, *send_args)
+
+        header = bytearray(1)
+        self._recv_exactly(header)
+        while header != b'#':
+            self._recv_exactly(header)
+        self._recv_exactly(header)
+        if header == b'0':
+            raise ValueError('Indefinite length blocks are not supported')
+        digits = bytearray(int(header))
+        self._recv_exactly(digits)
+        length = int(digits)
+
+        dtype = np.dtype(dtype).newbyteorder(endianness)
+        if length % dtype.itemsize:
+            raise ValueError('Block length {} is not a multiple of the {} item size'.format(length, dtype))
+        data = np.empty(length // dtype.itemsize, dtype=dtype)
+        self._recv_exactly(data)
+
+        self.log_debug('Received block of {} bytes', length)
+
+        if expect_termination:
+            self.recv()
+
+        return data
+
+    def write_binary_values(self, command, values, dtype='f', endianness='<', *,
+                            send_args=(None, None)):
+        """Send command to the instrument followed by values as an IEEE 488.2
+        definite length block (#<number of digits><length><data>).
+
+        :param command: command to be sent to the instrument
+        :type command: string
+        :param values: sequence or NumPy array of values.
+        :param dtype: NumPy data type of the elements.
+        :param endianness: '<' for little and '>' for big endian data.
+        :param send_args: (termination, encoding) to override class defaults
+        :return: number of bytes sent.
+        """
+        termination, encoding = send_args
+        if termination is None:
+            termination = self.SEND_TERMINATION
+        if encoding is None:
+            encoding = self.ENCODING
+
+        data = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder(endianness))
+        length = str(data.nbytes)
+        header = '{}#{}{}'.format(command, len(length), length)
+
+        message = b''.join((bytes(header, encoding), data.data, bytes(termination, encoding)))
+        self.log_debug('Sending block of {} bytes', data.nbytes)
+        return self._send_message(message)
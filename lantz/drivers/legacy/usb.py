@@ -21,7 +21,7 @@ import usb
 from usb.util import (get_string as usb_get_string,
                       find_descriptor as usb_find_desc)
 
-from lantz import Driver
+from lantz import Driver, errors
 from lantz.errors import LantzTimeoutError, InstrumentError
 
 
@@ -234,7 +234,7 @@ def find_devices(vendor=None, product=None, serial_number=None, custom_match=Non
     else:
         cm = custom_match
 
-    return usb.core.find(find_all=True, custom_match=cm, **kwargs)
+    return list(usb.core.find(find_all=True, custom_match=cm, **kwargs))
 
 
 def find_interfaces(device, **kwargs):
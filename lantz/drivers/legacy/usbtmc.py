@@ -13,8 +13,11 @@
 """
 
 import enum
+import errno
 import time
 import struct
+import threading
+from array import array
 from collections import namedtuple
 
 import usb
@@ -44,6 +47,22 @@ class REQUEST(enum.IntEnum):
     CHECK_CLEAR_STATUS = 6
     GET_CAPABILITIES = 7
     INDICATOR_PULSE = 64
+    READ_STATUS_BYTE = 128 # USB488
+
+
+class STATUS(enum.IntEnum):
+    SUCCESS = 0x01
+    PENDING = 0x02
+    FAILED = 0x80
+    TRANSFER_NOT_IN_PROGRESS = 0x81
+    SPLIT_NOT_IN_PROGRESS = 0x82
+    SPLIT_IN_PROGRESS = 0x83
+
+
+def is_timeout(error):
+    """True if a USBError was raised because the transfer timed out.
+    """
+    return error.errno == errno.ETIMEDOUT or isinstance(error, getattr(usb.core, 'USBTimeoutError', ()))
 
 
 def find_tmc_devices(vendor=None, product=None, serial_number=None, custom_match=None, **kwargs):
@@ -84,7 +103,7 @@ class BulkInMessage(namedtuple('BulkInMessage', 'msgid btag btaginverse '
 
         transfer_size, transfer_attributes = struct.unpack_from('<LBxxx', data, 4)
 
-        data = data[12:]
+        data = data[12:12 + transfer_size]
         return cls(msgid, btag, btaginverse, transfer_size, transfer_attributes, data)
 
 
@@ -115,12 +134,28 @@ class USBTMCDriver(USBDriver, TextualMixin):
 
     RECV_CHUNK = 1024 ** 2
 
+    #: Timeout in ms of each read of the interrupt endpoint in the SRQ thread.
+    SRQ_POLL_TIMEOUT = 100
+
     find_devices = staticmethod(find_tmc_devices)
 
     def __init__(self, vendor=None, product=None, serial_number=None, **kwargs):
         super().__init__(vendor, product, serial_number, **kwargs)
         self.usb_intr_in = find_endpoint(self.usb_intf, usb.ENDPOINT_IN, usb.ENDPOINT_TYPE_INTERRUPT)
-        self.log_debug('EP Address: intr={}'.format(self.usb_intr_in.bEndpointAddress))
+        if self.usb_intr_in is not None:
+            self.log_debug('EP Address: intr={}'.format(self.usb_intr_in.bEndpointAddress))
+
+        #: Bulk-IN transfer buffer, grown as needed in multiples of wMaxPacketSize.
+        self._bulk_in = array('B')
+
+        self._stb_btag = 1
+        self._stb_replies = {}
+        self._intr_condition = threading.Condition()
+
+        self._srq_thread = None
+        self._stop_srq = threading.Event()
+        self._srq_event = threading.Event()
+        self._srq_callbacks = []
 
         self.usb_dev.reset()
 
@@ -154,18 +189,15 @@ class USBTMCDriver(USBDriver, TextualMixin):
         return interfaces[0]
 
     def send(self, command, termination=None, encoding=None):
-        if termination is None:
-            termination = self.SEND_TERMINATION
-        if encoding is None:
-            encoding = self.ENCODING
+        return TextualMixin.send(self, command, termination, encoding)
 
-        message = bytes(command + termination, encoding)
-        self.log_debug('Sending {}', message)
+    send.__doc__ = TextualMixin.send.__doc__
 
+    def _send_message(self, message):
         begin, end, size = 0, 0, len(message)
         bytes_sent = 0
         while not end > size:
-            begin, end = end, begin + self.RECV_CHUNK
+            begin, end = end, end + self.RECV_CHUNK
 
             self._btag = (self._btag % 255) + 1
 
@@ -175,7 +207,59 @@ class USBTMCDriver(USBDriver, TextualMixin):
 
         return bytes_sent
 
-    send.__doc__ = TextualMixin.send.__doc__
+    _send_message.__doc__ = TextualMixin._send_message.__doc__
+
+    def _bulk_in_buffer(self, size):
+        # Header, data and up to 3 alignment bytes, rounded up to whole
+        # packets so that the device can never overflow the transfer.
+        packet = self.usb_recv_ep.wMaxPacketSize
+        length = -(-(12 + size + 3) // packet) * packet
+        if len(self._bulk_in) < length:
+            self._bulk_in = array('B', bytes(length))
+        return self._bulk_in
+
+    def _bulk_in_transfer(self, size):
+        """Request a Bulk-IN transfer of at most size bytes and read it into
+        the transfer buffer.
+
+        :return: view of the data in the transfer buffer, end of message flag.
+        """
+        self._btag = (self._btag % 255) + 1
+
+        self.raw_send(BulkInMessage.build_array(self._btag, size, None))
+
+        buffer = self._bulk_in_buffer(size)
+        received = self.usb_recv_ep.read(buffer, self.TIMEOUT)
+
+        msgid, btag, transfer_size, transfer_attributes = struct.unpack_from('<BBxxLBxxx', buffer)
+        if msgid != MSGID.DEV_DEP_MSG_IN or btag != self._btag:
+            raise errors.InstrumentError('Unexpected Bulk-IN header (MsgID {}, bTag {})'.format(msgid, btag))
+        if received < 12 + transfer_size:
+            raise errors.InstrumentError('Incomplete Bulk-IN transfer')
+
+        return memoryview(buffer)[12:12 + transfer_size], transfer_attributes & 1
+
+    def raw_recv_into(self, buffer):
+        data, eom = self._bulk_in_transfer(min(len(buffer), self.RECV_CHUNK))
+        memoryview(buffer).cast('B')[:len(data)] = data
+        return len(data)
+
+    raw_recv_into.__doc__ = TextualMixin.raw_recv_into.__doc__
+
+    def read_raw_into(self, buffer):
+        """Read binary data from the instrument into a writable buffer, until
+        the end of the message or until the buffer is full.
+
+        :return: number of bytes read.
+        """
+        view = memoryview(buffer).cast('B')
+        done = 0
+        eom = False
+        while done < len(view) and not eom:
+            data, eom = self._bulk_in_transfer(min(len(view) - done, self.RECV_CHUNK))
+            view[done:done + len(data)] = data
+            done += len(data)
+        return done
 
     def recv(self, termination=None, encoding=None, recv_chunk=None):
 
@@ -185,27 +269,147 @@ class USBTMCDriver(USBDriver, TextualMixin):
 
         eom = False
 
-        received = self._received
+        termination = bytes(termination, encoding)
+        received = bytearray(self._received)
+        start = 0
 
-        while not (termination in received or eom):
-            self._btag = (self._btag % 255) + 1
+        while True:
+            end = received.find(termination, start)
+            if end >= 0:
+                break
+            if eom:
+                end = len(received)
+                break
+            start = max(0, len(received) - len(termination) + 1)
 
-            req = BulkInMessage.build_array(self._btag, recv_chunk, None)
+            data, eom = self._bulk_in_transfer(recv_chunk)
+            received += data
 
-            self.raw_send(req)
+        self._received = bytes(received[end + len(termination):])
+        received = received[:end].decode(encoding)
 
-            resp = self.raw_recv(recv_chunk)
+        self.log_debug('Received {!r} (len={})', received, len(received))
 
-            response = BulkInMessage.from_bytes(resp)
+        return received
 
-            received += str(response.data, encoding)
-            eom = response.transfer_attributes & 1
+    recv.__doc__ = TextualMixin.recv.__doc__
 
-        self.log_debug('Received {!r} (len={})', received, len(received))
+    def read_stb(self):
+        """Read the status byte with the USB488 READ_STATUS_BYTE request.
 
-        received, self._received = received.split(termination, 1)
+        Devices with an interrupt endpoint send the status byte through it.
+        """
+        self._stb_btag = (self._stb_btag - 1) % 126 + 2
+        btag = self._stb_btag
+
+        response = self.usb_dev.ctrl_transfer(
+                       usb.util.build_request_type(usb.util.CTRL_IN,
+                                                   usb.util.CTRL_TYPE_CLASS,
+                                                   usb.util.CTRL_RECIPIENT_INTERFACE),
+                       REQUEST.READ_STATUS_BYTE,
+                       btag,
+                       self.usb_intf.index,
+                       0x0003,
+                       timeout=self.TIMEOUT)
+
+        if response[0] != STATUS.SUCCESS:
+            raise errors.InstrumentError('READ_STATUS_BYTE failed with status {}'.format(response[0]))
+
+        if self.usb_intr_in is None:
+            return response[2]
+
+        stop = time.time() + self.TIMEOUT / 1000
+        with self._intr_condition:
+            while btag not in self._stb_replies:
+                remaining = stop - time.time()
+                if remaining <= 0:
+                    raise errors.InstrumentError('Timeout waiting for the status byte')
+                if self._srq_thread is not None:
+                    self._intr_condition.wait(remaining)
+                else:
+                    self._handle_interrupt(self.usb_intr_in.read(self.usb_intr_in.wMaxPacketSize,
+                                                                 int(remaining * 1000) + 1))
+            return self._stb_replies.pop(btag)
+
+    def _handle_interrupt(self, packet):
+        if packet[0] == 0x81:
+            # SRQ notification, the second byte is the status byte.
+            self._on_srq()
+        elif packet[0] & 0x80:
+            # Response to READ_STATUS_BYTE, identified by bTag.
+            with self._intr_condition:
+                self._stb_replies[packet[0] & 0x7F] = packet[1]
+                self._intr_condition.notify_all()
+
+    def enable_srq(self, callback=None):
+        """Read the interrupt endpoint in a background thread to receive
+        service requests.
+
+        Each service request sets the event waited by wait_for_srq and calls
+        the registered callbacks, with the driver as argument, from the
+        reading thread.
+
+        :param callback: callable to register, in addition to the ones
+                         registered in previous calls.
+        """
+        if self.usb_intr_in is None:
+            raise errors.InstrumentError('The device has no interrupt endpoint.')
 
-        return received
+        if callback is not None:
+            self._srq_callbacks.append(callback)
 
-    recv.__doc__ = TextualMixin.recv.__doc__
+        if self._srq_thread is not None:
+            return
+
+        self._stop_srq.clear()
+        self._srq_thread = threading.Thread(target=self._srq_loop, name='USBTMC SRQ listener', daemon=True)
+        self._srq_thread.start()
 
+    def disable_srq(self):
+        """Stop reading the interrupt endpoint and forget the registered
+        callbacks.
+        """
+        if self._srq_thread is None:
+            return
+        self._stop_srq.set()
+        self._srq_thread.join()
+        self._srq_thread = None
+        self._srq_callbacks = []
+
+    def wait_for_srq(self, timeout=None):
+        """Wait for a service request.
+
+        The request is consumed when returning, so each one is reported once.
+
+        :param timeout: maximum wait in seconds, None to wait forever.
+        :return: True if a service request arrived, False on timeout.
+        """
+        if self._srq_thread is None:
+            raise errors.InstrumentError('Service requests are not enabled.')
+        arrived = self._srq_event.wait(timeout)
+        self._srq_event.clear()
+        return arrived
+
+    def _srq_loop(self):
+        while not self._stop_srq.is_set():
+            try:
+                packet = self.usb_intr_in.read(self.usb_intr_in.wMaxPacketSize, self.SRQ_POLL_TIMEOUT)
+            except usb.core.USBError as e:
+                if not is_timeout(e):
+                    self.log_error('Error reading the interrupt endpoint: {}', e)
+                    self._stop_srq.wait(0.1)
+                continue
+            self._handle_interrupt(packet)
+
+    def _on_srq(self):
+        self._srq_event.set()
+
+        for callback in self._srq_callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                self.log_error('Error in service request callback: {}', e)
+
+    def finalize(self):
+        self.disable_srq()
+        return super().finalize()
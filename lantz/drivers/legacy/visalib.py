@@ -37,6 +37,7 @@ import ctypes as ct
 from ctypes.util import find_library
 import warnings
 import threading
+from concurrent.futures import Future
 
 from collections import namedtuple
 
@@ -656,6 +657,7 @@ class VisaLibrary(object):
     """VISA Library wrapper.
 
     :param library_path: full path of the library. If not given, the default value LIBRARY_PATH it is used.
+                         An object providing the VISA functions (e.g. a fake library) is used as is.
     """
 
     #: Holds a mapping between library_path and VisaLibrary objects
@@ -671,11 +673,20 @@ class VisaLibrary(object):
         obj.session = None
         obj.status = 0
 
-        obj.lib = LIBTYPE(library_path)
-            
         obj.lock = threading.RLock()
 
-        obj._add_types()
+        if library_path is None or isinstance(library_path, str):
+            obj.lib = LIBTYPE(library_path)
+            obj._add_types()
+        else:
+            obj.lib = library_path
+
+        #: Per thread state, holds the buffer reused by read.
+        obj._local = threading.local()
+
+        #: Asynchronous reads waiting for completion, as a mapping between
+        #: session and a dictionary of job id to (future, ctypes buffer).
+        obj._async_reads = {}
 
         s = StatusCode
 
@@ -698,19 +709,41 @@ class VisaLibrary(object):
         self.status = ret_value
 
         if ret_value < 0:
-            try:
-                err = StatusCode[ret_value]
-            except:
-                raise Exception('Unknown Error: {}'.format(ret_value))
-
-            raise Exception('{0.doc} ({0.name}: {0.code})'.format(err))
+            raise self._status_error(ret_value)
 
         if ret_value in self.issue_warning_on:
             status = StatusCode[ret_value]
-            warnings.warn("{:.name}: {:.doc}".format(status), warnings.WarningMessage, stacklevel=2)
+            warnings.warn("{0.name}: {0.doc}".format(status), stacklevel=2)
 
         return ret_value
 
+    @staticmethod
+    def _status_error(ret_value):
+        """Exception for an error status code.
+        """
+        try:
+            err = StatusCode[ret_value]
+        except KeyError:
+            return Exception('Unknown Error: {}'.format(ret_value))
+
+        return Exception('{0.doc} ({0.name}: {0.code})'.format(err))
+
+    def _read_buffer(self, count):
+        """ctypes buffer of at least count bytes, reused by the calls of each thread.
+        """
+        buffer = getattr(self._local, 'read_buffer', None)
+        if buffer is None or len(buffer) < count:
+            buffer = self._local.read_buffer = ct.create_string_buffer(count)
+        return buffer
+
+    @staticmethod
+    def _from_buffer(buffer):
+        """ctypes char array sharing the memory of a writable buffer
+        (bytearray, NumPy array, memoryview, ...).
+        """
+        view = memoryview(buffer).cast('B')
+        return (ct.c_char * len(view)).from_buffer(view)
+
     def _add_types(self):
         """Add argument types and return type to functions in the library.
         """
@@ -849,10 +882,10 @@ class VisaLibrary(object):
         :return: data read.
         :rtype: bytes
         """
-        buffer = ct.create_string_buffer(count)
+        buffer = self._read_buffer(count)
         return_count = Types.UInt32()
         self.lib.viBufRead(session, buffer, count, ct.addressof(return_count))
-        return buffer.raw[:return_count.value]
+        return ct.string_at(buffer, return_count.value)
 
     def buffer_write(self, session, data):
         """Writes data to a formatted I/O write buffer synchronously.
@@ -1354,15 +1387,92 @@ class VisaLibrary(object):
         :param session: Unique logical identifier to a session.
         :param count: Number of bytes to be read.
         :return: data read.
+        :rtype: bytes
         """
-        buffer = ct.create_string_buffer(count)
+        buffer = self._read_buffer(count)
         return_count = Types.UInt32()
         self.lib.viRead(session, buffer, count, ct.byref(return_count))
-        return buffer.value[:return_count.value]
+        return ct.string_at(buffer, return_count.value)
+
+    def read_into(self, session, buffer):
+        """Reads data from device or interface synchronously into a writable buffer.
+
+        :param session: Unique logical identifier to a session.
+        :param buffer: bytearray, NumPy array or other writable object supporting the buffer protocol.
+                       Up to its size in bytes are read.
+        :return: Number of bytes actually transferred.
+        """
+        c_buffer = self._from_buffer(buffer)
+        return_count = Types.UInt32()
+        self.lib.viRead(session, c_buffer, len(c_buffer), ct.byref(return_count))
+        return return_count.value
+
+    def read_async(self, session, buffer, timeout=Constants.TMO_INFINITE):
+        """Reads data from device or interface asynchronously into a writable buffer.
+
+        The I/O completion event must be enabled for the queue mechanism
+        (enable_event(session, Events.IO_COMPLETION.code, Constants.QUEUE)).
+        A thread per session waits on the event and resolves the futures of
+        the reads in progress. The buffer must not be used until then.
+
+        :param session: Unique logical identifier to a session.
+        :param buffer: bytearray, NumPy array or other writable object supporting the buffer protocol.
+                       Up to its size in bytes are read.
+        :param timeout: Time in milliseconds to wait for each completion event.
+                        If it expires, all the reads in progress of the session fail.
+        :return: future resolving to the number of bytes actually transferred.
+        :rtype: concurrent.futures.Future
+        """
+        c_buffer = self._from_buffer(buffer)
+        future = Future()
+        job_id = Types.JobId()
+        with self.lock:
+            self.lib.viReadAsync(session, c_buffer, len(c_buffer), ct.byref(job_id))
+            jobs = self._async_reads.get(session)
+            if jobs is None:
+                jobs = self._async_reads[session] = {}
+                threading.Thread(target=self._async_read_loop, args=(session, timeout),
+                                 name='VISA I/O completion', daemon=True).start()
+            jobs[job_id.value] = future, c_buffer
+        return future
+
+    def _async_read_loop(self, session, timeout):
+        while True:
+            with self.lock:
+                if not self._async_reads[session]:
+                    del self._async_reads[session]
+                    return
+
+            try:
+                event_type, context = self.wait_on_event(session, Events.IO_COMPLETION.code, timeout)
+                try:
+                    job_id = self.get_attribute(context, Attributes.JOB_ID)
+                    count = self.get_attribute(context, Attributes.RET_COUNT)
+                    status = self.get_attribute(context, Attributes.STATUS)
+                finally:
+                    self.close(context)
+            except Exception as e:
+                with self.lock:
+                    jobs = self._async_reads.pop(session)
+                for future, _ in jobs.values():
+                    future.set_exception(e)
+                return
+
+            with self.lock:
+                future, _ = self._async_reads[session].pop(job_id, (None, None))
+
+            if future is None:
+                logger.warning('I/O completion of unknown job {} in session {}'.format(job_id, session))
+            elif status < 0:
+                future.set_exception(self._status_error(status))
+            else:
+                future.set_result(count)
 
     def read_asynchronously(self, session, count):
         """Reads data from device or interface asynchronously.
 
+        See read_async to wait for the completion.
+
         :param session: Unique logical identifier to a session.
         :param count: Number of bytes to be read.
         :return: (ctypes buffer with result, jobid)
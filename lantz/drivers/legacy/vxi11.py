@@ -13,6 +13,8 @@
 
 import enum
 import socket
+import struct
+import threading
 
 from lantz import errors
 from lantz.drivers.legacy import rpc
@@ -50,6 +52,10 @@ DEVICE_INTR_PROG  = 0x0607b1
 DEVICE_INTR_VERS  = 1
 DEVICE_INTR_SRQ   = 30
 
+# Interrupt channel protocol family
+DEVICE_TCP        = 0
+DEVICE_UDP        = 1
+
 # Error states
 class ERROR_CODES(enum.IntEnum):
     NO_ERROR = 0
@@ -77,7 +83,7 @@ RX_CHR = 2
 RX_END = 4
 
 # Exceptions
-class Vxi11Error(InstrumentError):
+class Vxi11Error(errors.InstrumentError):
     pass
 
 
@@ -187,19 +193,39 @@ class Vxi11Unpacker(rpc.Unpacker):
 
 
 class CoreClient(rpc.TCPClient):
+    """Client of the core channel.
+
+    The client may be used from several threads (the SRQ callbacks run in
+    the listener thread). Each call holds lock, which serializes the use of
+    the socket, the packer and the unpacker. Hold it also around
+    exchanges made of several calls, such as pipelined send_call and
+    recv_reply pairs.
+
+    :param host: address of the instrument.
+    :param port: port of the core channel, None to ask the port mapper.
+    """
 
-    def __init__(self, host):
+    def __init__(self, host, port=None):
+        self.lock = threading.RLock()
         self.packer = Vxi11Packer()
         self.unpacker = Vxi11Unpacker('')
-        super().__init__(host, DEVICE_CORE_PROG, DEVICE_CORE_VERS)
+        if port is None:
+            super().__init__(host, DEVICE_CORE_PROG, DEVICE_CORE_VERS)
+        else:
+            rpc.RawTCPClient.__init__(self, host, DEVICE_CORE_PROG, DEVICE_CORE_VERS, port)
         # I have disabled the creation of the socket by overriding connect.
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
     def connect(self):
         # Overrides connect method from parent class to avoid automatic
         # opening of connection.
         pass
 
+    def make_call(self, proc, args, pack_func, unpack_func):
+        with self.lock:
+            return super().make_call(proc, args, pack_func, unpack_func)
+
     def create_link(self, id, lock_device, lock_timeout, name):
         params = (id, lock_device, lock_timeout, name)
         return self.make_call(CREATE_LINK, params,
@@ -279,7 +305,7 @@ class CoreClient(rpc.TCPClient):
     def create_intr_chan(self, host_addr, host_port, prog_num, prog_vers, prog_family):
         params = (host_addr, host_port, prog_num, prog_vers, prog_family)
         return self.make_call(CREATE_INTR_CHAN, params,
-                              self.packer.pack_device_docmd_parms,
+                              self.packer.pack_device_remote_func_parms,
                               self.unpacker.unpack_device_error)
     
     def destroy_intr_chan(self):
@@ -288,26 +314,97 @@ class CoreClient(rpc.TCPClient):
                               self.unpacker.unpack_device_error)
 
 
+class IntrServer(rpc.TCPServer):
+    """Local RPC server for the device_intr_srq calls of the interrupt channel.
+
+    :param callback: called with the handle given in device_enable_srq
+                     for each service request.
+    :param host: address to listen on.
+    :param port: port to listen on, 0 to pick a free one.
+    """
+
+    def __init__(self, callback, host='', port=0):
+        super().__init__(host, DEVICE_INTR_PROG, DEVICE_INTR_VERS, port)
+        self.callback = callback
+        self.port = self.sock.getsockname()[1]
+        self._connections = []
+        self._thread = None
+
+    def start(self):
+        """Accept connections in a background thread.
+        """
+        self.sock.listen(1)
+        self._thread = threading.Thread(target=self.loop, name='VXI-11 SRQ listener', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Close the listening socket and all connections.
+        """
+        for sock in [self.sock] + self._connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def loop(self):
+        while True:
+            try:
+                connection = self.sock.accept()
+            except OSError:
+                # The listening socket was closed by stop.
+                return
+            self._connections.append(connection[0])
+            threading.Thread(target=self.session, args=(connection, ), daemon=True).start()
+
+    def handle(self, call):
+        # device_intr_srq is a one way call, the instrument does not wait
+        # for a reply.
+        super().handle(call)
+        return None
+
+    def handle_30(self):
+        handle = self.unpacker.unpack_opaque()
+        self.turn_around()
+        self.callback(handle)
+
+
 class Vxi11Driver(Driver):
     """VXI-11 instrument interface client.
     We do not inherit from TCPDriver because the RPC implementation has its own socket.
     """
 
+    #: Size in bytes requested in each device_read call.
+    RECV_CHUNK = 1024 ** 2
+
+    #: Port of the core channel, None to ask the port mapper of the instrument.
+    PORT = None
+
     def __init__(self, host='localhost', *args, **kwargs):
         super().__init__(host, *args, **kwargs)
 
         self.socket = None
         self.lock_timeout = 10000
         self.io_timeout = 10000
-        self.client = CoreClient(host)
+        self.client = CoreClient(host, self.PORT)
         self.link = None
+        #: Maximum size in bytes of a device_write block, as reported by the
+        #: device when the link is created.
+        self.max_recv_size = None
+
+        self._intr_server = None
+        self._srq_callbacks = []
+        self._srq_event = threading.Event()
 
     def initialize(self):
         """Open connection to VXI-11 instrument
         """
         super().initialize()
         self.socket = self.client.sock
-        self.socket.connect((self.client.sock, self.client.port))
+        self.socket.connect((self.client.host, self.client.port))
 
         error, link, abort_port, max_recv_size = self.client.create_link(self.client_id, 0, self.lock_timeout, self.name.encode(self.ENCODING))
         
@@ -315,11 +412,13 @@ class Vxi11Driver(Driver):
             raise Vxi11Error("error creating link: %d" % error)
         
         self.link = link
-        self.RECV_CHUNK = max_recv_size
+        self.max_recv_size = max_recv_size
         
     def finalize(self):
         """Close connection
         """
+        if self._intr_server is not None:
+            self.disable_srq()
         self.client.destroy_link(self.link)
         self.client.close()
         super().finalize()
@@ -328,22 +427,22 @@ class Vxi11Driver(Driver):
         """Write binary data to instrument
         """
 
+        flags = 0
+
         if self.term_char is not None:
             flags = OP_FLAG_TERMCHAR_SET
             term_char = str(self.term_char).encode('utf-8')[0]
-            data += term_char
-        
-        flags = 0
+            data = bytes(data) + bytes((term_char, ))
         
         num = len(data)
         
         offset = 0
         
         while num > 0:
-            if num <= self.RECV_CHUNK:
+            if num <= self.max_recv_size:
                 flags |= OP_FLAG_END
             
-            block = data[offset:offset+self.RECV_CHUNK]
+            block = data[offset:offset+self.max_recv_size]
             
             error, size = self.client.device_write(self.link, self.io_timeout, self.lock_timeout, flags, block)
             
@@ -355,42 +454,111 @@ class Vxi11Driver(Driver):
             offset += size
             num -= size
 
+    def query_raw(self, data):
+        """Write binary data to instrument and read the response.
+
+        When data fits in a single write block, the read request is sent
+        right after the write request without waiting for its reply, so the
+        exchange takes a single network round trip.
+
+        :rtype: bytearray
+        """
+
+        if len(data) + (self.term_char is not None) > self.max_recv_size:
+            self.write_raw(data)
+            return self.read_raw()
+
+        flags, term_char = self._read_flags()
+
+        if self.term_char is not None:
+            data = bytes(data) + bytes((term_char, ))
+
+        client = self.client
+        with client.lock:
+            write_xid = client.send_call(DEVICE_WRITE,
+                                         (self.link, self.io_timeout, self.lock_timeout, flags | OP_FLAG_END, data),
+                                         client.packer.pack_device_write_parms)
+            read_xid = client.send_call(DEVICE_READ,
+                                        (self.link, self.RECV_CHUNK, self.io_timeout, self.lock_timeout, flags, term_char),
+                                        client.packer.pack_device_read_parms)
+
+            error, size = client.recv_reply(write_xid, client.unpacker.unpack_device_write_resp)
+            read_error, reason, read_data = client.recv_reply(read_xid, client.unpacker.unpack_device_read_resp)
+
+        if error:
+            raise Vxi11Error("error writing data: %d" % error)
+        elif size < len(data):
+            raise Vxi11Error("did not write complete block")
+
+        if read_error:
+            raise Vxi11Error("error reading data: %d" % read_error)
+
+        read_data = bytearray(read_data)
+        if reason & (RX_END | RX_CHR) == 0:
+            read_data += self.read_raw()
+
+        return read_data
+
+    def _read_flags(self):
+        if self.term_char is not None:
+            return OP_FLAG_TERMCHAR_SET, str(self.term_char).encode('utf-8')[0]
+        return 0, 0
+
     def read_raw(self, num=-1):
         """Read binary data from instrument
+
+        :param num: maximum number of bytes to read, -1 to read until the
+                    end of the message.
+        :rtype: bytearray
         """
 
-        read_len = self.RECV_CHUNK
-        if 0 < num < self.RECV_CHUNK:
-            read_len = num
+        if num > 0:
+            read_data = bytearray(num)
+            del read_data[self.read_raw_into(read_data):]
+            return read_data
+
+        flags, term_char = self._read_flags()
         
-        flags = 0
         reason = 0
         
-        term_char = 0
-        
-        if self.term_char is not None:
-            flags = OP_FLAG_TERMCHAR_SET
-            term_char = str(self.term_char).encode('utf-8')[0]
-        
-        read_data = b''
+        read_data = bytearray()
         
         while reason & (RX_END | RX_CHR) == 0:
-            error, reason, data = self.client.device_read(self.link, read_len, self.io_timeout, self.lock_timeout, flags, term_char)
+            error, reason, data = self.client.device_read(self.link, self.RECV_CHUNK, self.io_timeout, self.lock_timeout, flags, term_char)
             
             if error:
                 raise Vxi11Error("error reading data: %d" % error)
             
             read_data += data
             
-            if num > 0:
-                num = num - len(data)
-                if num <= 0:
-                    break
-                if num < read_len:
-                    read_len = num
-            
         return read_data
 
+    def read_raw_into(self, buffer):
+        """Read binary data from instrument into a writable buffer, until the
+        end of the message or until the buffer is full.
+
+        :return: number of bytes read.
+        """
+
+        flags, term_char = self._read_flags()
+
+        view = memoryview(buffer).cast('B')
+        size = len(view)
+        done = 0
+        reason = 0
+
+        while done < size and reason & (RX_END | RX_CHR) == 0:
+            read_len = min(size - done, self.RECV_CHUNK)
+            error, reason, data = self.client.device_read(self.link, read_len, self.io_timeout, self.lock_timeout, flags, term_char)
+
+            if error:
+                raise Vxi11Error("error reading data: %d" % error)
+
+            view[done:done + len(data)] = data
+            done += len(data)
+
+        return done
+
     def read_stb(self):
         """Read status byte
         """
@@ -470,5 +638,90 @@ class Vxi11Driver(Driver):
         if error:
             raise Vxi11Error("error unlocking: %d" % error)
 
+    @property
+    def _srq_handle(self):
+        return struct.pack('>i', self.link)
+
+    def enable_srq(self, callback=None):
+        """Enable service requests, delivered by the instrument through the
+        interrupt channel to a local RPC server.
+
+        Each service request sets the event waited by wait_for_srq and calls
+        the registered callbacks, with the driver as argument, from the
+        listener thread. Read the status byte (read_stb) to clear the request.
+
+        The callbacks run concurrently with the thread that owns the link.
+        Their calls on the core channel are serialized with the ones of that
+        thread by the client lock, so single calls such as read_stb are safe.
+        Writes and reads of messages are not: a message exchanged from a
+        callback may be interleaved with one of the owner thread. Leave them
+        to the owner thread, e.g. by waiting with wait_for_srq.
+
+        :param callback: callable to register, in addition to the ones
+                         registered in previous calls.
+        """
+        if callback is not None:
+            self._srq_callbacks.append(callback)
+
+        if self._intr_server is not None:
+            return
+
+        self._intr_server = IntrServer(self._on_srq)
+        self._intr_server.start()
+
+        host_addr = struct.unpack('>I', socket.inet_aton(self.socket.getsockname()[0]))[0]
 
+        error = self.client.create_intr_chan(host_addr, self._intr_server.port,
+                                             DEVICE_INTR_PROG, DEVICE_INTR_VERS, DEVICE_TCP)
+        if error:
+            self._intr_server.stop()
+            self._intr_server = None
+            raise Vxi11Error("error creating interrupt channel: %d" % error)
+
+        error = self.client.device_enable_srq(self.link, True, self._srq_handle)
+
+        if error:
+            self.disable_srq()
+            raise Vxi11Error("error enabling srq: %d" % error)
+
+    def disable_srq(self):
+        """Disable service requests, close the interrupt channel and forget
+        the registered callbacks.
+        """
+        if self._intr_server is None:
+            return
+
+        try:
+            self.client.device_enable_srq(self.link, False, self._srq_handle)
+            self.client.destroy_intr_chan()
+        finally:
+            self._intr_server.stop()
+            self._intr_server = None
+            self._srq_callbacks = []
+
+    def wait_for_srq(self, timeout=None):
+        """Wait for a service request.
 
+        The request is consumed when returning, so each one is reported once.
+
+        :param timeout: maximum wait in seconds, None to wait forever.
+        :return: True if a service request arrived, False on timeout.
+        """
+        if self._intr_server is None:
+            raise Vxi11Error("service requests are not enabled")
+        arrived = self._srq_event.wait(timeout)
+        self._srq_event.clear()
+        return arrived
+
+    def _on_srq(self, handle):
+        if handle != self._srq_handle:
+            self.log_warning('Ignoring service request for handle {!r}', handle)
+            return
+
+        self._srq_event.set()
+
+        for callback in self._srq_callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                self.log_error('Error in service request callback: {}', e)
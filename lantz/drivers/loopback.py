@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+    lantz.drivers.loopback
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Loopback transport that replays recorded query/response transcripts, so
+    that drivers can run (and be benchmarked) without the instrument.
+
+    The instrument is modelled by a per-message and a per-byte latency. The
+    time spent waiting on them is accumulated in LoopbackSession.wait_time,
+    so the time spent in Python is the total time minus the wait time.
+
+    For MessageBasedDriver drivers use open_loopback, for legacy drivers see
+    lantz.drivers.legacy.loopback.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import json
+import time
+import types
+from collections import deque
+
+import numpy as np
+
+from lantz import MessageBasedDriver
+from lantz.errors import LantzTimeoutError
+
+
+class LoopbackError(Exception):
+    pass
+
+
+class Transcript(object):
+    """Recorded exchanges with an instrument, as (sent, received) pairs of
+    complete messages. Messages without answer are recorded with empty
+    received bytes.
+
+    :param exchanges: iterable of (sent, received) pairs of bytes or str.
+    """
+
+    #: Encoding of the messages in transcript files, maps each byte to one character.
+    ENCODING = 'latin-1'
+
+    def __init__(self, exchanges=()):
+        self.exchanges = []
+        for sent, received in exchanges:
+            self.add(sent, received)
+
+    def add(self, sent, received=b''):
+        """Append an exchange.
+        """
+        if isinstance(sent, str):
+            sent = sent.encode(self.ENCODING)
+        if isinstance(received, str):
+            received = received.encode(self.ENCODING)
+        self.exchanges.append((bytes(sent), bytes(received)))
+
+    def __len__(self):
+        return len(self.exchanges)
+
+    def __iter__(self):
+        return iter(self.exchanges)
+
+    @classmethod
+    def load(cls, filename):
+        """Load a transcript file, with one {"sent": ..., "received": ...}
+        JSON object per line.
+        """
+        with open(filename, encoding='utf-8') as fp:
+            return cls((item['sent'], item.get('received', ''))
+                       for item in map(json.loads, fp) if item)
+
+    def save(self, filename):
+        """Save to a transcript file (see load).
+        """
+        with open(filename, 'w', encoding='utf-8') as fp:
+            for sent, received in self.exchanges:
+                fp.write(json.dumps({'sent': sent.decode(self.ENCODING),
+                                     'received': received.decode(self.ENCODING)}) + '\n')
+
+
+class LoopbackSession(object):
+    """Replays a transcript: each message sent must be the next recorded
+    one, and makes its recorded answer available for reading.
+
+    :param transcript: Transcript to replay.
+    :param per_message: latency in seconds of each exchange.
+    :param per_byte: latency in seconds of each byte sent or received.
+    :param cycle: restart from the first exchange when the transcript is
+                  exhausted, to repeat a recorded sequence.
+    """
+
+    def __init__(self, transcript=None, per_message=0., per_byte=0., cycle=True):
+        self.per_message = per_message
+        self.per_byte = per_byte
+        self.cycle = cycle
+
+        #: Total time in seconds spent in the simulated latency.
+        self.wait_time = 0.
+        #: Number of exchanges replayed.
+        self.count = 0
+
+        self.play(transcript or Transcript())
+
+    def play(self, transcript):
+        """Replay a transcript from its first exchange, discarding the
+        answers not read.
+        """
+        self.transcript = transcript
+        self.index = 0
+        self._answers = deque()
+
+    def clear(self):
+        """Discard the answers not read.
+        """
+        self._answers.clear()
+
+    def _wait(self, latency):
+        if latency <= 0:
+            return
+        start = time.perf_counter()
+        time.sleep(latency)
+        self.wait_time += time.perf_counter() - start
+
+    def send(self, data):
+        """Send a complete message.
+
+        :return: number of bytes sent.
+        """
+        if self.index >= len(self.transcript):
+            if not self.cycle or not len(self.transcript):
+                raise LoopbackError('Transcript exhausted, sent {!r}'.format(bytes(data)))
+            self.index = 0
+
+        sent, received = self.transcript.exchanges[self.index]
+        if data != sent:
+            raise LoopbackError('Exchange {}: expected {!r}, sent {!r}'.format(self.index, sent, bytes(data)))
+
+        self.index += 1
+        self.count += 1
+        self._wait(self.per_message + self.per_byte * (len(sent) + len(received)))
+        if received:
+            self._answers.append(memoryview(received))
+        return len(data)
+
+    def recv_into(self, buffer):
+        """Receive bytes of the next answer into a writable buffer.
+
+        :return: number of bytes received.
+        """
+        if not self._answers:
+            raise LantzTimeoutError('No answer pending in the loopback session')
+        answer = self._answers[0]
+        view = memoryview(buffer).cast('B')
+        n = min(len(view), len(answer))
+        view[:n] = answer[:n]
+        if n == len(answer):
+            self._answers.popleft()
+        else:
+            self._answers[0] = answer[n:]
+        return n
+
+    def recv(self, size):
+        """Receive up to size bytes of the next answer, -1 for all of it.
+        """
+        if size < 0:
+            return self.read_message()
+        data = bytearray(size)
+        del data[self.recv_into(data):]
+        return bytes(data)
+
+    def read_message(self):
+        """Receive the rest of the next answer.
+        """
+        if not self._answers:
+            raise LantzTimeoutError('No answer pending in the loopback session')
+        return self._answers.popleft().tobytes()
+
+
+class LoopbackResource(object):
+    """Stand-in for the PyVISA message based resource of a MessageBasedDriver,
+    connected to a LoopbackSession.
+
+    Each answer is read as a whole message, as if the instrument asserted END
+    after it.
+
+    :param session: LoopbackSession to exchange messages with.
+    :param kwargs: resource attributes, e.g. read_termination.
+    """
+
+    def __init__(self, session, write_termination='\r\n', read_termination='', encoding='ascii', **kwargs):
+        self.session = session
+        self.write_termination = write_termination
+        self.read_termination = read_termination
+        self.encoding = encoding
+        self.timeout = None
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def write_raw(self, message):
+        return self.session.send(bytes(message))
+
+    def write(self, message, termination=None, encoding=None):
+        termination = self.write_termination if termination is None else termination
+        encoding = self.encoding if encoding is None else encoding
+        return self.write_raw((message + (termination or '')).encode(encoding))
+
+    def read_raw(self, size=None):
+        return self.session.read_message()
+
+    def read_bytes(self, count):
+        data = bytearray(count)
+        view = memoryview(data)
+        done = 0
+        while done < count:
+            done += self.session.recv_into(view[done:])
+        return bytes(data)
+
+    def read(self, termination=None, encoding=None):
+        termination = self.read_termination if termination is None else termination
+        encoding = self.encoding if encoding is None else encoding
+        message = self.read_raw().decode(encoding)
+        if termination and message.endswith(termination):
+            message = message[:-len(termination)]
+        return message
+
+    def query(self, message, delay=None):
+        self.write(message)
+        return self.read()
+
+    def query_ascii_values(self, message, converter='f', separator=',', container=list, delay=None):
+        self.write(message)
+        if not callable(converter):
+            converter = int if converter in 'dioxXb' else float
+        values = [converter(value) for value in self.read().split(separator) if value.strip()]
+        return container(values)
+
+    def query_binary_values(self, message, datatype='f', is_big_endian=False, container=list,
+                            delay=None, header_fmt='ieee', expect_termination=True, **kwargs):
+        self.write(message)
+        return self.read_binary_values(datatype, is_big_endian, container, header_fmt, expect_termination)
+
+    def read_binary_values(self, datatype='f', is_big_endian=False, container=list,
+                           header_fmt='ieee', expect_termination=True, **kwargs):
+        if header_fmt != 'ieee':
+            raise ValueError('Only IEEE 488.2 blocks are supported by the loopback resource')
+        block = self.read_raw()
+        offset = block.find(b'#')
+        if offset < 0:
+            raise ValueError('IEEE 488.2 block header not found')
+        digits = int(block[offset + 1:offset + 2])
+        length = int(block[offset + 2:offset + 2 + digits])
+
+        dtype = np.dtype(datatype).newbyteorder('>' if is_big_endian else '<')
+        values = np.frombuffer(block, dtype, length // dtype.itemsize, offset + 2 + digits)
+        if container in (np.array, np.asarray, np.ndarray):
+            return np.array(values)
+        return container(values.tolist())
+
+    def clear(self):
+        self.session.clear()
+
+    def close(self):
+        pass
+
+
+def open_loopback(driver_class, transcript=None, per_message=0., per_byte=0., name=None, **kwargs):
+    """Create a MessageBasedDriver connected to a loopback session instead
+    of a VISA resource, so no VISA library or instrument is needed.
+
+    The resource attributes are taken from DEFAULTS['COMMON'] of the driver
+    and updated with kwargs. The session is available as driver.resource.session.
+
+    :param driver_class: MessageBasedDriver subclass.
+    :param transcript: Transcript to replay.
+    :param per_message: latency in seconds of each exchange.
+    :param per_byte: latency in seconds of each byte sent or received.
+    """
+    driver = driver_class.__new__(driver_class)
+    super(MessageBasedDriver, driver).__init__(name=name)
+    driver.DEFAULTS = types.MappingProxyType(driver.DEFAULTS or {})
+
+    # Initialize and finalize do not open or close a 'dummy' resource.
+    driver.resource_name = 'dummy'
+    driver.resource_kwargs = dict(driver.DEFAULTS.get('COMMON', {}), **kwargs)
+    driver.resource = LoopbackResource(LoopbackSession(transcript, per_message, per_byte), **driver.resource_kwargs)
+    return driver
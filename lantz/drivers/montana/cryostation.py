@@ -11,7 +11,12 @@ from lantz import Feat, DictFeat, Action
 from lantz import Q_
 
 import socket
+import threading
+import time
 import warnings
+from collections import OrderedDict, deque
+
+import numpy as np
 
 # class MontanaWarning(Warning):
 #     """
@@ -21,11 +26,40 @@ import warnings
 
 class Cryostation(Driver):
 
-    def __init__(self, address, port=7773, timeout=2.0):
+    # Readouts cycled by the telemetry poller, name: command
+    TELEMETRY = OrderedDict([
+        ('alarm_state', 'GAS'),
+        ('chamber_pressure', 'GCP'),
+        ('platform_temperature', 'GPT'),
+        ('platform_stability', 'GPS'),
+        ('platform_heater_pow', 'GPHP'),
+        ('stage_1_temperature', 'GS1T'),
+        ('stage_1_heater_pow', 'GS1HP'),
+        ('stage_2_temperature', 'GS2T'),
+        ('sample_stability', 'GSS'),
+        ('sample_temperature', 'GST'),
+        ('temp_setpoint', 'GTSP'),
+        ('user_temperature', 'GUT'),
+        ('user_stability', 'GUS'),
+    ])
+
+    def __init__(self, address, port=7773, timeout=2.0, max_age=0):
+        """
+        Params:
+            max_age = maximum age in s of a cached telemetry reply that is
+                      served instead of querying the Cryostation
+        """
         super().__init__()
         self.address = address
         self.port = port
         self.timeout = timeout
+        self.max_age = max_age
+
+        self._socket_lock = threading.RLock()
+        self._cache = dict()
+        self._history = None
+        self._poller = None
+        self._stop_polling = threading.Event()
 
     def initialize(self):
         """
@@ -35,6 +69,9 @@ class Cryostation(Driver):
         #print('IP address:{}'.format(self.address))
         #print('Port:{}'.format(self.port))
 
+        self._connect()
+
+    def _connect(self):
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.connect((self.address, self.port))
         self.socket.settimeout(self.timeout)
@@ -43,15 +80,86 @@ class Cryostation(Driver):
         """
         Closes socket communication with Cryostation software.
         """
+        self.stop_telemetry()
         self.socket.close()
 
+    @Action()
+    def start_telemetry(self, interval=1.0, max_age=None, history=0):
+        """
+        Starts a background thread that cycles through all TELEMETRY readouts
+        every interval seconds and caches the replies. While the cache is
+        younger than max_age (default twice the interval) the Feats are
+        served from it.
+
+        Params:
+            history = number of cycles kept for telemetry_history, 0 disables it
+        """
+        self.stop_telemetry()
+        self.max_age = 2 * interval if max_age is None else max_age
+        self._history = deque(maxlen=history) if history else None
+        self._stop_polling.clear()
+        self._poller = threading.Thread(target=self._poll_telemetry, args=(interval,),
+                                        name='Cryostation telemetry', daemon=True)
+        self._poller.start()
+
+    @Action()
+    def stop_telemetry(self):
+        """
+        Stops the telemetry thread, if running.
+        """
+        if self._poller is None:
+            return
+        self._stop_polling.set()
+        self._poller.join()
+        self._poller = None
+
+    @Action()
+    def telemetry_history(self):
+        """
+        Returns the logged telemetry as a dict of numpy arrays, with the poll
+        timestamps under 'time'. Unavailable readouts are nan.
+        """
+        if not self._history:
+            return dict()
+        with self._socket_lock:
+            rows = np.array(self._history)
+        names = ['time'] + list(self.TELEMETRY)
+        return {name: rows[:, n] for n, name in enumerate(names)}
+
+    def _poll_telemetry(self, interval):
+        while not self._stop_polling.is_set():
+            start = time.time()
+            row = [start]
+            for command in self.TELEMETRY.values():
+                try:
+                    data = self._transact(command)
+                except (socket.error, ValueError) as e:
+                    self.log_error('Telemetry poll of {} failed: {}'.format(command, e))
+                    data = None
+                row.append(self._to_float(data))
+            if self._history is not None:
+                with self._socket_lock:
+                    self._history.append(row)
+            self._stop_polling.wait(max(0, interval - (time.time() - start)))
+
+    @staticmethod
+    def _to_float(data):
+        if data is None or data == '-0.100':
+            return np.nan
+        if data in ('T', 'F'):
+            return float(data == 'T')
+        try:
+            return float(data)
+        except ValueError:
+            return np.nan
+
     @Feat(values={True, False})
     def alarm_state(self):
         """
         Returns true or false, indicating the presence (T) or absence (F) of
         a system error.
         """
-        error = self.send_and_recv('GAS')
+        error = self.query_cached('GAS')
         alarm = (error == 'T')
         return alarm
 
@@ -61,7 +169,7 @@ class Cryostation(Driver):
         Returns the chamber pressure in mTorr, or -0.1 if the pressure is
         unavailable.
         """
-        return float(self.send_and_recv('GCP', raise_warning=True))
+        return float(self.query_cached('GCP', raise_warning=True))
 
     @Feat(units='kelvin')
     def platform_temperature(self):
@@ -69,14 +177,14 @@ class Cryostation(Driver):
         Returns the current platform temperature in K, or -0.100 if the current
         temperature is unavailable.
         """
-        return float(self.send_and_recv('GPT', raise_warning=True))
+        return float(self.query_cached('GPT', raise_warning=True))
 
     @Feat(units='kelvin')
     def platform_stability(self):
         """
         Returns the platform stability in K, or -0.100 if unavailable.
         """
-        return float(self.send_and_recv('GPS'))
+        return float(self.query_cached('GPS'))
 
     @Feat(units='watts')
     def platform_heater_pow(self):
@@ -84,7 +192,7 @@ class Cryostation(Driver):
         Returns the current platform heater power in W, or -0.100 if
         unavailable.
         """
-        return float(self.send_and_recv('GPHP', raise_warning=True))
+        return float(self.query_cached('GPHP', raise_warning=True))
 
     @Feat(units='kelvin')
     def stage_1_temperature(self):
@@ -92,7 +200,7 @@ class Cryostation(Driver):
         Returns the current stage 1 temperature in K, or -0.100 if the current
         temperature is unavailable.
         """
-        return float(self.send_and_recv('GS1T', raise_warning=True))
+        return float(self.query_cached('GS1T', raise_warning=True))
 
     @Feat(units='watts')
     def stage_1_heater_pow(self):
@@ -100,7 +208,7 @@ class Cryostation(Driver):
         Returns the current stage 1 heater power in W, or -0.100 if
         unavailable.
         """
-        return float(self.send_and_recv('GS1HP', raise_warning=True))
+        return float(self.query_cached('GS1HP', raise_warning=True))
 
     @Feat(units='kelvin')
     def stage_2_temperature(self):
@@ -108,34 +216,35 @@ class Cryostation(Driver):
         Returns the current stage 2 temperature in K, or -0.100 if the current
         temperature is unavailable.
         """
-        return float(self.send_and_recv('GS2T', raise_warning=True))
+        return float(self.query_cached('GS2T', raise_warning=True))
 
     @Feat(units='kelvin')
     def sample_stability(self):
         """
         Returns the sample stability in K, or -0.100 if unavailable.
         """
-        return float(self.send_and_recv('GSS'))
+        return float(self.query_cached('GSS'))
 
     @Feat(units='kelvin')
     def sample_temperature(self):
         """
         Returns the sample temperature in K, or -0.100 if unavailable.
         """
-        return float(self.send_and_recv('GST', raise_warning=True))
+        return float(self.query_cached('GST', raise_warning=True))
 
     @Feat(units='kelvin')
     def temp_setpoint(self):
         """
         Returns the temperature setpoint of the Cryostation software.
         """
-        return float(self.send_and_recv('GTSP', raise_warning=True))
+        return float(self.query_cached('GTSP', raise_warning=True))
 
     @temp_setpoint.setter
     def temp_setpoint(self, setpoint_kelvin):
         """
         Sets the temperature setpoint of the Cryostation software.
         """
+        self._cache.pop('GTSP', None)
         return self.send_and_recv('STSP{0:.2f}'.format(setpoint_kelvin))
 
     @Feat(units='kelvin')
@@ -143,14 +252,14 @@ class Cryostation(Driver):
         """
         Returns the user thermometer temperature in K, or -0.100 if unavailable.
         """
-        return float(self.send_and_recv('GUT'))
+        return float(self.query_cached('GUT'))
 
     @Feat(units='kelvin')
     def user_stability(self):
         """
         Returns the user thermometer stability in K, or -0.100 if unavailable.
         """
-        return float(self.send_and_recv('GUS'))
+        return float(self.query_cached('GUS'))
 
     @Action()
     def cool_down(self):
@@ -181,24 +290,67 @@ class Cryostation(Driver):
         """
         return self.send_and_recv('SWU')
 
+    def query_cached(self, message, raise_warning=False):
+        """
+        Like send_and_recv, but returns the cached reply if it is not older
+        than max_age.
+        """
+        cached = self._cache.get(message)
+        if cached is not None and time.time() - cached[0] <= self.max_age:
+            return self._check_reply(message, cached[1], raise_warning)
+        return self.send_and_recv(message, raise_warning)
+
     def send_and_recv(self, message, raise_warning=False):
         """
         Params:
             message = command to be sent to Cryostation
-            return_bytes = number of bytes to be stripped off return string
+            raise_warning = warn and return 0 if the parameter is unavailable
+        """
+        return self._check_reply(message, self._transact(message), raise_warning)
+
+    def _transact(self, message):
         """
-        buffer_size = 1024
-        m1 = '0{}{}'.format(str(len(message)), message)
+        Sends a command and reads its reply, both framed with the 2-digit
+        length prefix of the protocol. Replies of read (G...) commands are
+        cached with their timestamp.
 
-        self.socket.send(m1.encode())
-        data = str()
-        received = self.socket.recv(buffer_size)
-        if received:
-            data = received.decode()
+        If the exchange fails halfway, part of the reply may still be in the
+        stream and would misframe every later reply, so the connection is
+        reopened before the error is raised.
+        """
+        with self._socket_lock:
+            try:
+                self.socket.sendall('{:02d}{}'.format(len(message), message).encode())
+                length = int(self._recv_exactly(2))
+                data = self._recv_exactly(length).decode()
+            except Exception:
+                self._reconnect()
+                raise
+            if message.startswith('G'):
+                self._cache[message] = (time.time(), data)
+        return data
 
-        if ((data[2:] == '-0.100') and raise_warning):
+    def _reconnect(self):
+        self.socket.close()
+        try:
+            self._connect()
+        except socket.error as e:
+            # The next command fails on the closed socket and tries again.
+            self.log_error('Could not reconnect to the Cryostation: {}'.format(e))
+
+    def _recv_exactly(self, size):
+        data = bytearray()
+        while len(data) < size:
+            received = self.socket.recv(size - len(data))
+            if not received:
+                raise socket.error('Connection closed by Cryostation')
+            data += received
+        return bytes(data)
+
+    def _check_reply(self, message, data, raise_warning):
+        if ((data == '-0.100') and raise_warning):
 
             warnings.warn('Unable to return parameter from command {}.'.format(message))
             return 0
 
-        return data[2:]
+        return data
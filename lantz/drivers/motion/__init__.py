@@ -15,6 +15,6 @@
 """
 
 from .motioncontroller import MotionControllerMultiAxis, MotionControllerSingleAxis
-from .axis import MotionAxisSingle, MotionAxisMultiple, BacklashMixing
+from .axis import MotionAxisSingle, MotionAxisMultiple, BacklashMixing, wait_for_axes
 
-__all__ = ['MotionControllerMultiAxis', 'MotionControllerSingleAxis', 'MotionAxisSingle',  'MotionAxisMultiple', 'BacklashMixing']
+__all__ = ['MotionControllerMultiAxis', 'MotionControllerSingleAxis', 'MotionAxisSingle',  'MotionAxisMultiple', 'BacklashMixing', 'wait_for_axes']
@@ -27,6 +27,46 @@ import numpy as np
 # ureg.define('motorstep = motorstep')
 
 
+def wait_for_axes(axes, wait_time=0.01, max_wait_time=None, backoff=1.,
+                  timeout=None, poll=None):
+    """Wait until all axes have finished their motion.
+
+    All pending axes are polled in a single loop. The interval between polls
+    starts at wait_time and grows by backoff (up to max_wait_time) after
+    every poll in which no axis finished.
+
+    :param axes: axes to wait for
+    :param wait_time: initial interval between polls
+    :param max_wait_time: upper bound of the interval, defaults to wait_time
+    :param backoff: growth factor of the interval
+    :param timeout: give up after this time, None waits forever
+    :param poll: callable returning the motion done state for a list of axes,
+                 defaults to asking each axis
+    :return: True if all axes are done, False on timeout
+    """
+    to_seconds = convert_to('seconds', on_dimensionless='ignore')
+    wait_time = to_seconds(wait_time)
+    max_wait_time = wait_time if max_wait_time is None else to_seconds(max_wait_time)
+    if poll is None:
+        poll = lambda pending: [axis._poll_motion_done() for axis in pending]
+    if timeout is not None:
+        deadline = time.time() + to_seconds(timeout)
+
+    pending = list(axes)
+    interval = wait_time
+    while pending:
+        time.sleep(interval)
+        remaining = [axis for axis, done in zip(pending, poll(pending)) if not done]
+        if len(remaining) < len(pending):
+            interval = wait_time
+        else:
+            interval = min(interval * backoff, max_wait_time)
+        pending = remaining
+        if pending and timeout is not None and time.time() >= deadline:
+            return False
+    return True
+
+
 class MotionAxisSingle(Driver):
     def __init__(self, *args, **kwargs):
         self.wait_time = 0.01  # in seconds * Q_(1, 's')
@@ -103,12 +143,12 @@ class MotionAxisSingle(Driver):
         super().update_units(self._units, units)
         self._units = units
 
+    def _poll_motion_done(self):
+        """Motion state used by wait_for_axes, True when the axis stopped."""
+        return self.motion_done
+
     def _wait_until_done(self):
-        wait_time = convert_to('seconds', on_dimensionless='ignore')(self.wait_time)
-        time.sleep(wait_time)
-        while not self.motion_done:
-            time.sleep(wait_time)
-        return True
+        return wait_for_axes([self], self.wait_time)
 
 
 class MotionAxisMultiple(MotionAxisSingle):
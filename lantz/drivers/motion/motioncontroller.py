@@ -13,7 +13,9 @@
 """
 
 import time
+import threading
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 from lantz.feat import Feat
 from lantz.action import Action
@@ -22,7 +24,7 @@ from pyvisa import constants
 from lantz import Q_, ureg
 from lantz.processors import convert_to
 
-from .axis import MotionAxisSingle, MotionAxisMultiple
+from .axis import MotionAxisSingle, MotionAxisMultiple, wait_for_axes
 
 #  Add generic units:
 # ureg.define('unit = unit')
@@ -33,10 +35,37 @@ from .axis import MotionAxisSingle, MotionAxisMultiple
 class MotionControllerMultiAxis(Driver):
     """ Motion controller that can detect multiple axis
 
+    While waiting for a move, all moving axes are polled together. The poll
+    interval starts at wait_time and grows by wait_backoff up to
+    max_wait_time (in seconds) while no axis finishes.
+
+    position_async and wait_motion_done_async poll the axes from a worker
+    thread while the caller keeps using the controller. query and write
+    hold an I/O lock, so each command and its reply are not interleaved
+    with the ones of the other thread. Concrete controllers must therefore
+    list this class before the class providing the communication, e.g.
+    ``class ESP301(MotionControllerMultiAxis, MessageBasedDriver)``, which
+    also makes finalize stop the worker before the resource is closed.
     """
+    wait_time = 0.01
+    max_wait_time = 0.1
+    wait_backoff = 1.5
+
+    def __init__(self, *args, **kwargs):
+        self._io_lock = threading.RLock()
+        super().__init__(*args, **kwargs)
+
     def initialize(self):
         super().initialize()
 
+    def query(self, command, *, send_args=(None, None), recv_args=(None, None)):
+        with self._io_lock:
+            return super().query(command, send_args=send_args, recv_args=recv_args)
+
+    def write(self, command, *args, **kwargs):
+        with self._io_lock:
+            return super().write(command, *args, **kwargs)
+
     @Feat()
     def idn(self):
         raise AttributeError('Not implemented')
@@ -72,24 +101,76 @@ class MotionControllerMultiAxis(Driver):
         if read_pos is not None:
             self.log_error('kwargs read_pos for function _position is deprecated')
 
-        for p, axis in zip(pos, self.axes):
-            if p is not None:
-                axis._set_position(p, wait=False)
+        moves = self._start_move(pos)
         if wait_until_done:
-            for p, axis in zip(pos, self.axes):
-                if p is not None:
-                    axis._wait_until_done()
-                    axis.check_position(p)
-            return self.position
+            return self._finish_move(moves)
 
         return pos
 
+    @Action()
+    def position_async(self, pos):
+        """Start a move to position (x,y,...) without blocking.
+
+        :return: a future that resolves to the new position once all axes
+                 are done.
+        """
+        moves = self._start_move(pos)
+        return self._get_motion_executor().submit(self._finish_move, moves)
+
+    def _start_move(self, pos):
+        moves = [(p, axis) for p, axis in zip(pos, self.axes) if p is not None]
+        for p, axis in moves:
+            axis._set_position(p, wait=False)
+        return moves
+
+    def _finish_move(self, moves):
+        self.wait_motion_done([axis for p, axis in moves])
+        for p, axis in moves:
+            axis.check_position(p)
+        return self.position
+
+    def _axes_motion_done(self, axes):
+        """Motion done state of several axes.
+
+        Override with a single controller-wide status query where the
+        hardware supports it.
+        """
+        return [axis._poll_motion_done() for axis in axes]
+
+    @Action()
+    def wait_motion_done(self, axes=None, timeout=None):
+        """Wait until the given axes (default all) stopped moving.
+
+        :return: True if all axes are done, False on timeout
+        """
+        if axes is None:
+            axes = self.axes
+        axes = [axis for axis in axes if axis is not None]
+        return wait_for_axes(axes, self.wait_time, self.max_wait_time,
+                             self.wait_backoff, timeout, poll=self._axes_motion_done)
+
+    @Action()
+    def wait_motion_done_async(self, axes=None, timeout=None):
+        """Like wait_motion_done, but returns a future."""
+        return self._get_motion_executor().submit(self.wait_motion_done, axes, timeout)
+
     @Action()
     def motion_done(self):
-        for axis in self.axes:
-            axis._wait_until_done()
+        self.wait_motion_done()
+
+    def _get_motion_executor(self):
+        executor = getattr(self, '_motion_executor', None)
+        if executor is None:
+            executor = self._motion_executor = ThreadPoolExecutor(max_workers=1)
+        return executor
 
     def finalize(self):
+        # Let a pending move finish polling before the resource is closed
+        # by the communication class in super().finalize().
+        executor = getattr(self, '_motion_executor', None)
+        if executor is not None:
+            executor.shutdown(wait=True)
+            self._motion_executor = None
         for axis in self.axes:
             if axis is not None:
                 del (axis)
@@ -21,7 +21,6 @@ from pyvisa import constants
 from lantz import Q_, ureg
 from lantz.processors import convert_to
 from lantz.drivers.motion import MotionAxisMultiple, MotionControllerMultiAxis, BacklashMixing
-import time
 import numpy as np
 
 #  Add generic units:
@@ -205,10 +204,3 @@ class MotionAxis(MotionAxisMultiple, BacklashMixing):
         # No check implemented yet
         self.write('%SN%' % (self.num, UNITS.index(val)))
         super().units = val
-
-    def _wait_until_done(self):
-        # wait_time = convert_to('seconds', on_dimensionless='warn')(self.wait_time)
-        time.sleep(self.wait_time)
-        while not self.motion_done:
-            time.sleep(self.wait_time)
-        return True
@@ -23,6 +23,7 @@ from pyvisa import constants
 #from lantz.visa import GPIBVisaDriver
 from lantz import Q_, ureg
 from lantz.processors import convert_to
+from lantz.drivers.motion import MotionControllerMultiAxis, wait_for_axes
 import time
 import numpy as np
 import copy
@@ -33,7 +34,7 @@ import copy
 #ureg.define('motorstep = step')
 
 
-class ESP301(MessageBasedDriver):
+class ESP301(MotionControllerMultiAxis, MessageBasedDriver):
     """ Newport ESP301 motion controller. It assumes all axes to have units mm
 
     :param scan_axes: Should one detect and add axes to the controller
@@ -95,47 +96,10 @@ class ESP301(MessageBasedDriver):
         err = int(self.query('TE?'))
         return err
  
-    @Feat(read_once=False)
-    def position(self):
-        return [axis.position for axis in self.axes]
-
     @Feat(read_once=False)
     def _position_cached(self):
         return [axis._position_cached for axis in self.axes]
 
-    @position.setter
-    def position(self, pos):
-        """Move to position (x,y,...)"""
-        return self._position(pos)
-
-    @Action()
-    def _position(self, pos, read_pos=None, wait_until_done=True):
-        """Move to position (x,y,...)"""
-        if read_pos is not None:
-            self.log_error('kwargs read_pos for function _position is deprecated')
-
-        for p, axis in zip(pos, self.axes):
-            if not p is None:
-                axis._set_position(p, wait=False)
-        if wait_until_done:
-            for p, axis in zip(pos, self.axes):
-                if not p is None:
-                    axis._wait_until_done()
-                    axis.check_position(p)
-            return self.position
-
-        return pos
-    
-    @Action()
-    def motion_done(self):
-        for axis in self.axes: axis._wait_until_done()
-                
-    def finalize(self):
-        for axis in self.axes:
-            if axis is not None:
-                del (axis)
-        super().finalize()
-
 
 
 
@@ -362,11 +326,11 @@ class ESP301Axis(ESP301):
     # def units(self, val):
     #     self.parent.write('%SN%' % (self.num, val))
 
+    def _poll_motion_done(self):
+        return self.motion_done
+
     def _wait_until_done(self):
-        #wait_time = convert_to('seconds', on_dimensionless='warn')(self.wait_time)
-        time.sleep(self.wait_time)
-        while not self.motion_done:
-            time.sleep(self.wait_time) #wait_time.magnitude)
+        return wait_for_axes([self], self.wait_time)
 
 
 
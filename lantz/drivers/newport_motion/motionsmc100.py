@@ -79,7 +79,7 @@ controller_states = {
                     }
 
 
-class SMC100(MessageBasedDriver, MotionControllerMultiAxis):
+class SMC100(MotionControllerMultiAxis, MessageBasedDriver):
     """ Newport SMC100 motion controller. It assumes all axes to have units mm
 
 
@@ -292,18 +292,15 @@ class MotionAxisSMC100(MotionAxis):
         super().home()
         self._wait_until_done()
 
-    def _wait_until_done(self):
+    def _poll_motion_done(self):
         er, st = self.status
-        if st == 'MOVING.':
-            time.sleep(self.wait_time)
-            return self._wait_until_done()
-        elif st[:5] == 'READY':
-            return True
-        else:
+        if st == 'MOVING.' or st.startswith('HOMING'):
+            return False
+        elif st[:5] != 'READY':
             self.log_error('Not reached position. Controller state: {} '
                            'Positioner errors: {}'
                            ''.format(st, ','.join(er)))
-            return False
+        return True
 
     @Feat()
     def motion_done(self):
@@ -429,6 +429,12 @@ class Task(_Base):
         names = tuple(n.strip() for n in buf.split(',') if n.strip())
         return names
 
+    def number_of_channels(self):
+        """The number of virtual channels in the task.
+        """
+        err, value = self.lib.GetTaskNumChans(RetValue('u32'))
+        return value
+
     @Feat()
     def io_type(self):
         for name, channel in self.channels.items():
@@ -851,7 +857,7 @@ class Task(_Base):
             source = None
         self.samples_per_channel = samples_per_channel
         self.sample_mode = sample_mode
-        self.lib.CfgSampClkTiming(source, float64(rate), active_edge, sample_mode, samples_per_channel)
+        self.lib.CfgSampClkTiming(source, Types.float64(rate), active_edge, sample_mode, samples_per_channel)
 
     def configure_timing_burst_handshaking_export_clock(self, *args, **kws):
         """
@@ -1343,6 +1349,24 @@ class Task(_Base):
         else:
             self.lib.SetDigEdgeArmStartTrigEdge(edge)
 
+    @Feat(values={True: 1, False: 0})
+    def start_trigger_retriggerable(self):
+        """Whether a finite task rearms itself after acquiring or
+        generating its samples and waits for the next Start Trigger.
+        """
+        err, value = self.lib.GetStartTrigRetriggerable(RetValue('u32'))
+        return value
+
+    @start_trigger_retriggerable.setter
+    def start_trigger_retriggerable(self, value):
+        self.lib.SetStartTrigRetriggerable(value)
+
+    def configure_input_buffer(self, samples_per_channel):
+        """Overrides the automatic input buffer allocation, in samples
+        per channel.
+        """
+        self.lib.CfgInputBuffer(samples_per_channel)
+
     @Feat(values={None: None}.update(_TRIGGER_TYPES))
     def pause_trigger_type(self):
         """The type of trigger to use to pause a task.
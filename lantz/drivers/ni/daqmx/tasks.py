@@ -68,8 +68,8 @@ class AnalogInputTask(Task):
         err, value = self.lib.ReadAnalogScalarF64(timeout, RetValue('f64'), None)
         return value
 
-    @Action(units=(None, 'seconds', None), values=(None, None, _GROUP_BY))
-    def read(self, samples_per_channel=None, timeout=10.0, group_by='channel'):
+    @Action(units=(None, 'seconds', None, None), values=(None, None, _GROUP_BY, None))
+    def read(self, samples_per_channel=None, timeout=10.0, group_by='channel', out=None):
         """Reads multiple floating-point samples from a task that
         contains one or more analog input channels.
 
@@ -119,6 +119,11 @@ class AnalogInputTask(Task):
 
                 ch0:s1, ch1:s1, ch2:s1, ch0:s2, ch1:s2, ch2:s2,...
 
+        :param out:
+          A preallocated C-contiguous float64 array with the shape
+          given by group_by, filled in place instead of allocating a
+          new one.
+
         :rtype: numpy.ndarray
         """
 
@@ -127,15 +132,21 @@ class AnalogInputTask(Task):
 
         number_of_channels = self.number_of_channels()
         if group_by == Constants.Val_GroupByScanNumber:
-            data = np.zeros((samples_per_channel, number_of_channels), dtype=np.float64)
+            shape = (samples_per_channel, number_of_channels)
+        else:
+            shape = (number_of_channels, samples_per_channel)
+        if out is None:
+            data = np.zeros(shape, dtype=np.float64)
         else:
-            data = np.zeros((number_of_channels, samples_per_channel), dtype=np.float64)
+            if out.shape != shape or out.dtype != np.float64 or not out.flags.c_contiguous:
+                raise ValueError('out must be a C-contiguous float64 array of shape {}'.format(shape))
+            data = out
 
-        err, data, count = self.lib.ReadAnalogF64(samples_per_channel, timeout, group_by,
-                                                  data.ctypes.data, data.size, RetValue('i32'), None)
+        err, count = self.lib.ReadAnalogF64(samples_per_channel, timeout, group_by,
+                                            data.ctypes.data, data.size, RetValue('i32'), None)
 
-        if samples_per_channel < count:
-            if group_by == 'scan':
+        if count < samples_per_channel:
+            if group_by == Constants.Val_GroupByScanNumber:
                 return data[:count]
             else:
                 return data[:,:count]
@@ -10,12 +10,17 @@
 """
 
 
+import queue
 import struct
+import threading
+import time
+from array import array
+
 import numpy as np
 
 from pyvisa.errors import VisaIOError
 
-from lantz import Feat, DictFeat
+from lantz import Feat, DictFeat, Action
 from lantz.drivers.legacy.usb import USBDriver, usb_find_desc
 
 __all__ = ['USB4000']
@@ -71,12 +76,33 @@ class USB4000(USBDriver):
     """Ocean Optics spectrometer
     """
 
+    NUM_PIXELS = 3840
+
+    #: Bytes per spectrum read from the low (EP6) and high (EP2) endpoints
+    LO_BYTES = 512 * 4
+    HI_BYTES = 512 * 11
+
+    SYNC_BYTE = 0x69
+
+    #: Attempts to resynchronize before giving up on a spectrum
+    MAX_RESYNC = 3
+
     def __init__(self, serial_number=None, **kwargs):
         super().__init__(vendor=0x2457, product=0x1022, serial_number=serial_number, **kwargs)
 
         self._spec_hi = usb_find_desc(self.usb_inf, bEndpointAddress=0x82)
         self._spec_lo = usb_find_desc(self.usb_inf, bEndpointAddress=0x86)
 
+        self._integration_time = 10000 # us, default of the spectrometer
+        self._lo_buf = array('B', bytes(self.LO_BYTES))
+        self._hi_buf = array('B', bytes(self.HI_BYTES))
+        # Serializes spectrum transfers, which share the endpoints and buffers.
+        self._spectrum_lock = threading.Lock()
+        self._acquisition = None
+        self._stop_acquisition = threading.Event()
+        self._spectra = None
+        self.desync_count = 0
+
         # initialize spectrometer
         self.initialize()
 
@@ -100,6 +126,7 @@ class USB4000(USBDriver):
 
         cmd = struct.pack('<BI', 0x02, dt)
         self.usb_send_ep.write(cmd)
+        self._integration_time = dt
 
     @DictFeat(keys=tuple(range(32)))
     def query_config(self, position):
@@ -152,31 +179,149 @@ class USB4000(USBDriver):
         cmd = struct.pack('<BH', 0x0A, mode)
         self.usb_send_ep.write(cmd)
 
-    def request_spectra(self):
-        cmd = struct.pack('<B', 0x09)
+    @property
+    def _read_timeout(self):
+        """USB timeout in ms for a spectrum, longer than the integration time."""
+        return 100 + self._integration_time // 1000
+
+    def _read_spectrum_into(self, out):
+        """Request a spectrum and read it into the '<u2' array out.
+
+        Returns True if the trailing sync byte matched, raises IOError on a
+        short read.
+        """
+        self.usb_send_ep.write(struct.pack('<B', 0x09))
+        timeout = self._read_timeout
+        for ep, buf in ((self._spec_lo, self._lo_buf), (self._spec_hi, self._hi_buf)):
+            count = ep.read(buf, timeout)
+            if count != len(buf):
+                raise IOError('Short read, {} of {} bytes'.format(count, len(buf)))
+        data_sync = self._spec_hi.read(1, timeout)
+
+        out[:1024] = np.frombuffer(self._lo_buf, dtype='<u2')
+        out[1024:] = np.frombuffer(self._hi_buf, dtype='<u2')
+        return len(data_sync) == 1 and data_sync[0] == self.SYNC_BYTE
+
+    def _resync(self):
+        """Discard any pending data on the spectrum endpoints."""
+        self.desync_count += 1
+        for ep in (self._spec_lo, self._spec_hi):
+            try:
+                while ep.read(512, timeout=10):
+                    pass
+            except (VisaIOError, IOError):
+                pass
+
+    def _acquire_into(self, out):
+        with self._spectrum_lock:
+            for _ in range(self.MAX_RESYNC):
+                try:
+                    if self._read_spectrum_into(out):
+                        return out
+                    self.log_warning('Not synchronized, resynchronizing')
+                except (VisaIOError, IOError) as e:
+                    self.log_warning('Error on usb ({}), resynchronizing'.format(e))
+                self._resync()
+        raise IOError('Could not obtain a synchronized spectrum after {} attempts'.format(self.MAX_RESYNC))
+
+    def request_spectra(self, out=None):
+        """Acquire a single spectrum, into out if given.
+        """
+        if out is None:
+            out = np.empty(shape=(self.NUM_PIXELS,), dtype='<u2')
         self.log_debug('Requesting spectra')
-        self.usb_send_ep.write(cmd)
-        
-        data = np.zeros(shape=(3840,), dtype='<u2')
-        
-        try:
-            data_lo = self._spec_lo.read(512*4, timeout=100)
-            data_hi = self._spec_hi.read(512*11, timeout=100)
+        self._acquire_into(out)
+        self.log_debug('Obtained spectra')
+        return out
 
-            data_sync = self._spec_hi.read(1, timeout=100)
+    @Action()
+    def start_acquisition(self, pool_size=8, average=1):
+        """Acquire spectra continuously in a background thread.
 
-            assert struct.unpack('<B', data_sync)[0] == 0x69
+        Spectra are written into a pool of pool_size preallocated arrays and
+        delivered through spectra(). With average > 1 every delivered
+        spectrum is the float mean of that many consecutive acquisitions.
 
-            data[:1024], data[1024:] = np.frombuffer(data_lo, dtype='<u2'), \
-                                       np.frombuffer(data_hi, dtype='<u2')
-        except AssertionError:
-            self.log_error('Not synchronized')
-        except VisaIOError:
-            self.log_error('Timeout on usb')
-        finally:
-            self.log_debug('Obtained spectra')
+        pyusb only offers synchronous bulk transfers, so the thread requests
+        and reads one spectrum at a time instead of keeping reads queued.
+        request_spectra can be called while the acquisition runs.
+        """
+        self.stop_acquisition()
+        dtype = '<u2' if average == 1 else np.float64
+        pool = np.empty((pool_size, self.NUM_PIXELS), dtype=dtype)
+        # Keep two slots out of the queue: the one being filled and the one
+        # the consumer is holding.
+        self._spectra = queue.Queue(maxsize=max(1, pool_size - 2))
+        self._stop_acquisition.clear()
+        self._acquisition = threading.Thread(target=self._acquisition_loop, args=(pool, average),
+                                             name='USB4000 acquisition', daemon=True)
+        self._acquisition.start()
+
+    @Action()
+    def stop_acquisition(self):
+        """Stop the continuous acquisition, if running."""
+        if self._acquisition is None:
+            return
+        self._stop_acquisition.set()
+        self._drain_spectra()
+        self._acquisition.join()
+        self._acquisition = None
+        # The thread does not enqueue once stopped; wake up any consumer.
+        self._drain_spectra()
+        self._spectra.put_nowait(None)
+
+    def _drain_spectra(self):
+        try:
+            while True:
+                self._spectra.get_nowait()
+        except queue.Empty:
+            pass
+
+    def spectra(self, count=None, timeout=None):
+        """Iterate over (timestamp, spectrum) from the continuous acquisition.
 
-        return data
+        The spectrum array is reused by the acquisition pool; copy it to keep
+        it longer than pool_size - 2 iterations.
+        """
+        if self._acquisition is None:
+            raise RuntimeError('Continuous acquisition not started')
+        n = 0
+        while count is None or n < count:
+            item = self._spectra.get(timeout=timeout)
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            n += 1
+
+    def _acquisition_loop(self, pool, average):
+        raw = np.empty(self.NUM_PIXELS, dtype='<u2')
+        slot = 0
+        try:
+            while not self._stop_acquisition.is_set():
+                out = pool[slot]
+                if average == 1:
+                    self._acquire_into(out)
+                else:
+                    out[:] = 0
+                    for _ in range(average):
+                        out += self._acquire_into(raw)
+                    out /= average
+                self._put_spectrum((time.time(), out))
+                slot = (slot + 1) % len(pool)
+        except Exception as e:
+            self.log_error('Acquisition stopped: {}'.format(e))
+            self._put_spectrum(e)
+        self._put_spectrum(None)
+
+    def _put_spectrum(self, item):
+        while not self._stop_acquisition.is_set():
+            try:
+                self._spectra.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
 
     def get_status(self):
         cmd = struct.pack('<B', 0xFE)
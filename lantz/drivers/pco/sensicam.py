@@ -17,7 +17,7 @@
     :license: BSD, see LICENSE for more details.
 """
 
-from time import sleep
+from time import sleep, monotonic
 from collections import namedtuple
 
 import ctypes as ct
@@ -76,6 +76,10 @@ class Sensicam(LibraryDriver):
 
     LIBRARY_NAME = 'senntcam.dll'
 
+    #: Bounds of the image status polling interval in seconds.
+    MIN_POLL_INTERVAL = 0.0005
+    MAX_POLL_INTERVAL = 0.02
+
     def __init__(self, board, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.board = board
@@ -90,7 +94,7 @@ class Sensicam(LibraryDriver):
         return ret_value
 
     def initialize(self):
-        self.lib.SET_BOARD(_boardnr)
+        self.lib.SET_BOARD(self.board)
         err = self.lib.SET_INIT(1)
         self.stop_coc()
 
@@ -211,7 +215,7 @@ class Sensicam(LibraryDriver):
         """
         stat = ct.pointer(ct.c_int())
         self.lib.GET_IMAGE_STATUS(stat)
-        return stat
+        return stat[0]
 
     @Feat()
     def image_size(self):
@@ -239,6 +243,40 @@ class Sensicam(LibraryDriver):
     def bel_time(self):
         return self.lib.GET_BELTIME()
 
+    def _wait_image(self, coc_time, started, timeout=None):
+        """Wait until an image is available in the buffer.
+
+        Sleeps until most of the COC time has elapsed and then polls the
+        image status with an interval that doubles from MIN_POLL_INTERVAL up
+        to MAX_POLL_INTERVAL.
+
+        :param coc_time: expected duration of the COC in seconds.
+        :param started: monotonic time at which the COC was started.
+        :param timeout: maximum wait in seconds, defaults to twice the COC
+                        time plus one second.
+        """
+        if timeout is None:
+            timeout = 2 * coc_time + 1
+        deadline = started + timeout
+        sleep(max(0, started + coc_time * .9 - monotonic()))
+        interval = self.MIN_POLL_INTERVAL
+        while self.image_status & Status.BUFFER_EMPTY:
+            if monotonic() > deadline:
+                raise errors.InstrumentError('Timeout waiting for image')
+            sleep(interval)
+            interval = min(2 * interval, self.MAX_POLL_INTERVAL)
+
+    def _read_image(self, image):
+        height, width = image.shape
+        ptrimage = image.ctypes.data_as(ct.POINTER(ct.c_ushort))
+        self.lib.READ_IMAGE_12BIT(0, width, height, ptrimage)
+        return image
+
+    def _new_image(self, count=None):
+        width, height = self.image_size
+        shape = (height, width) if count is None else (count, height, width)
+        return np.empty(shape, dtype=np.dtype(np.ushort))
+
     @Action(units='ms')
     def expose(self, exposure = 1):
         """Expose.
@@ -247,25 +285,55 @@ class Sensicam(LibraryDriver):
 
         """
         self.exposure_time = exposure
-        delay = self.coc_time()
+        coc_time = self.coc_time.to('s').magnitude
+        started = monotonic()
         self.run_coc()
-        sleep(delay / 1000)
-        while not (self.image_status & Status.COC_RUNNING):
-            sleep(delay / 1000 * .1)
+        self._wait_image(coc_time, started)
 
     @Action()
-    def read_out(self):
+    def read_out(self, out=None):
         """Readout image from the CCD.
 
+        :param out: optional (height, width) ushort array to read into.
         :rtype: NumPy array
         """
-        width, height = self.image_size
-        imagearray = np.zeros((width,height), dtype=np.dtype(np.ushort))
-        image = np.ascontiguousarray(imagearray)
-        ptrimage = image.ctypes.data_as(ct.POINTER(ct.c_ushort))
-        self.lib.READ_IMAGE_12BIT(0, width, height, ptrimage)
-        return image
+        if out is None:
+            out = self._new_image()
+        return self._read_image(out)
+
+    @Action(units=('ms', None, None, None))
+    def sequence(self, exposure=1, count=None, buffers=2, timeout=None):
+        """Take a sequence of images, arming the next exposure before reading
+        out the previous image.
+
+        Returns a generator of images. Images are read into a pool of
+        `buffers` reusable arrays, so a yielded image is overwritten `buffers`
+        iterations later; copy it to keep it. The camera is stopped when the
+        generator is closed or after `count` images.
 
+        :param exposure: exposure time.
+        :param timeout: maximum wait for each image in seconds.
+        """
+        self.exposure_time = exposure
+        coc_time = self.coc_time.to('s').magnitude
+        pool = self._new_image(buffers)
+        return self._sequence_reader(pool, coc_time, count, timeout)
+
+    def _sequence_reader(self, pool, coc_time, count, timeout):
+        started = monotonic()
+        self.run_coc()
+        try:
+            n = 0
+            while count is None or n < count:
+                self._wait_image(coc_time, started, timeout)
+                image = pool[n % len(pool)]
+                n += 1
+                if count is None or n < count:
+                    started = monotonic()
+                    self.run_coc()
+                yield self._read_image(image)
+        finally:
+            self.stop_coc()
 
     @Action(units='ms')
     def take_image(self, exposure=1):
@@ -13,6 +13,6 @@
     :license: BSD, see LICENSE for more details.
 """
 
-from .piezo import Piezo, parse_line, parse_multi
+from .piezo import Piezo, parse_line, parse_multi, parse_recorder
 
-__all__ = ['Piezo','parse_line','parse_multi']
+__all__ = ['Piezo','parse_line','parse_multi','parse_recorder']
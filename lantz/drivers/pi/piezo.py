@@ -39,6 +39,33 @@ def parse_multi(message):
     return OrderedDict([parse_line(line) for line in message])
 
 
+def parse_recorder(message):
+    '''Parse a GCS data recorder answer (DRR?) into its header and data.
+
+    Return an ordered dictionary with the header parameters and a numpy array
+    with one column per record table.'''
+    assert isinstance(message, list)
+    header = OrderedDict()
+    for n, line in enumerate(message):
+        line = line.strip()
+        if not line.startswith('#'):
+            break
+        line = line.lstrip('#').strip()
+        if line == 'END_HEADER':
+            n += 1
+            break
+        if '=' in line:
+            key, value = parse_line(line)
+            header[key.strip()] = value.strip()
+    else:
+        n = len(message)
+    rows = [line.split() for line in message[n:] if line.strip()]
+    if not rows:
+        return header, np.empty((0, int(header.get('DIM', 1))))
+    data = np.array(rows, dtype=float)
+    return header, data.reshape(len(data), -1)
+
+
 class Piezo(MessageBasedDriver):
     """ PI piezo motion controller. It assumes all axes to have units um
 
@@ -112,7 +139,9 @@ class Piezo(MessageBasedDriver):
 
     def __init__(self, *args, **kwargs):
         self.sleeptime_after_move = kwargs.pop('sleeptime_after_move', 0*ureg.ms)
+        self.on_target_timeout = kwargs.pop('on_target_timeout', 1000*ureg.ms)
         self.axis = kwargs.pop('axis', 'X')
+        self._recorder_tables = 1
         super().__init__(*args, **kwargs)
 
     def initialize(self):
@@ -123,6 +152,8 @@ class Piezo(MessageBasedDriver):
         self.stop()
         super().finalize()
 
+    ONT_POLL_INTERVAL = 1e-3  # seconds between on-target queries
+
     def query_multiple(self, query):
         """Read a multi line response"""
         self.write(query)
@@ -135,6 +166,15 @@ class Piezo(MessageBasedDriver):
             else:
                 return ans
 
+    def query_gcs_multiline(self, query):
+        '''Read a GCS multi line response, in which every line but the last
+        ends with a space before the termination'''
+        self.write(query)
+        ans = [self.read()]
+        while ans[-1].endswith(' '):
+            ans.append(self.read())
+        return ans
+
     def parse_multiaxis(self, message, axis=None):
         "Parse a multi-axis message, return only value for self.axis"
         if axis is None:
@@ -194,15 +234,41 @@ class Piezo(MessageBasedDriver):
 
     @position.setter
     def position(self, position):
-        return self.move_to(position, self.sleeptime_after_move)
+        errors = self.move_to(position, self.on_target_timeout)
+        sleeptime = self.sleeptime_after_move
+        sleeptime = sleeptime.to('ms').magnitude if hasattr(sleeptime, 'to') else sleeptime
+        if sleeptime:
+            time.sleep(sleeptime * 1e-3) # Extra settling time once on target (in seconds!)
+        return errors
+
+    @Feat(values={True: '1', False: '0'})
+    def on_target(self):
+        ''' Whether the axis has settled at its target (closed-loop only)'''
+        return self.parse_multiaxis(self.query('ONT?'))
 
     @Action(units=('um','ms'))
     def move_to(self, position, timeout=None):
-        ''' Move to an absolute position the stage (closed-loop only)'''
+        ''' Move to an absolute position the stage (closed-loop only).
+
+        Waits until the controller reports the axis on target, but at most
+        timeout ms.'''
         self.write('MOV {} {}'.format(self.axis, position))
-        time.sleep(timeout * 1e-3) # Give the stage time to move! (in seconds!)
+        if timeout:
+            self.wait_on_target(timeout)
         return self.errors
 
+    @Action(units='ms')
+    def wait_on_target(self, timeout):
+        ''' Poll the on-target state until it is reached or timeout ms passed.
+        Returns True if the axis is on target'''
+        deadline = time.time() + timeout * 1e-3
+        while not self.on_target:
+            if time.time() >= deadline:
+                self.log_warning('Axis {} not on target after {} ms'.format(self.axis, timeout))
+                return False
+            time.sleep(self.ONT_POLL_INTERVAL)
+        return True
+
     @Feat(units='um')
     def read_stage_position(self, nr_avg = 1):
         ''' Read the current position from the stage'''
@@ -217,7 +283,7 @@ class Piezo(MessageBasedDriver):
         Servo should be on
 
         Note: a higher temporal resolution can be aquired by the data-recorder
-        in the driver
+        in the driver, see record_step_response
 
         Example:
         stage.servo = True
@@ -242,6 +308,60 @@ class Piezo(MessageBasedDriver):
 
         return timepos
 
+    @Action()
+    def configure_recorder(self, options=(2,), rate=1, trigger=1):
+        '''Configure the data recorder of the controller.
+
+        options: record option for each record table, starting at table 1
+                 (1 = target position, 2 = current position).
+        rate: record table rate, in servo cycles per point.
+        trigger: trigger source for all tables (0 = default, 1 = any command
+                 changing the position, 2 = next command).
+        '''
+        for table, option in enumerate(options, 1):
+            self.write('DRC {} {} {}'.format(table, self.axis, option))
+        self.write('RTR {}'.format(rate))
+        self.write('DRT 0 {} 0'.format(trigger))
+        self._recorder_tables = len(options)
+        return self.errors
+
+    @Feat()
+    def recorded_points(self):
+        '''Number of points stored in the first record table'''
+        return int(self.parse_multiaxis(self.query('DRL? 1'), '1'))
+
+    @Action()
+    def read_recorder(self, points=None, start=1):
+        '''Read the data recorder.
+
+        Returns an array with the time (in ms, starting at 0) in the first
+        column and one column per configured record table.'''
+        if points is None:
+            points = self.recorded_points
+        tables = ' '.join(str(table) for table in range(1, self._recorder_tables + 1))
+        header, data = parse_recorder(self.query_gcs_multiline('DRR? {} {} {}'.format(start, points, tables)))
+        sample_time = float(header.get('SAMPLE_TIME', 0))
+        timestamps = np.arange(len(data)) * sample_time * 1000
+        return np.column_stack((timestamps, data))
+
+    @Action(units=('um', None, None, 'ms'))
+    def record_step_response(self, stepsize, points, rate=1, timeout=1000):
+        '''Measure a step response of size stepsize with the data recorder.
+
+        Same output as measure_step_response, but sampled by the controller
+        at rate servo cycles per point.
+
+        Servo should be on'''
+        if not self.servo:
+            self.log.error('Servo should be on')
+            return
+        self.configure_recorder((2,), rate, trigger=1)
+        self.move_to(self.position + stepsize*ureg.um, 0)
+        deadline = time.time() + timeout * 1e-3
+        while self.recorded_points < points and time.time() < deadline:
+            time.sleep(self.ONT_POLL_INTERVAL)
+        return self.read_recorder(points)
+
     def plot_step_response(self, timepos):
         '''Helper function to visualize a step respons'''
         import matplotlib.pyplot as plt
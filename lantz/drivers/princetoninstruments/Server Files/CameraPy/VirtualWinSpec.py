@@ -57,6 +57,20 @@ def get_wavelengths():
     wavelengths = ws.get_wavelengths()
     return json.dumps(wavelengths)
 
+def ieee_block(array):
+    # IEEE 488.2 definite length block: #<number of digits><length><data>
+    data = array.tostring()
+    length = str(len(data))
+    return "#%d%s%s" % (len(length), length, data)
+
+def get_spectrum_binary():
+    spectrum = ws.get_spectrum()
+    return ieee_block(np.asarray(spectrum, dtype='<u2'))
+
+def get_wavelengths_binary():
+    wavelengths = ws.get_wavelengths()
+    return ieee_block(np.asarray(wavelengths, dtype='<f8'))
+
 def one_arg_function(command):
     split_list = command.split()
     val = float(split_list[-1])
@@ -78,6 +92,10 @@ def recieve_and_send(command):
         return get_spectrum()
     elif command == "get wavelengths":
         return get_wavelengths()
+    elif command == "get spectrum binary":
+        return get_spectrum_binary()
+    elif command == "get wavelengths binary":
+        return get_wavelengths_binary()
     else:
         if command in no_arg_functions.keys():
             return no_arg_function(command)
@@ -104,7 +122,7 @@ def establish_communication():
                     break
                 to_be_sent = recieve_and_send(command) +"\r\n"
                 #print to_be_sent
-                c.send(to_be_sent)
+                c.sendall(to_be_sent)
             except socket.error as e:
                 if e[0] == 10035 and socketerror1035count < 5:
                     socketerror1035count = socketerror1035count  +1
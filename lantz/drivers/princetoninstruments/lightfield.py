@@ -1,3 +1,4 @@
+import ctypes
 import numpy as np
 from time import sleep
 
@@ -25,6 +26,7 @@ try:
     from System.Collections.Generic import List
     from System import String
     from System.IO import FileAccess
+    from System.Runtime.InteropServices import GCHandle, GCHandleType
 except:
     pass
 
@@ -32,6 +34,44 @@ except:
 from lantz import Driver, Feat, DictFeat, Action
 
 
+def copy_array(src, out):
+    """
+    Copy the elements of src into the C contiguous array out in a single bulk
+    operation. src is a .NET array, which is pinned and copied with memmove,
+    or any sequence accepted by numpy. The .NET array must have the same
+    element size as out.
+    """
+    if hasattr(src, 'GetType'):
+        if src.Length * out.itemsize != out.nbytes:
+            raise ValueError('Cannot copy {} elements into an array of {}'.format(src.Length, out.size))
+        handle = GCHandle.Alloc(src, GCHandleType.Pinned)
+        try:
+            ctypes.memmove(out.ctypes.data, handle.AddrOfPinnedObject().ToInt64(), out.nbytes)
+        finally:
+            handle.Free()
+    else:
+        out.reshape(-1)[:] = src
+    return out
+
+
+def read_image_set(image_set, region=0):
+    """
+    Read all the frames of a region of an image set into a single uint16 array.
+
+    A single frame is returned as a (Width, Height) array, multiple frames as
+    a (Frames, Width, Height) array allocated once, with the data of each
+    frame copied with copy_array.
+    """
+    frame = image_set.GetFrame(region, 0)
+    # Frame data is column major with respect to (Width, Height).
+    data = np.empty((image_set.Frames, frame.Height, frame.Width), dtype='uint16')
+    for i in range(image_set.Frames):
+        if i:
+            frame = image_set.GetFrame(region, i)
+        copy_array(frame.GetData(), data[i])
+    data = data.transpose(0, 2, 1)
+    return data[0] if image_set.Frames == 1 else data
+
 
 class LightFieldM:
     """
@@ -124,8 +164,8 @@ class LightFieldM:
         from each pixel). Taking a section in the vertical (400-pixel) direction
         corresponds to wavelength averaging.
 
-        For multiple frames, each exposure is stacked in a third dimension, so
-        averaging can be performed simply by summing over the different planes.
+        For multiple frames, each exposure is a plane along the first
+        dimension, so averaging can be performed simply by summing over axis 0.
         """
 
         acquisition_time = self.get(lf.AddIns.CameraSettings.ShutterTimingExposureTime)
@@ -144,24 +184,7 @@ class LightFieldM:
 
         if image_set.Regions.Length == 1:
 
-            if image_set.Frames == 1:
-
-                frame = image_set.GetFrame(0, 0)
-                data = np.reshape(np.fromiter(frame.GetData(),'uint16'), [frame.Width, frame.Height], order='F')
-
-            else:
-                data = np.array([])
-                for i in range(0, image_set.Frames):
-
-                    frame = image_set.GetFrame(0, i)
-                    new_frame = np.fromiter(frame.GetData(), 'uint16')
-
-                    new_frame = np.reshape(np.fromiter(frame.GetData(), 'uint16'), [frame.Width, frame.Height], order='F')
-                    data = np.dstack((data, new_frame)) if data.size else new_frame
-
-
-            return data
-
+            return read_image_set(image_set)
 
         else:
         # not sure when this situation actually arises, but I think multiple
@@ -202,6 +225,7 @@ class Spectrometer(Driver):
         """
         Sets up LightField
         """
+        self._wavelengths = None
         self.lfm = LightFieldM(True)
         self.lfm.load_experiment('SpyreAutomation')
 
@@ -221,16 +245,15 @@ class Spectrometer(Driver):
     def get_wavelengths(self):
         """
         Returns the wavelength calibration for a single frame.
-        """
-        size = self.lfm.experiment.SystemColumnCalibration.get_Length()
-
-        result = np.empty(size)
 
-        for _ in range(size):
-
-            result[_] = self.lfm.experiment.SystemColumnCalibration[_]
+        The calibration is cached until the grating or the center wavelength
+        are set.
+        """
+        if self._wavelengths is None:
+            calibration = self.lfm.experiment.SystemColumnCalibration
+            self._wavelengths = copy_array(calibration, np.empty(calibration.get_Length()))
 
-        return result
+        return self._wavelengths.copy()
 
     @center_wavelength.setter
     def center_wavelength(self, nanometers):
@@ -240,6 +263,7 @@ class Spectrometer(Driver):
         # this avoids bug where if step and glue is selected, doesn't allow setting center wavelength
         self.lfm.set(lf.AddIns.ExperimentSettings.StepAndGlueEnabled, False)
 
+        self._wavelengths = None
         return self.lfm.set(lf.AddIns.SpectrometerSettings.GratingCenterWavelength, nanometers)
 
     @Feat()
@@ -256,6 +280,7 @@ class Spectrometer(Driver):
         """
         # TODO: figure out the format for setting this
 
+        self._wavelengths = None
         print('figure out the format for this')
 
     @Feat()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+    test_lightfield
+    ~~~~~~~~~~~~~~~
+
+    Tests the LightField data transfers against fake image sets and
+    experiments, without LightField.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from lantz.drivers.princetoninstruments import lightfield
+from lantz.drivers.princetoninstruments.lightfield import Spectrometer, copy_array, read_image_set
+
+
+class FakeFrame(object):
+    """Frame of an image set, with its data in column major order as
+    returned by LightField.
+    """
+
+    def __init__(self, image):
+        self.image = image
+        self.Width, self.Height = image.shape
+
+    def GetData(self):
+        return list(self.image.ravel(order='F'))
+
+
+class FakeImageSet(object):
+    """Image set with a single region.
+    """
+
+    def __init__(self, images):
+        self.frames = [FakeFrame(image) for image in images]
+        self.Frames = len(images)
+
+    def GetFrame(self, region, frame):
+        assert region == 0
+        return self.frames[frame]
+
+
+class FakeNetArray(object):
+    """.NET array, only its length is used before copying.
+    """
+
+    def __init__(self, length):
+        self.Length = length
+
+    def GetType(self):
+        return 'System.UInt16[]'
+
+
+class FakeCalibration(list):
+
+    def get_Length(self):
+        return len(self)
+
+
+def _images(frames, width=4, height=3):
+    return np.arange(frames * width * height, dtype='uint16').reshape(frames, width, height)
+
+
+class ReadImageSetTest(unittest.TestCase):
+
+    def test_single_frame(self):
+        image = _images(1)[0]
+        data = read_image_set(FakeImageSet([image]))
+        self.assertEqual(data.shape, (4, 3))
+        self.assertEqual(data.dtype, np.uint16)
+        np.testing.assert_array_equal(data, image)
+
+    def test_multiple_frames(self):
+        images = _images(5)
+        data = read_image_set(FakeImageSet(images))
+        self.assertEqual(data.shape, (5, 4, 3))
+        np.testing.assert_array_equal(data, images)
+        np.testing.assert_array_equal(data.sum(axis=0), images.sum(axis=0))
+
+    def test_copy_array_length(self):
+        with self.assertRaises(ValueError):
+            copy_array(FakeNetArray(11), np.empty((4, 3), dtype='uint16'))
+
+
+class WavelengthsTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(lightfield, 'lf', SimpleNamespace(AddIns=mock.MagicMock()), create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.experiment = SimpleNamespace(SystemColumnCalibration=FakeCalibration([500., 501., 502.]))
+        self.driver = Spectrometer()
+        self.driver._wavelengths = None
+        self.driver.lfm = mock.Mock(experiment=self.experiment)
+
+    def test_cache(self):
+        wavelengths = self.driver.get_wavelengths()
+        np.testing.assert_array_equal(wavelengths, [500., 501., 502.])
+
+        # The returned array is a copy of the cached calibration.
+        wavelengths[0] = 0
+        self.experiment.SystemColumnCalibration = FakeCalibration([600., 601., 602.])
+        np.testing.assert_array_equal(self.driver.get_wavelengths(), [500., 501., 502.])
+
+    def test_center_wavelength_invalidates(self):
+        self.driver.get_wavelengths()
+        self.experiment.SystemColumnCalibration = FakeCalibration([600., 601., 602.])
+        self.driver.center_wavelength = 601.
+        np.testing.assert_array_equal(self.driver.get_wavelengths(), [600., 601., 602.])
+
+    def test_grating_invalidates(self):
+        self.driver.get_wavelengths()
+        self.experiment.SystemColumnCalibration = FakeCalibration([700., 701.])
+        self.driver.grating = 1
+        np.testing.assert_array_equal(self.driver.get_wavelengths(), [700., 701.])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,6 @@
 from collections import OrderedDict
 from lantz import Action, Feat, DictFeat, Q_
 from lantz.messagebased import MessageBasedDriver
-import json
 import numpy as np
 
 
@@ -55,6 +54,13 @@ class Winspec(MessageBasedDriver):
         })
     ])
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        #: (grating, center wavelength in nm) of the last calibration, None
+        #: when the grating or the wavelength may have changed.
+        self._cal_key = None
+        self._cal_wavelengths = dict()
+
     @Feat(units="s")
     def exposure_time(self):
         return float(self.query("get exposure time"))
@@ -70,6 +76,7 @@ class Winspec(MessageBasedDriver):
 
     @wavelength.setter
     def wavelength(self, wl):
+        self._cal_key = None
         if self.query("set wavelength {:1.3e}".format(wl)) != "OK":
             raise Exception
         
@@ -79,6 +86,7 @@ class Winspec(MessageBasedDriver):
 
     @grating.setter
     def grating(self, wl):
+        self._cal_key = None
         if self.query("set grating {:1.3e}".format(wl)) != "OK":
             raise Exception
     
@@ -106,16 +114,34 @@ class Winspec(MessageBasedDriver):
 
     @Action()
     def get_exposure(self):
-        return np.array(json.loads(self.query("get spectrum")))
+        """Acquire a spectrum, transferred as a binary block of uint16 counts.
+        """
+        return self.resource.query_binary_values("get spectrum binary", datatype='H',
+                                                 is_big_endian=False, container=np.array)
 
     @Action()
     def get_int_wavelength(self):
-        return np.array(json.loads(self.query("get wavelengths")))
+        """Acquire a spectrum and return the wavelength of each pixel according
+        to the Winspec calibration, transferred as a binary block of doubles.
+        """
+        return self.resource.query_binary_values("get wavelengths binary", datatype='d',
+                                                 is_big_endian=False, container=np.array)
 
     @Action()
     def get_cal_wavelength(self):
-        grating = self.grating
-        center_wl = self.wavelength.magnitude
+        """Wavelength in nm of each pixel according to CALIBRATION_PARAMS.
+
+        The axis is cached for each (grating, center wavelength) and the
+        current ones are only queried again after setting grating or
+        wavelength.
+        """
+        if self._cal_key is None:
+            self._cal_key = (self.grating, self.wavelength.magnitude)
+        if self._cal_key not in self._cal_wavelengths:
+            self._cal_wavelengths[self._cal_key] = self._calibrate(*self._cal_key)
+        return self._cal_wavelengths[self._cal_key].copy()
+
+    def _calibrate(self, grating, center_wl):
         d = self.CALIBRATION_PARAMS[grating]["d"]
         gamma = self.CALIBRATION_PARAMS[grating]["gamma"]
         fl = self.CALIBRATION_PARAMS[grating]["fl"]
@@ -15,6 +15,8 @@
 """
 import ctypes as ct
 import numpy as np
+import queue
+import threading
 import time
 from time import process_time
 
@@ -75,6 +77,15 @@ class QHY(LibraryDriver):
         self.size_x = None
         self.size_y = None
         self._length = None
+        self._frame_shape_cache = None
+
+        self._live = None
+        self._stop_live = threading.Event()
+        self._live_frames = None
+        self._free_frames = None
+        self.frames_acquired = 0
+        self.frames_dropped = 0
+
     # def _return_handler(self, func_name, ret_value):
     #     if ret_value != 0:
     #         raise errors.InstrumentError('{} ({})'.format(ret_value, _ERRORS[ret_value]))
@@ -92,8 +103,11 @@ class QHY(LibraryDriver):
         self._y0 = 0
         self._roix = 5544
         self._roiy = 3684
+        self.bins = 1
+        self._frame_shape_cache = None
         self.init_camera()
         self.lib.get_single_frame.argtypes = [ct.c_void_p, ct.c_int, ct.c_int, ct.POINTER(ct.c_ubyte), ct.c_int]
+        self.lib.get_live_frame.argtypes = [ct.c_void_p, ct.c_int, ct.c_int, ct.POINTER(ct.c_ubyte), ct.c_int]
         # self.lib.get_single_frame.restype = ct.POINTER(ct.c_ubyte*(61272288))
 
     @Action()
@@ -170,12 +184,11 @@ class QHY(LibraryDriver):
         mode        int
                     0 for single frame mode and 1 for video mode.
         """
-        print('stream_mode', value)
         self._stream_mode = value
         cam_mode = ct.c_int(value)
         self.lib.set_stream_mode.argtypes = [ct.c_void_p, ct.c_int]
         ret_value = self.lib.set_stream_mode(self.handler, cam_mode)
-        if ret_value not in _ERRORS.keys() and 'value' == 'live':
+        if ret_value not in _ERRORS.keys() and value == 1:
             self.lib.init_live_mode(self.handler)
         return ret_value
 
@@ -283,6 +296,7 @@ class QHY(LibraryDriver):
     @roix.setter
     def roix(self, roix=5544):
         self._roix = roix
+        self._frame_shape_cache = None
 
     @Feat(limits=(0, 3684, 1))
     def roiy(self):
@@ -291,6 +305,7 @@ class QHY(LibraryDriver):
     @roiy.setter
     def roiy(self, roiy=3684):
         self._roiy = roiy
+        self._frame_shape_cache = None
 
     # def set_roi(self, start_x=0, start_y=0, size_x=5544, size_y=3684):
     @Action()
@@ -314,6 +329,7 @@ class QHY(LibraryDriver):
     @binning.setter
     def binning(self, bins=1):
         self.bins = bins
+        self._frame_shape_cache = None
         if bins >= 2:
             self.roix = min(self.roix, 5544//bins)
             self.roiy = min(self.roiy, 3684//bins)
@@ -337,16 +353,24 @@ class QHY(LibraryDriver):
 
     @property
     def _memory_length(self):
-        print('Memory setting')
         if not self._length:
             self.lib.get_memory_length.argtypes = [ct.c_void_p]
             length = self.lib.get_memory_length(self.handler)
-            self._length = length
-            print('Length set at %d' % length)
             if length in _ERRORS.keys():
-                raise errors.InstrumentError('{} ({})'.format(ret_value, _ERRORS[ret_value]))
+                raise errors.InstrumentError('{} ({})'.format(length, _ERRORS[length]))
+            self._length = length
+            self.log_debug('Memory length set at {}'.format(length))
         return self._length
 
+    @property
+    def _frame_shape(self):
+        """(rows, columns) of a binned frame, cached until the ROI or
+        binning setters run.
+        """
+        if self._frame_shape_cache is None:
+            self._frame_shape_cache = (self._roiy // self.bins, self._roix // self.bins)
+        return self._frame_shape_cache
+
     def get_ccd_info(self):
         # int_array = ct.c_int_p
         # ia = IntArray5(5, 1, 7, 33, 99)
@@ -386,39 +410,154 @@ class QHY(LibraryDriver):
         return ret_value
 
 
-    # @Action()
-    def _get_frame(self, char_array, effective_roi_x, effective_roi_y, length):
-        """ Get one frame from buffer.
+    def _get_frame(self, img):
+        """ Read one frame from the camera into img.
 
-        In the example app they use length = _memory_length which is equivalent
+        img is a C contiguous '<u2' array of shape (roi_y, roi_x). In the
+        example app they use length = _memory_length which is equivalent
         to 3*5544*3684. I suspect that RGB cameras are 8 bit and mono 16, so
         this value covers them all.
+
+        Returns the library return value, which in live mode is an error
+        while the next frame is not ready.
         """
-        length = effective_roi_x*effective_roi_y
-        img = np.empty((effective_roi_y, effective_roi_x), dtype=np.dtype('<u2'), order='C')
+        roi_y, roi_x = img.shape
         pimg = img.ctypes.data_as(ct.POINTER(ct.c_ubyte))
-        # self.lib.get_single_frame.restype = ct.POINTER(ct.c_ubyte*(length))
-        if self.stream_mode == 'single':
-            print('Calling length is %d' % length)
-            self.lib.get_single_frame(self.handler, effective_roi_x, effective_roi_y, pimg, length)
-        elif self.stream_mode == 'live':
-            self.lib.get_live_frame(self.handler, effective_roi_x, effective_roi_y, pimg, length)
-        return img
+        if self._stream_mode == 0:
+            return self.lib.get_single_frame(self.handler, roi_x, roi_y, pimg, roi_x*roi_y)
+        return self.lib.get_live_frame(self.handler, roi_x, roi_y, pimg, roi_x*roi_y)
 
     @Action()
-    def get_frame(self):
-        bins = self.bins
-        roi_x = self.roix//bins
-        roi_y = self.roiy//bins
-        length = self._memory_length
-        char_array = ct.c_ubyte*(length)
-        return self._get_frame(char_array, roi_x, roi_y, length)
-        # p_img_data = self._get_frame(char_array, roi_x, roi_y, length)
-        # np_size = roi_x*roi_y
-        # # img = np.frombuffer(p_img_data.contents, dtype = np.uint16)
-        # img = np.frombuffer(p_img_data.contents, dtype = np.dtype('<u2'))
-        # image = np.copy(img[:np_size])
-        # return image.reshape(roi_y, roi_x)
+    def get_frame(self, out=None):
+        """ Get one frame.
+
+        Parameters
+        ----------
+        out         ndarray, optional
+                    '<u2' array of the frame shape to read into, so repeated
+                    calls can reuse the same buffer.
+        """
+        if out is None:
+            out = np.empty(self._frame_shape, dtype=np.dtype('<u2'), order='C')
+        elif out.shape != self._frame_shape:
+            raise ValueError('out has shape {}, expected {}'.format(out.shape, self._frame_shape))
+        self._get_frame(out)
+        return out
+
+    @Action()
+    def start_live(self, queue_size=2, poll_interval=0.001):
+        """ Stream live frames from a background thread.
+
+        Frames are read into a pool of queue_size + 2 reusable buffers and
+        delivered by live_frames. When the consumer falls behind, the oldest
+        queued frame is dropped and counted in frames_dropped.
+
+        Parameters
+        ----------
+        queue_size      int
+                        Maximum number of frames waiting to be consumed.
+        poll_interval   float
+                        Wait in seconds before asking again for a frame that
+                        is not ready yet.
+        """
+        self.stop_live()
+        if self._stream_mode != 1:
+            self.stream_mode = 'live'
+        shape = self._frame_shape
+        self._live_frames = queue.Queue(maxsize=queue_size)
+        self._free_frames = queue.Queue()
+        for _ in range(queue_size + 2):
+            self._free_frames.put(np.empty(shape, dtype=np.dtype('<u2'), order='C'))
+        self.frames_acquired = 0
+        self.frames_dropped = 0
+        self._stop_live.clear()
+        self._live = threading.Thread(target=self._live_loop, args=(poll_interval, ),
+                                      name='QHY live', daemon=True)
+        self._live.start()
+
+    @Action()
+    def stop_live(self):
+        """ Stop the live streaming thread, if running.
+        """
+        if self._live is None:
+            return
+        self._stop_live.set()
+        self._live.join()
+        self._live = None
+        self._cancel_exposure()
+
+    def live_frames(self, count=None, timeout=None):
+        """ Iterate over (timestamp, frame) from the live stream.
+
+        The frame buffer goes back to the pool when the next frame is
+        requested; copy it to keep it longer.
+        """
+        if self._live is None:
+            raise RuntimeError('Live streaming not started')
+        n = 0
+        img = None
+        try:
+            while count is None or n < count:
+                item = self._live_frames.get(timeout=timeout)
+                if img is not None:
+                    self._free_frames.put(img)
+                    img = None
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                timestamp, img = item
+                yield timestamp, img
+                n += 1
+        finally:
+            if img is not None:
+                self._free_frames.put(img)
+
+    def _live_loop(self, poll_interval):
+        try:
+            while not self._stop_live.is_set():
+                img = self._take_free_frame()
+                shape = self._frame_shape
+                if img.shape != shape:
+                    img = np.empty(shape, dtype=np.dtype('<u2'), order='C')
+                if self._get_frame(img) != 0:
+                    self._free_frames.put(img)
+                    self._stop_live.wait(poll_interval)
+                    continue
+                self.frames_acquired += 1
+                self._put_live_frame((time.time(), img))
+        except Exception as e:
+            self.log_error('Live streaming stopped: {}'.format(e))
+            self._put_live_frame(e)
+        self._put_live_frame(None)
+
+    def _take_free_frame(self):
+        try:
+            return self._free_frames.get_nowait()
+        except queue.Empty:
+            pass
+        # All buffers are queued or held by the consumer: drop the oldest.
+        try:
+            _, img = self._live_frames.get_nowait()
+            self.frames_dropped += 1
+            return img
+        except queue.Empty:
+            return self._free_frames.get()
+
+    def _put_live_frame(self, item):
+        while True:
+            try:
+                self._live_frames.put_nowait(item)
+                return
+            except queue.Full:
+                pass
+            try:
+                dropped = self._live_frames.get_nowait()
+            except queue.Empty:
+                continue
+            if isinstance(dropped, tuple):
+                self._free_frames.put(dropped[1])
+                self.frames_dropped += 1
 
     @Action()
     def _cancel_exposure(self):
@@ -441,7 +580,10 @@ class QHY(LibraryDriver):
         """Cancel exposure and close camera and SDK.
 
         """
-        self._cancel_exposure()
+        if self._live is not None:
+            self.stop_live()
+        else:
+            self._cancel_exposure()
         self._close()
         self.lib.release()
 
@@ -21,12 +21,11 @@ from pyvisa import constants
 from lantz import Q_, ureg
 from lantz.processors import convert_to
 from lantz.drivers.motion import MotionAxisMultiple, MotionControllerMultiAxis, BacklashMixing
-import time
 import numpy as np
 
 formats = {'one_param': ''}
 
-class SCU(MessageBasedDriver, MotionControllerMultiAxis):
+class SCU(MotionControllerMultiAxis, MessageBasedDriver):
     """ Driver for SCU controller with multiple axis
 
     """
@@ -49,10 +48,6 @@ class SCU(MessageBasedDriver, MotionControllerMultiAxis):
         super().initialize()
         self.detect_axis()
 
-    def query(self, command, *, send_args=(None, None), recv_args=(None, None)):
-        return MotionControllerMultiAxis.query(self, ':{}'.format(command),
-                                 send_args=send_args, recv_args=recv_args)
-
     def write(self, command, *args, **kwargs):
         return MotionControllerMultiAxis.write(self,':{}'.format(command),
                                  *args, **kwargs)
@@ -224,10 +219,3 @@ class MotionAxis(MotionAxisMultiple, BacklashMixing):
         # No check implemented yet
         self.write('%SN%' % (self.num, UNITS.index(val)))
         super().units = val
-
-    def _wait_until_done(self):
-        # wait_time = convert_to('seconds', on_dimensionless='warn')(self.wait_time)
-        time.sleep(self.wait_time)
-        while not self.motion_done:
-            time.sleep(self.wait_time)
-        return True
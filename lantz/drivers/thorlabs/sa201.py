@@ -2,10 +2,31 @@ from lantz.drivers.ni.daqmx import AnalogInputTask, VoltageInputChannel
 
 from lantz.driver import Driver
 from lantz.feat import Feat
+from lantz.action import Action
 from lantz import Q_
 
 import numpy as np
 
+
+def find_peaks(sweep, threshold):
+    """Indices of the local maxima of sweep above threshold."""
+    center = sweep[1:-1]
+    is_peak = (center > sweep[:-2]) & (center >= sweep[2:]) & (center > threshold)
+    return np.flatnonzero(is_peak) + 1
+
+
+def mode_positions(peaks, fsr_pts):
+    """Peak positions in units of the free spectral range (FSR), relative to
+    the first peak and folded into [0, 1).
+
+    :param peaks: peak indices, as returned by find_peaks
+    :param fsr_pts: number of samples spanning one FSR
+    """
+    if not len(peaks):
+        return np.empty(0)
+    return np.mod((peaks - peaks[0]) / fsr_pts, 1.)
+
+
 class SA201(Driver):
 
     def __init__(self, input_ch, trigger_ch, acq_time=Q_('10 ms'), pts=1000):
@@ -14,14 +35,14 @@ class SA201(Driver):
         self.task.configure_trigger_digital_edge_start(trigger_ch, edge='rising')
         self.acq_time = acq_time
 
-        self.pts = self.pts
+        self.pts = pts
+        self._continuous = False
         return
 
     def initialize(self):
         pass
 
-    @Feat()
-    def scanned(self):
+    def _configure_clock(self):
         rate = self.pts / self.acq_time
         clock_config = {
             'source': 'OnboardClock',
@@ -29,13 +50,71 @@ class SA201(Driver):
             'sample_mode': 'finite',
             'samples_per_channel': self.pts,
         }
-        timeout = self.pts * 4 / rate
         self.task.configure_timing_sample_clock(**clock_config)
+        return (self.pts * 4 / rate).to('s').magnitude
+
+    @Feat()
+    def scanned(self):
+        if self._continuous:
+            raise RuntimeError('Stop the continuous acquisition before reading single sweeps')
+        timeout = self._configure_clock()
         self.task.start()
         data = self.task.read(samples_per_channel=self.pts, timeout=timeout)
         self.task.stop()
-        data = data.flatten()
-        return data.tolist()
+        return data.flatten()
+
+    @Action()
+    def sweeps(self, count=None, threshold=None, fsr_pts=None, buffers=2, timeout=None):
+        """Continuous acquisition of every sweep, with the task kept armed on
+        the scan trigger (retriggerable start trigger).
+
+        Returns a generator. Sweeps are written into a pool of `buffers`
+        reusable arrays, so a yielded sweep is overwritten `buffers`
+        iterations later; copy it to keep it. The task is configured and
+        started on the first iteration, and stopped and restored when the
+        generator is closed or after `count` sweeps.
+
+        :param threshold: if given, also yield the peak indices above it.
+        :param fsr_pts: if given with threshold, also yield the peak
+                        positions in units of FSR (see mode_positions).
+        :param timeout: maximum wait for a sweep in seconds, defaults to
+                        four acquisition times.
+        """
+        if self._continuous:
+            raise RuntimeError('A continuous acquisition is already running')
+        pool = np.empty((buffers, 1, self.pts))
+        return self._sweep_reader(pool, count, threshold, fsr_pts, timeout)
+
+    def _sweep_reader(self, pool, count, threshold, fsr_pts, timeout):
+        if self._continuous:
+            raise RuntimeError('A continuous acquisition is already running')
+        self._continuous = True
+        try:
+            # Configured here rather than in sweeps, so that the finally
+            # clause always undoes it.
+            default_timeout = self._configure_clock()
+            timeout = default_timeout if timeout is None else timeout
+            self.task.configure_input_buffer(self.pts * (len(pool) + 2))
+            self.task.start_trigger_retriggerable = True
+            self.task.start()
+            n = 0
+            while count is None or n < count:
+                data = self.task.read(samples_per_channel=self.pts, timeout=timeout,
+                                      out=pool[n % len(pool)])
+                sweep = data[0]
+                n += 1
+                if threshold is None:
+                    yield sweep
+                    continue
+                peaks = find_peaks(sweep, threshold)
+                if fsr_pts is None:
+                    yield sweep, peaks
+                else:
+                    yield sweep, peaks, mode_positions(peaks, fsr_pts)
+        finally:
+            self.task.stop()
+            self.task.start_trigger_retriggerable = False
+            self._continuous = False
 
     def finalize(self):
         self.task.clear()
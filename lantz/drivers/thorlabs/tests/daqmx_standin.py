@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+    daqmx_standin
+    ~~~~~~~~~~~~~
+
+    Fake NI-DAQmx library standing in for the shared library, to test the
+    drivers built on lantz.drivers.ni.daqmx without a DAQ device. Load it
+    in place of the shared library with library(), for example::
+
+        with mock.patch.object(foreign, 'Library', standin.library):
+            task = AnalogInputTask('task')
+
+    Every DAQmx function succeeds and is recorded in calls. Those used by
+    the analog input reads are implemented:
+
+    - LoadTask returns TASK_HANDLE.
+    - GetTaskNumChans returns the number of channels given on creation.
+    - ReadAnalogF64 copies the next array queued with add_samples into the
+      read array, up to its size.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import ctypes as ct
+
+import numpy as np
+
+from lantz.foreign import Library
+
+TASK_HANDLE = 1
+
+
+class _Function(object):
+    """Function of the fake library, accepting argtypes and restype as
+    the functions of a ctypes library.
+    """
+
+    def __init__(self, standin, name, implementation):
+        self.standin = standin
+        self.name = name
+        self.implementation = implementation
+        self.argtypes = None
+        self.restype = None
+
+    def __call__(self, *args):
+        self.standin.calls.append((self.name, args))
+        if self.implementation is None:
+            return 0
+        return self.implementation(*args)
+
+
+class DAQmxStandIn(object):
+    """Fake NI-DAQmx library.
+
+    :param channels: number of channels of the tasks.
+    """
+
+    def __init__(self, channels=1):
+        self.channels = channels
+
+        #: Calls to the library as (name without prefix, arguments).
+        self.calls = []
+
+        self._samples = []
+
+    def __getattr__(self, name):
+        if not name.startswith('DAQmx'):
+            raise AttributeError(name)
+        function = _Function(self, name[5:], getattr(self, '_' + name[5:], None))
+        setattr(self, name, function)
+        return function
+
+    def library(self, name, prefix='', wrapper=None):
+        """Library wrapping the stand-in, with the signature of
+        lantz.foreign.Library.
+        """
+        return Library(self, prefix, wrapper)
+
+    def add_samples(self, data):
+        """Queue the samples returned by a call to ReadAnalogF64, as
+        stored in the read array.
+        """
+        self._samples.append(np.ascontiguousarray(data, dtype=np.float64).ravel())
+
+    def names(self):
+        return [name for name, _ in self.calls]
+
+    def _LoadTask(self, name, task_handle):
+        task_handle[0] = TASK_HANDLE
+        return 0
+
+    def _GetTaskNumChans(self, task_handle, value):
+        value[0] = self.channels
+        return 0
+
+    def _ReadAnalogF64(self, task_handle, samples_per_channel, timeout, fill_mode,
+                       read_array, array_size, samples_read, reserved):
+        data = self._samples.pop(0)
+        size = min(data.size, array_size)
+        ct.memmove(read_array, data.ctypes.data, size * data.itemsize)
+        samples_read[0] = size // self.channels
+        return 0
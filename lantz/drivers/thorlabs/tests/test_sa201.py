@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+    test_sa201
+    ~~~~~~~~~~
+
+    Tests the SA201 acquisitions against the fake NI-DAQmx library.
+
+    :copyright: 2015 by Lantz Authors, see AUTHORS for more details.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from lantz import foreign
+from lantz.drivers.thorlabs.sa201 import SA201
+
+from daqmx_standin import DAQmxStandIn, TASK_HANDLE
+
+PTS = 50
+
+
+def _sweep(first_peak):
+    """Sweep with peaks of height 1 every 20 samples."""
+    sweep = np.zeros(PTS)
+    sweep[first_peak::20] = 1
+    return sweep
+
+
+SWEEPS = [_sweep(n) for n in (5, 6, 7)]
+
+
+class SA201Test(unittest.TestCase):
+
+    def setUp(self):
+        self.lib = DAQmxStandIn()
+        with mock.patch.object(foreign, 'Library', self.lib.library):
+            self.driver = SA201('/dev1/ai6', '/dev1/pfi3', pts=PTS)
+        self.driver.initialize()
+        del self.lib.calls[:]
+
+    def tearDown(self):
+        self.driver.finalize()
+
+    def test_scanned(self):
+        self.lib.add_samples(SWEEPS[0])
+        np.testing.assert_array_equal(self.driver.scanned, SWEEPS[0])
+        self.assertEqual(self.lib.names(), ['CfgSampClkTiming', 'StartTask', 'GetTaskNumChans',
+                                            'ReadAnalogF64', 'StopTask'])
+
+    def test_sweeps(self):
+        for sweep in SWEEPS:
+            self.lib.add_samples(sweep)
+
+        sweeps = self.driver.sweeps(buffers=2)
+        # Nothing is configured until the first iteration.
+        self.assertEqual(self.lib.calls, [])
+
+        first = next(sweeps)
+        self.assertEqual(self.lib.names(), ['CfgSampClkTiming', 'CfgInputBuffer', 'SetStartTrigRetriggerable',
+                                            'StartTask', 'GetTaskNumChans', 'ReadAnalogF64'])
+        self.assertIn(('SetStartTrigRetriggerable', (TASK_HANDLE, 1)), self.lib.calls)
+        np.testing.assert_array_equal(first, SWEEPS[0])
+
+        second = next(sweeps)
+        np.testing.assert_array_equal(second, SWEEPS[1])
+        self.assertFalse(np.shares_memory(first, second))
+
+        # The pool has two buffers, the third sweep is read into the first.
+        third = next(sweeps)
+        self.assertTrue(np.shares_memory(first, third))
+        np.testing.assert_array_equal(first, SWEEPS[2])
+
+        del self.lib.calls[:]
+        sweeps.close()
+        self.assertEqual(self.lib.calls, [('StopTask', (TASK_HANDLE, )),
+                                          ('SetStartTrigRetriggerable', (TASK_HANDLE, 0))])
+        self.assertFalse(self.driver._continuous)
+
+    def test_sweeps_count(self):
+        for sweep in SWEEPS[:2]:
+            self.lib.add_samples(sweep)
+
+        sweeps = list(self.driver.sweeps(count=2, threshold=0.5, fsr_pts=20))
+        self.assertEqual(len(sweeps), 2)
+        for n, (sweep, peaks, positions) in enumerate(sweeps):
+            np.testing.assert_array_equal(peaks, [5 + n, 25 + n, 45 + n])
+            np.testing.assert_array_equal(positions, [0, 0, 0])
+        self.assertEqual(self.lib.names()[-2:], ['StopTask', 'SetStartTrigRetriggerable'])
+
+    def test_short_read(self):
+        self.lib.add_samples(SWEEPS[0][:PTS - 10])
+        sweeps = self.driver.sweeps()
+        sweep = next(sweeps)
+        self.assertEqual(len(sweep), PTS - 10)
+        np.testing.assert_array_equal(sweep, SWEEPS[0][:PTS - 10])
+        sweeps.close()
+
+    def test_one_acquisition(self):
+        self.lib.add_samples(SWEEPS[0])
+        sweeps = self.driver.sweeps()
+        next(sweeps)
+        with self.assertRaises(RuntimeError):
+            self.driver.sweeps()
+        with self.assertRaises(RuntimeError):
+            self.driver.scanned
+        sweeps.close()
+
+
+if __name__ == '__main__':
+    unittest.main()